@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Audio Capture
+Callback-driven microphone capture: PortAudio's callback thread copies each block into a
+preallocated ring buffer and the recognizer loop reads memoryview slices of that buffer,
+so a slow decode never stalls the device. Overruns are counted instead of ignored.
+
+FileAudioDevice replays a WAV file through the same interface for tests and benchmarks.
+"""
+import threading
+import time
+import wave
+
+# PortAudio constants (same values as pyaudio.paContinue / paComplete / paInputOverflow)
+PA_CONTINUE = 0
+PA_COMPLETE = 1
+PA_INPUT_OVERFLOW = 2
+
+SAMPLE_WIDTH = 2  # 16-bit mono PCM
+
+
+class RingBuffer:
+    """Single-producer, single-consumer byte ring with zero-copy reads
+
+    The producer drops a whole block (and counts an overrun) when there is no room,
+    so samples stay aligned and already-buffered audio is never overwritten.
+    """
+
+    def __init__(self, capacity):
+        capacity -= capacity % SAMPLE_WIDTH
+        self.capacity = capacity
+        self._buf = bytearray(capacity)
+        self._view = memoryview(self._buf)
+        self._read = 0   # total bytes consumed
+        self._write = 0  # total bytes written
+        self._cond = threading.Condition()
+        self.overruns = 0
+        self.dropped_bytes = 0
+        self.written_bytes = 0
+
+    def available(self):
+        with self._cond:
+            return self._write - self._read
+
+    def write(self, data):
+        """Copy a block in (producer side); return False if it was dropped"""
+        n = len(data)
+        with self._cond:
+            free = self.capacity - (self._write - self._read)
+            if n > free:
+                self.overruns += 1
+                self.dropped_bytes += n
+                return False
+            start = self._write % self.capacity
+        # The target region is free, so the consumer cannot be reading it
+        first = min(n, self.capacity - start)
+        self._view[start:start + first] = data[:first]
+        if first < n:
+            self._view[:n - first] = data[first:]
+        with self._cond:
+            self._write += n
+            self.written_bytes += n
+            self._cond.notify()
+        return True
+
+    def peek(self, max_bytes, timeout=None):
+        """Return a memoryview of up to max_bytes of unread audio without copying
+
+        The view stays valid until consume() is called; it is empty on timeout.
+        Reads stop at the end of the buffer, so a wrapped block arrives as two views.
+        """
+        with self._cond:
+            if self._write == self._read:
+                self._cond.wait(timeout)
+            available = self._write - self._read
+            start = self._read % self.capacity
+        n = min(available, max_bytes, self.capacity - start)
+        n -= n % SAMPLE_WIDTH
+        return self._view[start:start + n]
+
+    def consume(self, n):
+        with self._cond:
+            self._read += n
+
+    def clear(self):
+        """Discard everything buffered so far (e.g. audio captured while a prompt played)"""
+        with self._cond:
+            self._read = self._write
+
+
+class AudioCapture:
+    """Open an input stream in callback mode and expose captured audio as memoryviews
+
+    `pa` is a pyaudio.PyAudio instance or a FileAudioDevice; `sample_format` is
+    pyaudio.paInt16 for a real device (ignored by the fake one).
+    """
+
+    def __init__(self, pa, sample_format=None, rate=16000, frames_per_buffer=4000,
+                 buffer_seconds=10.0, device_index=None):
+        self.pa = pa
+        self.sample_format = sample_format
+        self.rate = rate
+        self.frames_per_buffer = frames_per_buffer
+        self.device_index = device_index
+        self.ring = RingBuffer(int(rate * buffer_seconds) * SAMPLE_WIDTH)
+        self.device_overflows = 0
+        self.callbacks = 0
+        self.paused = False
+        self._stream = None
+
+    def _callback(self, in_data, frame_count, time_info, status):
+        # Runs on PortAudio's thread: no logging, no allocation beyond the copy
+        self.callbacks += 1
+        if self.paused:
+            return (None, PA_CONTINUE)
+        if status & PA_INPUT_OVERFLOW:
+            self.device_overflows += 1
+        if in_data:
+            self.ring.write(in_data)
+        return (None, PA_CONTINUE)
+
+    def pause(self):
+        """Discard incoming audio (e.g. while a prompt plays) without closing the device"""
+        self.paused = True
+
+    def resume(self):
+        """Drop anything stale in the ring and start keeping audio again"""
+        self.ring.clear()
+        self.paused = False
+
+    def start(self, paused=False):
+        """Open and start the stream; paused=True discards audio until resume()"""
+        self.paused = paused
+        self._stream = self.pa.open(format=self.sample_format, channels=1, rate=self.rate,
+                                    input=True, frames_per_buffer=self.frames_per_buffer,
+                                    input_device_index=self.device_index,
+                                    stream_callback=self._callback)
+        self._stream.start_stream()
+        return self
+
+    def is_active(self):
+        return self._stream is not None and self._stream.is_active()
+
+    def chunks(self, seconds, max_bytes=8000, should_stop=None):
+        """Yield memoryviews of captured audio for up to `seconds`
+
+        Each view is released back to the ring when the consumer asks for the next one,
+        so the consumer must finish with (or copy) a view before continuing the loop.
+        """
+        deadline = time.time() + seconds
+        while time.time() < deadline:
+            if callable(should_stop) and should_stop():
+                break
+            view = self.ring.peek(max_bytes, timeout=min(0.1, max(0.0, deadline - time.time())))
+            if not len(view):
+                if not self.is_active() and not self.ring.available():
+                    break  # stream ended (file device) and everything was read
+                continue
+            try:
+                yield view
+            finally:
+                self.ring.consume(len(view))
+
+    def stats(self):
+        """Counters for monitoring: blocks received, device overflows and ring overruns"""
+        return {
+            'callbacks': self.callbacks,
+            'captured_bytes': self.ring.written_bytes,
+            'device_overflows': self.device_overflows,
+            'ring_overruns': self.ring.overruns,
+            'dropped_bytes': self.ring.dropped_bytes,
+        }
+
+    def stop(self):
+        if self._stream is None:
+            return
+        try:
+            if self._stream.is_active():
+                self._stream.stop_stream()
+        finally:
+            self._stream.close()
+            self._stream = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+
+class FileAudioDevice:
+    """Stand-in for pyaudio.PyAudio that plays a 16-bit mono WAV file into stream callbacks
+
+    time_scale=1.0 delivers blocks in real time, 0 as fast as possible.
+    """
+
+    def __init__(self, path, time_scale=0.0):
+        with wave.open(str(path), 'rb') as wav:
+            if wav.getsampwidth() != SAMPLE_WIDTH or wav.getnchannels() != 1:
+                raise ValueError(f"{path}: expected 16-bit mono PCM")
+            self.rate = wav.getframerate()
+            self.pcm = wav.readframes(wav.getnframes())
+        self.time_scale = time_scale
+        self.opened = 0
+
+    def open(self, format=None, channels=1, rate=16000, input=True, frames_per_buffer=1024,
+             input_device_index=None, stream_callback=None):
+        if rate != self.rate:
+            raise OSError(f"Invalid sample rate {rate} (file is {self.rate}Hz)")
+        self.opened += 1
+        return _FileStream(self, frames_per_buffer, stream_callback)
+
+    def terminate(self):
+        pass
+
+
+class _FileStream:
+    def __init__(self, device, frames_per_buffer, callback):
+        self.device = device
+        self.block = frames_per_buffer * SAMPLE_WIDTH
+        self.callback = callback
+        self._thread = None
+        self._stop = threading.Event()
+
+    def _run(self):
+        pcm = self.device.pcm
+        interval = self.block / SAMPLE_WIDTH / self.device.rate * self.device.time_scale
+        for offset in range(0, len(pcm), self.block):
+            if self._stop.is_set():
+                break
+            data = pcm[offset:offset + self.block]
+            _, flag = self.callback(data, len(data) // SAMPLE_WIDTH, {}, 0)
+            if flag != PA_CONTINUE:
+                break
+            if interval:
+                time.sleep(interval)
+
+    def start_stream(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='file-audio', daemon=True)
+        self._thread.start()
+
+    def is_active(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def stop_stream(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def close(self):
+        self.stop_stream()
@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+"""
+Audit Audio Recorder
+Keeps the audio each voter spoke at each step for dispute resolution. Capture loops
+hand PCM to record(), which only queues it; a background thread compresses ~1s chunks
+with zlib, appends them to <session_id>.audio and indexes every chunk by session and
+step in index.db, so one step can be read back by seeking to its chunks.
+
+Enabled by AUDIT_AUDIO_DIR; AUDIT_AUDIO_RETENTION_DAYS and AUDIT_AUDIO_MAX_MB bound
+what is kept on disk.
+
+Usage:
+    python audit_audio.py list [session_id]
+    python audit_audio.py export <session_id> <step> out.wav
+    python audit_audio.py purge
+"""
+import argparse
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+import wave
+import zlib
+from pathlib import Path
+
+from console_utils import safe_print, WARNING
+
+INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS chunks (
+    session_id TEXT,
+    step INTEGER,
+    seq INTEGER,
+    offset INTEGER,
+    length INTEGER,
+    pcm_bytes INTEGER,
+    rate INTEGER,
+    created REAL,
+    PRIMARY KEY (session_id, step, seq)
+)
+"""
+
+# Writes the recorder had to give up on, so `list` can show which steps are incomplete
+FAILURES_SCHEMA = """
+CREATE TABLE IF NOT EXISTS failures (
+    session_id TEXT,
+    step INTEGER,
+    count INTEGER NOT NULL,
+    last_error TEXT,
+    updated REAL,
+    PRIMARY KEY (session_id, step)
+)
+"""
+
+
+def _init_index(conn):
+    conn.execute(INDEX_SCHEMA)
+    conn.execute(FAILURES_SCHEMA)
+
+CHUNK_BYTES = 32000          # one second of 16 kHz 16-bit mono before compression
+COMPRESSION_LEVEL = 6
+MAX_SESSION_BYTES = 20 * 1024 * 1024
+QUEUE_SIZE = 1000
+ENFORCE_EVERY_STEPS = 10     # check retention and size limits after this many finished steps
+
+
+class AuditRecorder:
+    """Tee for captured PCM; record() never blocks, all compression and I/O is on one thread"""
+
+    def __init__(self, directory, retention_days=30.0, max_total_bytes=2 * 1024 ** 3,
+                 max_session_bytes=MAX_SESSION_BYTES):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.index_path = self.directory / 'index.db'
+        self.retention_seconds = retention_days * 86400
+        self.max_total_bytes = max_total_bytes
+        self.max_session_bytes = max_session_bytes
+        self.dropped = 0        # blocks lost because the writer fell behind
+        self.truncated = 0      # blocks past max_session_bytes
+        self.failed = 0         # queue items the writer could not store
+        self._queue = queue.Queue(maxsize=QUEUE_SIZE)
+        self._thread = None
+        self._start_lock = threading.Lock()
+        # Writer-thread state
+        self._pending = {}      # (session_id, step) -> [bytearray, rate, next seq]
+        self._written = {}      # session_id -> compressed bytes written
+        self._steps_ended = 0
+        self._conn = None
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='audit-audio', daemon=True)
+                self._thread.start()
+
+    def record(self, session_id, step, data, rate=16000):
+        """Queue a copy of one captured block for (session_id, step)"""
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(('data', session_id, step, bytes(data), rate))
+        except queue.Full:
+            self.dropped += 1
+
+    def end_step(self, session_id, step):
+        """Flush the partial chunk of a step once its listening window is over"""
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(('end', session_id, step, None, None))
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self, timeout=5.0):
+        """Wait until everything queued so far is on disk"""
+        if self._thread is None:
+            return True
+        done = threading.Event()
+        try:
+            self._queue.put(('flush', None, None, done, None), timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    # Writer thread
+
+    def _run(self):
+        self._conn = sqlite3.connect(str(self.index_path), timeout=10.0)
+        _init_index(self._conn)
+        self._conn.commit()
+        while True:
+            kind, session_id, step, payload, rate = self._queue.get()
+            try:
+                if kind == 'data':
+                    self._append(session_id, step, payload, rate)
+                elif kind == 'end':
+                    try:
+                        self._write_pending(session_id, step)
+                    finally:
+                        self._pending.pop((session_id, step), None)
+                        self._steps_ended += 1
+                    if self._steps_ended % ENFORCE_EVERY_STEPS == 0:
+                        self.enforce_limits()
+                elif kind == 'flush':
+                    for key in list(self._pending):
+                        try:
+                            self._write_pending(*key)
+                        except Exception as e:
+                            self._pending.pop(key, None)
+                            self._record_failure(*key, e)
+                    self._conn.commit()
+                    self.enforce_limits()
+            except Exception as e:
+                # Recording is best effort; it must never take down the voting flow.
+                # Drop what was buffered for the step rather than retry it on every block
+                self._pending.pop((session_id, step), None)
+                self._record_failure(session_id, step, e)
+            finally:
+                if kind == 'flush':
+                    payload.set()
+
+    def _record_failure(self, session_id, step, error):
+        """Count a failed write, warn on the first one and note it in the index"""
+        self.failed += 1
+        if self.failed == 1:
+            safe_print(f"⚠️ Audit audio write failed for session {session_id} step {step}: {error!r} "
+                       f"(further failures are counted in `audit_audio.py list`)", level=WARNING)
+        try:
+            self._conn.rollback()
+            self._conn.execute(
+                "INSERT INTO failures (session_id, step, count, last_error, updated) VALUES (?, ?, 1, ?, ?) "
+                "ON CONFLICT (session_id, step) DO UPDATE SET count = count + 1, "
+                "last_error = excluded.last_error, updated = excluded.updated",
+                (session_id or '', step if step is not None else 0, repr(error), time.time()))
+            self._conn.commit()
+        except Exception:
+            pass  # the index itself is failing; self.failed still counts it
+
+    def _append(self, session_id, step, data, rate):
+        pending = self._pending.get((session_id, step))
+        if pending is None:
+            seq = self._conn.execute("SELECT COALESCE(MAX(seq) + 1, 0) FROM chunks WHERE session_id = ? AND step = ?",
+                                     (session_id, step)).fetchone()[0]
+            pending = self._pending[(session_id, step)] = [bytearray(), rate, seq]
+        pending[0] += data
+        while len(pending[0]) >= CHUNK_BYTES:
+            self._write_pending(session_id, step, CHUNK_BYTES)
+
+    def _write_pending(self, session_id, step, size=None):
+        """Compress and append the first `size` pending bytes (all of them by default)"""
+        pending = self._pending.get((session_id, step))
+        if not pending or not pending[0]:
+            return
+        buffered, rate, seq = pending
+        pcm = buffered[:size] if size else buffered
+        path = self.directory / f"{session_id}.audio"
+        if self._written.get(session_id) is None:
+            self._written[session_id] = path.stat().st_size if path.exists() else 0
+        if self._written[session_id] >= self.max_session_bytes:
+            self.truncated += 1
+            del buffered[:len(pcm)]
+            return
+        blob = zlib.compress(bytes(pcm), COMPRESSION_LEVEL)
+        with open(path, 'ab') as f:
+            offset = f.tell()
+            f.write(blob)
+        self._written[session_id] += len(blob)
+        self._conn.execute("INSERT INTO chunks (session_id, step, seq, offset, length, pcm_bytes, rate, created) "
+                           "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                           (session_id, step, seq, offset, len(blob), len(pcm), rate, time.time()))
+        self._conn.commit()
+        del buffered[:len(pcm)]
+        pending[2] = seq + 1
+
+    def enforce_limits(self):
+        """Delete sessions past retention, then the oldest ones while over the size limit"""
+        on_writer = threading.current_thread() is self._thread
+        conn = self._conn if on_writer else sqlite3.connect(str(self.index_path), timeout=10.0)
+        try:
+            _init_index(conn)
+            sessions = conn.execute("SELECT session_id, MAX(created), SUM(length) FROM chunks "
+                                    "GROUP BY session_id ORDER BY MAX(created)").fetchall()
+            active = {key[0] for key in self._pending}
+            total = sum(size for _, _, size in sessions)
+            cutoff = time.time() - self.retention_seconds
+            removed = 0
+            for session_id, last_write, size in sessions:
+                if session_id in active:
+                    continue
+                if last_write >= cutoff and total <= self.max_total_bytes:
+                    break
+                conn.execute("DELETE FROM chunks WHERE session_id = ?", (session_id,))
+                conn.execute("DELETE FROM failures WHERE session_id = ?", (session_id,))
+                try:
+                    (self.directory / f"{session_id}.audio").unlink()
+                except FileNotFoundError:
+                    pass
+                self._written.pop(session_id, None)
+                total -= size
+                removed += 1
+            conn.commit()
+            return removed
+        finally:
+            if conn is not self._conn:
+                conn.close()
+
+
+def read_step(directory, session_id, step):
+    """Return (pcm, rate) for one step, decompressing only that step's chunks"""
+    directory = Path(directory)
+    conn = sqlite3.connect(str(directory / 'index.db'))
+    try:
+        chunks = conn.execute("SELECT offset, length, rate FROM chunks WHERE session_id = ? AND step = ? ORDER BY seq",
+                              (session_id, step)).fetchall()
+    finally:
+        conn.close()
+    if not chunks:
+        return b'', None
+    parts = []
+    with open(directory / f"{session_id}.audio", 'rb') as f:
+        for offset, length, _ in chunks:
+            f.seek(offset)
+            parts.append(zlib.decompress(f.read(length)))
+    return b''.join(parts), chunks[0][2]
+
+
+def list_sessions(directory, session_id=None):
+    """[(session_id, step, chunks, seconds, compressed bytes)] from the index"""
+    conn = sqlite3.connect(str(Path(directory) / 'index.db'))
+    try:
+        _init_index(conn)
+        query = ("SELECT session_id, step, COUNT(*), SUM(pcm_bytes) * 1.0 / (2 * MAX(rate)), SUM(length) "
+                 "FROM chunks {} GROUP BY session_id, step ORDER BY MIN(created), step")
+        if session_id:
+            return conn.execute(query.format("WHERE session_id = ?"), (session_id,)).fetchall()
+        return conn.execute(query.format("")).fetchall()
+    finally:
+        conn.close()
+
+
+def list_failures(directory, session_id=None):
+    """[(session_id, step, failed writes, last error)] recorded by the writer"""
+    conn = sqlite3.connect(str(Path(directory) / 'index.db'))
+    try:
+        _init_index(conn)
+        query = "SELECT session_id, step, count, last_error FROM failures {} ORDER BY updated"
+        if session_id:
+            return conn.execute(query.format("WHERE session_id = ?"), (session_id,)).fetchall()
+        return conn.execute(query.format("")).fetchall()
+    finally:
+        conn.close()
+
+
+def recorder_from_env(directory):
+    return AuditRecorder(
+        directory,
+        retention_days=float(os.environ.get('AUDIT_AUDIO_RETENTION_DAYS', '30')),
+        max_total_bytes=int(float(os.environ.get('AUDIT_AUDIO_MAX_MB', '2048')) * 1024 * 1024),
+    )
+
+
+_recorder = None
+_recorder_lock = threading.Lock()
+
+
+def get_audit_recorder():
+    """Process-wide recorder, or None unless AUDIT_AUDIO_DIR is set"""
+    global _recorder
+    directory = os.environ.get('AUDIT_AUDIO_DIR')
+    if not directory:
+        return None
+    with _recorder_lock:
+        if _recorder is None:
+            _recorder = recorder_from_env(directory)
+        return _recorder
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dir', default=os.environ.get('AUDIT_AUDIO_DIR', 'audit_audio'))
+    sub = parser.add_subparsers(dest='command', required=True)
+    list_parser = sub.add_parser('list')
+    list_parser.add_argument('session_id', nargs='?')
+    export = sub.add_parser('export')
+    export.add_argument('session_id')
+    export.add_argument('step', type=int)
+    export.add_argument('output')
+    sub.add_parser('purge')
+    args = parser.parse_args()
+
+    if args.command == 'list':
+        for session_id, step, chunks, seconds, size in list_sessions(args.dir, args.session_id):
+            print(f"{session_id}  step {step}  {seconds:6.1f}s  {chunks:4d} chunks  {size / 1024:8.1f} KiB")
+        failures = list_failures(args.dir, args.session_id)
+        if failures:
+            print(f"⚠️ {sum(f[2] for f in failures)} failed writes; this audio is incomplete:")
+            for session_id, step, count, last_error in failures:
+                print(f"{session_id}  step {step}  {count:4d} failed  last: {last_error}")
+    elif args.command == 'export':
+        pcm, rate = read_step(args.dir, args.session_id, args.step)
+        if not pcm:
+            print(f"No audio for session {args.session_id} step {args.step}")
+            return 1
+        with wave.open(args.output, 'wb') as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(rate)
+            wav.writeframes(pcm)
+        print(f"Wrote {len(pcm) / (2 * rate):.1f}s to {args.output}")
+    elif args.command == 'purge':
+        print(f"Removed {recorder_from_env(args.dir).enforce_limits()} sessions")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
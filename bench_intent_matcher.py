@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Intent Matcher Benchmark
+Measures compile time and transcripts/second of intent_matcher over a synthetic corpus,
+against the old regex-plus-linear-scan candidate parser
+
+Usage: python bench_intent_matcher.py [corpus size] [candidate count]   (default: 200000 3)
+"""
+import random
+import re
+import sys
+import time
+
+from intent_matcher import IntentMatcher, number_words, ordinal_words
+
+NAMES = ["Alice", "Bob", "Charlie", "Diana Rao", "Evan", "Farah Khan", "Gopal", "Hema", "Irfan", "Jaya Iyer"]
+
+TEMPLATES = [
+    "{n}", "{digit}", "number {n}", "candidate number {n}", "the {ordinal} one", "{ordinal}",
+    "i want to vote for {name}", "{name}", "um {n} please", "vote for {name}", "i think {n}",
+    "hello can you hear me", "what were the names again",
+]
+CONFIRM_CORPUS = ["confirm", "yes", "yes please", "no", "cancel", "do not confirm", "that's right",
+                  "go ahead", "wait what", "confirmed", "i confirm my vote"]
+
+
+def make_candidates(count):
+    return [(i + 1, NAMES[i % len(NAMES)] + ("" if i < len(NAMES) else f" {i}")) for i in range(count)]
+
+
+def make_corpus(candidates, size, seed=11):
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(size):
+        cid, name = rng.choice(candidates)
+        corpus.append(rng.choice(TEMPLATES).format(
+            n=number_words(cid), digit=cid, ordinal=ordinal_words(cid), name=name.lower()))
+    return corpus
+
+
+def legacy_parse(choice, candidates):
+    """The parser voice_subprocess used before intent_matcher"""
+    choice_match = re.search(r"(\d+)", choice)
+    if not choice_match:
+        return None
+    candidate_id = int(choice_match.group(1))
+    for cid, name in candidates:
+        if cid == candidate_id:
+            return cid
+    return None
+
+
+def rate(func, corpus):
+    start = time.perf_counter()
+    understood = sum(1 for text in corpus if func(text) is not None)
+    elapsed = time.perf_counter() - start
+    return len(corpus) / elapsed, understood
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    candidates = make_candidates(count)
+    corpus = make_corpus(candidates, size)
+
+    start = time.perf_counter()
+    matcher = IntentMatcher(candidates)
+    compile_ms = (time.perf_counter() - start) * 1000
+
+    print(f"Intent matcher benchmark: {size:,d} transcripts, {count} candidates")
+    print("=" * 60)
+    print(f"compile: {compile_ms:.2f}ms")
+
+    per_sec, understood = rate(lambda t: matcher.match_candidate(t)[0], corpus)
+    print(f"intent matcher : {per_sec:12,.0f} transcripts/s, understood {understood / size:6.1%}")
+    per_sec, understood = rate(lambda t: legacy_parse(t, candidates), corpus)
+    print(f"legacy regex   : {per_sec:12,.0f} transcripts/s, understood {understood / size:6.1%}")
+
+    confirmations = [random.Random(i).choice(CONFIRM_CORPUS) for i in range(size)]
+    per_sec, understood = rate(lambda t: matcher.match_confirmation(t)[0], confirmations)
+    print(f"confirmation   : {per_sec:12,.0f} transcripts/s, understood {understood / size:6.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Kiosk vs Web Deployment Benchmark
+Compares memory footprint and time to first prompt of the headless kiosk (one warm
+process for every voter) with the web deployment (Flask server plus a fresh voice
+worker process per voter). Both run the stub voice flow, so no microphone or TTS is
+needed; the browser the web deployment also needs is not measured.
+
+Usage: python bench_kiosk.py [--voters 5] [--time-scale 0.02]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from proc_stats import format_mb, rss_bytes
+
+HERE = Path(__file__).resolve().parent
+
+
+def run_kiosk(workdir, voters, time_scale, tag):
+    """Run kiosk.py --stub for `voters` voters; returns (report, seconds from spawn to first prompt)"""
+    report_path = Path(workdir) / f"kiosk_{tag}.json"
+    env = {**os.environ, 'VOTES_DB': str(Path(workdir) / 'votes.db'),
+           'METRICS_DB': str(Path(workdir) / 'metrics.db')}
+    spawned = time.time()
+    subprocess.run([sys.executable, str(HERE / 'kiosk.py'), '--stub', '--sessions', str(voters), '--wait', 'none',
+                    '--pause', '0', '--time-scale', str(time_scale), '--report', str(report_path)],
+                   cwd=workdir, env=env, check=True, capture_output=True)
+    report = json.loads(report_path.read_text())
+    return report, report['first_prompt_at'] - spawned
+
+
+def web_server_rss():
+    """RSS of a process that has imported the Flask app, or None without Flask"""
+    proc = subprocess.Popen([sys.executable, '-c', "import web_voting_app; print('ready', flush=True); input()"],
+                            cwd=HERE, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                            text=True)
+    try:
+        if proc.stdout.readline().strip() != 'ready':
+            return None
+        return rss_bytes(proc.pid)
+    finally:
+        proc.kill()
+        proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--voters', type=int, default=5)
+    parser.add_argument('--time-scale', type=float, default=0.02)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='voting_kiosk_') as workdir:
+        kiosk, kiosk_first = run_kiosk(workdir, args.voters, args.time_scale, 'warm')
+        warm = [s['first_prompt_seconds'] for s in kiosk['sessions'][1:] if s['first_prompt_seconds'] is not None]
+        # The web deployment starts a cold worker process for every voter
+        workers = [run_kiosk(workdir, 1, args.time_scale, f'cold{n}') for n in range(args.voters)]
+    server = web_server_rss()
+    worker_peak = max(report['peak_rss_bytes'] or 0 for report, _ in workers) or None
+    web_total = server + worker_peak if server and worker_peak else None
+
+    print("Kiosk vs web deployment (stub voice flow)")
+    print("=" * 60)
+    print(f"kiosk, one process for {args.voters} voters")
+    print(f"  first prompt      {kiosk_first:.3f}s after start")
+    if warm:
+        print(f"  later voters      first prompt p50 {statistics.median(warm) * 1000:.2f}ms")
+    print(f"  peak RSS          {format_mb(kiosk['peak_rss_bytes'])}")
+    print("web, Flask server + one worker process per voter")
+    print(f"  first prompt      p50 {statistics.median(t for _, t in workers):.3f}s after worker spawn, every voter")
+    print(f"  worker peak RSS   {format_mb(worker_peak)}")
+    print(f"  server RSS        {format_mb(server)}" + ("" if server else " (Flask not installed)"))
+    print(f"  total             {format_mb(web_total)} + browser")
+
+
+if __name__ == "__main__":
+    main()
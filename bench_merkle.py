@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Merkle Ledger Benchmark
+Measures ledger build time, single-vote append, root retrieval, inclusion proof
+generation and proof verification against vote-table size
+
+Usage: python bench_merkle.py [vote counts...]   (default: 10000 1000000 10000000)
+"""
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import db
+from bench_suite import seed_database
+from merkle_ledger import MerkleLedger, ledger_path, verify_proof
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def timed_ms(func, runs):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def run(size, workdir, queries=500):
+    catalog = Path(workdir) / f"votes_{size}.db"
+    start = time.perf_counter()
+    seed_database(catalog, size, ledger=False)
+    path = db.election_path()
+    print(f"  seeded {size:,d} votes in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+
+    ledger = MerkleLedger(ledger_path(path))
+    start = time.perf_counter()
+    ledger.sync(path)
+    build_s = time.perf_counter() - start
+
+    # One vote arriving on a full ledger, as record_vote does it
+    conn = sqlite3.connect(path)
+
+    def append_one():
+        ledger.lock()
+        cur = conn.execute("INSERT INTO votes (voter_token, candidate_id) VALUES ('BENCH', 1)")
+        conn.commit()
+        ledger.append(conn, cur.lastrowid)
+        ledger.commit()
+    append = timed_ms(append_one, 50)
+    conn.close()
+
+    root = timed_ms(ledger.root, 1000)
+    rng = random.Random(size)
+    vote_ids = [rng.randint(1, size) for _ in range(queries)]
+    proofs = []
+    proof_ms = []
+    for vote_id in vote_ids:
+        start = time.perf_counter()
+        proofs.append(ledger.proof(vote_id, path))
+        proof_ms.append((time.perf_counter() - start) * 1000)
+    verify_ms = []
+    for proof in proofs:
+        start = time.perf_counter()
+        assert verify_proof(proof)
+        verify_ms.append((time.perf_counter() - start) * 1000)
+    ledger.close()
+
+    ledger_mb = ledger_path(path).stat().st_size / 1e6
+    print(f"{size:>11,d} votes | build {build_s:8.2f}s ({size / build_s:,.0f} votes/s, {ledger_mb:,.0f}MB) | "
+          f"append p50 {percentile(append, 50):.2f}ms | root p50 {percentile(root, 50) * 1000:.1f}us | "
+          f"proof p50 {percentile(proof_ms, 50):.3f}ms p99 {percentile(proof_ms, 99):.3f}ms | "
+          f"verify p50 {percentile(verify_ms, 50):.3f}ms ({len(proofs[0]['path'])} hashes)")
+    for leftover in (catalog, path, ledger_path(path)):
+        leftover.unlink()
+
+
+def main():
+    sizes = [int(a) for a in sys.argv[1:]] or [10000, 1000000, 10000000]
+    print("Merkle ledger build and proof cost vs vote count")
+    print("=" * 60)
+    original_path = db.DB_PATH
+    try:
+        with tempfile.TemporaryDirectory(prefix='voting_merkle_') as workdir:
+            for size in sizes:
+                run(size, workdir)
+    finally:
+        db.DB_PATH = original_path
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark Suite
+Times db.py and the parsing hot paths at several vote-table sizes, stores the
+results as a JSON baseline, and flags regressions against an earlier baseline
+
+Usage:
+    python bench_suite.py run [--sizes 1000 100000 10000000] [--save bench_baseline.json]
+                              [--compare bench_baseline.json] [--threshold 0.15]
+    python bench_suite.py compare bench_baseline.json bench_current.json [--threshold 0.15]
+"""
+import argparse
+import io
+import json
+import platform
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import db
+from console_utils import INFO, LogPipeline, to_console_safe
+from intent_matcher import IntentMatcher
+from voter_index import VoterIndex, SPOKEN_ALIASES
+
+DEFAULT_SIZES = [1000, 100000, 10000000]
+DEFAULT_THRESHOLD = 0.15
+
+
+def measure(func, repeat=5, number=1):
+    """Return per-call timings in microseconds over `repeat` rounds of `number` calls"""
+    rounds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        rounds.append((time.perf_counter() - start) * 1e6 / number)
+    return {
+        'median_us': round(statistics.median(rounds), 3),
+        'min_us': round(min(rounds), 3),
+        'calls': repeat * number,
+    }
+
+
+def seed_database(path, votes, chunk=100000, ledger=True):
+    """Create a database with `votes` rows spread over the demo candidates
+
+    With ledger the Merkle ledger is built too, as `python db.py init` would,
+    so record_vote is measured appending one leaf rather than the backlog.
+    """
+    db.DB_PATH = path
+    db.init_db()
+    rng = random.Random(votes)
+    conn = sqlite3.connect(db.election_path())
+    remaining = votes
+    while remaining > 0:
+        n = min(chunk, remaining)
+        conn.executemany("INSERT INTO votes (voter_token, candidate_id) VALUES (?,?)",
+                         ((f"VOTER{remaining - i}", rng.randint(1, 3)) for i in range(n)))
+        conn.commit()
+        remaining -= n
+    conn.close()
+    if ledger:
+        db.build_ledger()
+
+
+def bench_database(size, workdir):
+    path = Path(workdir) / f"votes_{size}.db"
+    start = time.perf_counter()
+    seed_database(path, size)
+    print(f"  seeded {size:,d} votes in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+
+    # Full-table scans get fewer rounds at large sizes
+    scan_repeat = 5 if size <= 100000 else 3
+    results = {
+        'init_db': measure(db.init_db, repeat=5, number=5),
+        'get_candidates': measure(db.get_candidates, repeat=5, number=50),
+        'get_votes': measure(db.get_votes, repeat=scan_repeat),
+        'record_vote': measure(lambda: db.record_vote("BENCH", 2), repeat=5, number=20),
+    }
+    # The catalog, the election's file and its ledger
+    for leftover in Path(workdir).glob(f"{path.stem}.*"):
+        leftover.unlink()
+    return results
+
+
+def bench_parsers():
+    voters = VoterIndex()
+    voters.add("first one", SPOKEN_ALIASES["first one"])
+    for n in range(1, 1001):
+        voters.add(f"TEST{n}")
+    voter_phrases = ["first one", "firs tone", "test four two", "my id is first one", "hello world"]
+
+    matcher = IntentMatcher([(1, 'Alice'), (2, 'Bob'), (3, 'Charlie')])
+    choice_phrases = ["two", "number three", "i want to vote for bob", "the first one", "pardon"]
+    confirm_phrases = ["confirm", "yes please", "do not confirm", "what"]
+
+    return {
+        'voter_id_parse': measure(lambda: [voters.match(p) for p in voter_phrases], number=200),
+        'candidate_parse': measure(lambda: [matcher.match_candidate(p) for p in choice_phrases], number=500),
+        'confirmation_parse': measure(lambda: [matcher.match_confirmation(p) for p in confirm_phrases], number=500),
+        'intent_compile': measure(lambda: IntentMatcher([(1, 'Alice'), (2, 'Bob'), (3, 'Charlie')]), number=50),
+    }
+
+
+def bench_safe_print():
+    line = "🎤 Listening attempt #3, 1.5s remaining... 🗣️ Partial result: 'first one'"
+    pipeline = LogPipeline(stream=io.StringIO())
+    results = {
+        # Caller-side cost only: formatting and I/O happen on the writer thread
+        'safe_print': measure(lambda: pipeline.log(INFO, line), number=2000),
+        'safe_print_rate_limited': measure(lambda: pipeline.log(INFO, line, rate_key='bench', per_second=10), number=2000),
+        'emoji_fallback': measure(lambda: to_console_safe(line), number=2000),
+    }
+    pipeline.flush()
+    return results
+
+
+def run_suite(sizes):
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='voting_bench_') as workdir:
+        original_path = db.DB_PATH
+        try:
+            for size in sizes:
+                print(f"Database benchmarks at {size:,d} votes...", file=sys.stderr)
+                for name, timing in bench_database(size, workdir).items():
+                    results[f"{name}@{size}"] = timing
+        finally:
+            db.DB_PATH = original_path
+    print("Parser and console benchmarks...", file=sys.stderr)
+    results.update(bench_parsers())
+    results.update(bench_safe_print())
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'sqlite': sqlite3.sqlite_version,
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'sizes': sizes,
+        },
+        'results': results,
+    }
+
+
+def compare(baseline, current, threshold):
+    """Return (rows, regressions) comparing median timings"""
+    rows = []
+    regressions = []
+    for name in sorted(set(baseline['results']) | set(current['results'])):
+        old = baseline['results'].get(name)
+        new = current['results'].get(name)
+        if old is None or new is None:
+            rows.append((name, old and old['median_us'], new and new['median_us'], None, 'missing'))
+            continue
+        ratio = new['median_us'] / old['median_us'] if old['median_us'] else float('inf')
+        if ratio > 1 + threshold:
+            verdict = 'REGRESSION'
+            regressions.append(name)
+        elif ratio < 1 - threshold:
+            verdict = 'faster'
+        else:
+            verdict = 'ok'
+        rows.append((name, old['median_us'], new['median_us'], ratio, verdict))
+    return rows, regressions
+
+
+def print_comparison(rows, threshold):
+    print(f"{'benchmark':<28} {'baseline us':>14} {'current us':>14} {'ratio':>8}  verdict (threshold {threshold:.0%})")
+    print("-" * 86)
+    for name, old, new, ratio, verdict in rows:
+        fmt = lambda v: f"{v:14.2f}" if v is not None else f"{'-':>14}"
+        ratio_text = f"{ratio:8.2f}" if ratio is not None else f"{'-':>8}"
+        print(f"{name:<28} {fmt(old)} {fmt(new)} {ratio_text}  {verdict}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest='command', required=True)
+    run = sub.add_parser('run', help='run the suite')
+    run.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    run.add_argument('--save', help='write results to this JSON file')
+    run.add_argument('--compare', help='baseline JSON to compare against')
+    run.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+    cmp_parser = sub.add_parser('compare', help='compare two saved result files')
+    cmp_parser.add_argument('baseline')
+    cmp_parser.add_argument('current')
+    cmp_parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        current = run_suite(args.sizes)
+        if args.save:
+            Path(args.save).write_text(json.dumps(current, indent=2, sort_keys=True) + '\n')
+            print(f"Saved results to {args.save}", file=sys.stderr)
+        if not args.compare:
+            print(json.dumps(current, indent=2, sort_keys=True))
+            return 0
+        baseline = json.loads(Path(args.compare).read_text())
+    else:
+        baseline = json.loads(Path(args.baseline).read_text())
+        current = json.loads(Path(args.current).read_text())
+
+    rows, regressions = compare(baseline, current, args.threshold)
+    print_comparison(rows, args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+        return 1
+    print("\nNo regressions.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Voter Index Benchmark
+Measures build time, lookup latency and accuracy of voter_index against roll size.
+For each query set it reports how often the right voter ranks first (top-1), how
+often match() accepts a voter without confirmation, and how often it accepts the
+wrong one - a wrong accept records a vote under someone else's ID.
+
+Usage: python bench_voter_index.py [roll sizes...]   (default: 1000 10000 100000 1000000)
+"""
+import random
+import sys
+import time
+
+from voter_index import VoterIndex, freeze_index, spoken_words
+
+SURNAMES = ["patel", "kumar", "singh", "reddy", "iyer", "khan", "das", "nair", "rao", "shah",
+            "gupta", "mehta", "joshi", "bose", "sen", "kallur", "pillai", "menon", "verma", "jain"]
+
+# Words ASR commonly substitutes for spoken digits
+MISHEARD = {"one": "won", "two": "to", "four": "for", "eight": "ate", "five": "fife"}
+
+
+def make_roll(size, seed=7):
+    """Generate deterministic voter IDs like PATEL042137"""
+    rng = random.Random(seed)
+    width = max(4, len(str(size)))
+    return [f"{rng.choice(SURNAMES).upper()}{n:0{width}d}" for n in range(size)]
+
+
+def mishear(voter_id, rng):
+    """Return a transcript with one digit word swapped for a sound-alike"""
+    words = spoken_words(voter_id)
+    slots = [i for i, w in enumerate(words) if w in MISHEARD]
+    if slots:
+        i = rng.choice(slots)
+        words[i] = MISHEARD[words[i]]
+    return " ".join(words)
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def time_lookups(index, transcripts, expected):
+    """Return (latencies in ms, top-1 correct, accepted, wrongly accepted)"""
+    samples = []
+    top1 = accepted = wrong = 0
+    for transcript, voter_id in zip(transcripts, expected):
+        start = time.perf_counter()
+        ranked = index.lookup(transcript)
+        samples.append((time.perf_counter() - start) * 1000)
+        top1 += bool(ranked) and ranked[0][0] == voter_id
+        match = index.match(transcript)
+        accepted += match is not None
+        wrong += match is not None and match != voter_id
+    return samples, top1, accepted, wrong
+
+
+def report(label, samples, top1, accepted, wrong, queries):
+    return (f"{label} p50 {percentile(samples, 50):.3f}ms p99 {percentile(samples, 99):.3f}ms "
+            f"top-1 {top1}/{queries} accepted {accepted} wrong {wrong}")
+
+
+def run(size, queries=500):
+    rng = random.Random(size)
+    roll = make_roll(size)
+
+    start = time.perf_counter()
+    index = VoterIndex()
+    for voter_id in roll:
+        index.add(voter_id)
+    build_s = time.perf_counter() - start
+
+    # Incremental add cost once the index is already large
+    start = time.perf_counter()
+    for n in range(100):
+        index.add(f"NEWVOTER{n:04d}")
+    add_us = (time.perf_counter() - start) * 1e6 / 100
+    freeze_index()  # as get_voter_index() does after loading the roll
+
+    # Only IDs with a digit that has a sound-alike, so every fuzzy query really is misheard
+    sample = [rng.choice(roll) for _ in range(queries)]
+    fuzzy_sample = []
+    while len(fuzzy_sample) < queries:
+        voter_id = rng.choice(roll)
+        if any(w in MISHEARD for w in spoken_words(voter_id)):
+            fuzzy_sample.append(voter_id)
+    exact = time_lookups(index, [" ".join(spoken_words(v)) for v in sample], sample)
+    fuzzy = time_lookups(index, [mishear(v, rng) for v in fuzzy_sample], fuzzy_sample)
+    missing = time_lookups(index, ["hello world this is nobody"] * queries, [None] * queries)
+
+    print(f"{size:>9,d} voters | build {build_s:7.2f}s | add {add_us:6.1f}us")
+    print(f"    {report('exact', *exact, queries)}")
+    print(f"    {report('fuzzy', *fuzzy, queries)}")
+    print(f"    {report('miss ', *missing, queries)}")
+
+
+def main():
+    sizes = [int(a) for a in sys.argv[1:]] or [1000, 10000, 100000, 1000000]
+    print("Voter index lookup latency vs roll size")
+    print("=" * 60)
+    for size in sizes:
+        run(size)
+
+
+if __name__ == "__main__":
+    main()
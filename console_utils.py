@@ -1,46 +1,225 @@
-# Windows console compatibility utilities
+# Windows console compatibility utilities and the background logging pipeline
+import atexit
+import os
+import queue
 import sys
+import threading
+import time
 
-def safe_print(text):
-    """Safely print text with emoji fallbacks for Windows compatibility"""
-    try:
-        print(text)
-    except UnicodeEncodeError:
-        # Replace common emojis with ASCII alternatives for Windows compatibility
-        emoji_map = {
-            '🎤': '[MIC]',
-            '🤖': '[BOT]',
-            '❌': '[X]',
-            '✅': '[OK]',
-            '🔧': '[TOOL]',
-            '🔄': '[LOADING]',
-            '⚠️': '[WARN]',
-            '🗣️': '[VOICE]',
-            '🏁': '[DONE]',
-            '🛑': '[STOP]',
-            '🌐': '[WEB]',
-            '📡': '[SIGNAL]',
-            '⏰': '[TIME]',
-            '🔍': '[SEARCH]',
-            '📊': '[CHART]',
-            '👋': '[WAVE]',
-            '█': '#',
-            '░': '-',
-            '🔊': '[SPEAKER]',
-            '🎯': '[TARGET]',
-            '💡': '[IDEA]',
-            '⭐': '[STAR]',
-            '🚀': '[ROCKET]',
-            '📝': '[NOTE]',
-            '🎵': '[MUSIC]'
-        }
-        safe_text = text
-        for emoji, replacement in emoji_map.items():
-            safe_text = safe_text.replace(emoji, replacement)
+DEBUG, INFO, WARNING, ERROR = 10, 20, 30, 40
+LEVEL_NAMES = {DEBUG: 'DEBUG', INFO: 'INFO', WARNING: 'WARN', ERROR: 'ERROR'}
+LEVELS_BY_NAME = {'DEBUG': DEBUG, 'INFO': INFO, 'WARN': WARNING, 'WARNING': WARNING, 'ERROR': ERROR}
+
+# ASCII stand-ins for the emojis we log, used when the console cannot encode them
+EMOJI_FALLBACKS = {
+    '🎤': '[MIC]',
+    '🤖': '[BOT]',
+    '❌': '[X]',
+    '✅': '[OK]',
+    '🔧': '[TOOL]',
+    '🔄': '[LOADING]',
+    '⚠': '[WARN]',
+    '🗣': '[VOICE]',
+    '🏁': '[DONE]',
+    '🛑': '[STOP]',
+    '🌐': '[WEB]',
+    '📡': '[SIGNAL]',
+    '⏰': '[TIME]',
+    '🔍': '[SEARCH]',
+    '📊': '[CHART]',
+    '👋': '[WAVE]',
+    '█': '#',
+    '░': '-',
+    '🔊': '[SPEAKER]',
+    '🎯': '[TARGET]',
+    '💡': '[IDEA]',
+    '⭐': '[STAR]',
+    '🚀': '[ROCKET]',
+    '📝': '[NOTE]',
+    '🎵': '[MUSIC]',
+    '📈': '[CHART]',
+    '️': '',  # emoji presentation selector that follows ⚠ and 🗣
+}
+EMOJI_TABLE = str.maketrans(EMOJI_FALLBACKS)
+
+# Messages waiting beyond this are dropped (and counted) rather than blocking the caller
+QUEUE_SIZE = 10000
+
+
+def to_console_safe(text):
+    """Replace emojis with ASCII alternatives and drop anything else non-ASCII"""
+    return text.translate(EMOJI_TABLE).encode('ascii', 'replace').decode('ascii')
+
+
+class _RateLimit:
+    """Token bucket per message key; remembers how many messages it swallowed"""
+
+    def __init__(self, per_second):
+        self.per_second = per_second
+        self.tokens = per_second
+        self.updated = time.monotonic()
+        self.suppressed = 0
+
+
+class LogPipeline:
+    """Queue-backed logger: callers enqueue, one writer thread does all console and file I/O"""
+
+    def __init__(self, level=INFO, stream=None, path=None):
+        self.level = level
+        self.stream = stream
+        self.path = path
+        self.context = {}
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=QUEUE_SIZE)
+        self._limits = {}
+        self._limits_lock = threading.Lock()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._file = None
+
+    def set_context(self, **context):
+        """Attach key=value pairs (e.g. session) to every following line; None removes a key"""
+        for key, value in context.items():
+            if value is None:
+                self.context.pop(key, None)
+            else:
+                self.context[key] = value
+
+    def _allow(self, rate_key, per_second):
+        """Return (allowed, suppressed-since-last-allowed) for a rate-limited message"""
+        now = time.monotonic()
+        with self._limits_lock:
+            limit = self._limits.get(rate_key)
+            if limit is None or limit.per_second != per_second:
+                limit = self._limits[rate_key] = _RateLimit(per_second)
+            limit.tokens = min(per_second, limit.tokens + (now - limit.updated) * per_second)
+            limit.updated = now
+            if limit.tokens < 1:
+                limit.suppressed += 1
+                return False, 0
+            limit.tokens -= 1
+            suppressed, limit.suppressed = limit.suppressed, 0
+            return True, suppressed
+
+    def log(self, level, message, end='\n', rate_key=None, per_second=None):
+        """Enqueue a message; never blocks on console or file I/O"""
+        if level < self.level:
+            return
+        if rate_key is not None and per_second:
+            allowed, suppressed = self._allow(rate_key, per_second)
+            if not allowed:
+                return
+            if suppressed:
+                message = f"{message} (+{suppressed} similar suppressed)"
+        self._ensure_started()
         try:
-            print(safe_text.encode('ascii', 'replace').decode('ascii'))
-        except:
-            print(safe_text.encode('utf-8', 'replace').decode('utf-8', 'replace'))
+            self._queue.put_nowait((time.time(), level, dict(self.context), message, end))
+        except queue.Full:
+            self.dropped += 1
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='log-writer', daemon=True)
+                self._thread.start()
+
+    def _format(self, ts, level, context, message, end):
+        if end != '\n':
+            # Live-updating lines such as the audio level meter are written raw
+            return message + end
+        prefix = time.strftime('%H:%M:%S', time.localtime(ts)) + f".{int(ts % 1 * 1000):03d} {LEVEL_NAMES.get(level, level):<5}"
+        tags = ''.join(f" [{k}={v}]" for k, v in context.items())
+        return f"{prefix}{tags} {message}\n"
+
+    def _write(self, text):
+        stream = self.stream or sys.stdout
+        try:
+            stream.write(text)
+        except UnicodeEncodeError:
+            try:
+                stream.write(to_console_safe(text))
+            except Exception:
+                pass
+        except Exception:
+            pass
+        if self.path:
+            try:
+                if self._file is None:
+                    self._file = open(self.path, 'a', encoding='utf-8')
+                self._file.write(text)
+            except Exception:
+                pass
+
+    def _flush_outputs(self):
+        for f in (self.stream or sys.stdout, self._file):
+            try:
+                if f is not None:
+                    f.flush()
+            except Exception:
+                pass
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            batch = [item]
+            # Drain whatever else is waiting so one flush covers many lines
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            for entry in batch:
+                if isinstance(entry, threading.Event):
+                    self._flush_outputs()
+                    entry.set()
+                    continue
+                self._write(self._format(*entry))
+            self._flush_outputs()
+
+    def flush(self, timeout=2.0):
+        """Wait until everything logged so far has been written"""
+        if self._thread is None:
+            return True
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+
+# LOG_LEVEL and LOG_FILE configure the process-wide pipeline
+_pipeline = LogPipeline(level=LEVELS_BY_NAME.get(os.environ.get('LOG_LEVEL', 'INFO').upper(), INFO),
+                        path=os.environ.get('LOG_FILE'))
+atexit.register(_pipeline.flush)
+
+
+def configure_logging(level=None, path=None, stream=None):
+    """Change the level or add a log file / stream for the process-wide pipeline"""
+    if level is not None:
+        _pipeline.level = level
+    if path is not None:
+        _pipeline.path = path
+    if stream is not None:
+        _pipeline.stream = stream
+
+
+def set_log_context(**context):
+    """Tag every following log line, e.g. set_log_context(session=session_id)"""
+    _pipeline.set_context(**context)
+
+
+def flush_logs(timeout=2.0):
+    """Block until queued log lines are written (call before exiting abruptly)"""
+    return _pipeline.flush(timeout)
+
+
+def safe_print(text, level=INFO, end='\n', rate_key=None, per_second=None):
+    """Log text through the background pipeline with emoji fallbacks for Windows consoles"""
+    _pipeline.log(level, str(text), end=end, rate_key=rate_key, per_second=per_second)
+
 
 def enable_utf8_console():
     """Attempt to enable UTF-8 support on Windows console"""
@@ -50,4 +229,4 @@ def enable_utf8_console():
             import subprocess
             subprocess.run(['chcp', '65001'], shell=True, capture_output=True)
     except:
-        pass
\ No newline at end of file
+        pass
@@ -1,9 +1,21 @@
+import os
+import re
+import secrets
 import sqlite3
+import stat
+import time
 from pathlib import Path
+from console_utils import safe_print, WARNING
+from merkle_ledger import MerkleLedger, ledger_path
+from metrics import timed
 
-DB_PATH = Path(__file__).parent / "votes.db"
+# VOTES_DB lets load and soak tests run against a scratch database
+DB_PATH = Path(os.environ.get("VOTES_DB", Path(__file__).parent / "votes.db"))
 
-SCHEMA = [
+# votes.db is the catalog: the voter roll and the list of elections. Each election's
+# candidates, votes and tallies live in their own file next to it (votes.<id>.db),
+# attached to a connection only when that election is queried.
+CATALOG_SCHEMA = [
     """
     CREATE TABLE IF NOT EXISTS voters (
         id TEXT PRIMARY KEY,
@@ -11,6 +23,24 @@ SCHEMA = [
     )
     """,
 
+    """
+    CREATE TABLE IF NOT EXISTS elections (
+        id TEXT PRIMARY KEY,
+        name TEXT,
+        status TEXT NOT NULL DEFAULT 'open',
+        is_active INTEGER NOT NULL DEFAULT 0,
+        created REAL,
+        archived REAL,
+        votes INTEGER,
+        ledger_root TEXT
+    )
+    """,
+
+    # At most one election takes votes
+    "CREATE UNIQUE INDEX IF NOT EXISTS elections_active ON elections (is_active) WHERE is_active = 1",
+]
+
+SCHEMA = [
     """
     CREATE TABLE IF NOT EXISTS candidates (
         id INTEGER PRIMARY KEY,
@@ -23,45 +53,564 @@ SCHEMA = [
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         voter_token TEXT,
         candidate_id INTEGER,
-        ts DATETIME DEFAULT CURRENT_TIMESTAMP
+        ts DATETIME DEFAULT CURRENT_TIMESTAMP,
+        salt TEXT DEFAULT (lower(hex(randomblob(8))))
     )
+    """,
+
+    # Turnout rollups: votes per UTC minute/hour bucket and candidate, kept current
+    # by the triggers below so time-series reads never scan the votes table
+    """
+    CREATE TABLE IF NOT EXISTS turnout_minute (
+        bucket TEXT,
+        candidate_id INTEGER,
+        votes INTEGER NOT NULL,
+        PRIMARY KEY (bucket, candidate_id)
+    ) WITHOUT ROWID
+    """,
+
+    """
+    CREATE TABLE IF NOT EXISTS turnout_hour (
+        bucket TEXT,
+        candidate_id INTEGER,
+        votes INTEGER NOT NULL,
+        PRIMARY KEY (bucket, candidate_id)
+    ) WITHOUT ROWID
+    """,
+
+    """
+    CREATE TRIGGER IF NOT EXISTS votes_turnout_rollup AFTER INSERT ON votes
+    BEGIN
+        INSERT INTO turnout_minute (bucket, candidate_id, votes)
+        VALUES (strftime('%Y-%m-%d %H:%M', NEW.ts), NEW.candidate_id, 1)
+        ON CONFLICT (bucket, candidate_id) DO UPDATE SET votes = votes + 1;
+        INSERT INTO turnout_hour (bucket, candidate_id, votes)
+        VALUES (strftime('%Y-%m-%d %H:00', NEW.ts), NEW.candidate_id, 1)
+        ON CONFLICT (bucket, candidate_id) DO UPDATE SET votes = votes + 1;
+    END
+    """,
+
+    # A corrected or removed vote moves out of its buckets, so the rollups always
+    # match a GROUP BY over votes (see backfill_turnout)
+    """
+    CREATE TRIGGER IF NOT EXISTS votes_turnout_delete AFTER DELETE ON votes
+    BEGIN
+        UPDATE turnout_minute SET votes = votes - 1
+        WHERE bucket = strftime('%Y-%m-%d %H:%M', OLD.ts) AND candidate_id = OLD.candidate_id;
+        UPDATE turnout_hour SET votes = votes - 1
+        WHERE bucket = strftime('%Y-%m-%d %H:00', OLD.ts) AND candidate_id = OLD.candidate_id;
+        DELETE FROM turnout_minute WHERE votes <= 0;
+        DELETE FROM turnout_hour WHERE votes <= 0;
+    END
+    """,
+
+    """
+    CREATE TRIGGER IF NOT EXISTS votes_turnout_update AFTER UPDATE OF candidate_id, ts ON votes
+    BEGIN
+        UPDATE turnout_minute SET votes = votes - 1
+        WHERE bucket = strftime('%Y-%m-%d %H:%M', OLD.ts) AND candidate_id = OLD.candidate_id;
+        UPDATE turnout_hour SET votes = votes - 1
+        WHERE bucket = strftime('%Y-%m-%d %H:00', OLD.ts) AND candidate_id = OLD.candidate_id;
+        DELETE FROM turnout_minute WHERE votes <= 0;
+        DELETE FROM turnout_hour WHERE votes <= 0;
+        INSERT INTO turnout_minute (bucket, candidate_id, votes)
+        VALUES (strftime('%Y-%m-%d %H:%M', NEW.ts), NEW.candidate_id, 1)
+        ON CONFLICT (bucket, candidate_id) DO UPDATE SET votes = votes + 1;
+        INSERT INTO turnout_hour (bucket, candidate_id, votes)
+        VALUES (strftime('%Y-%m-%d %H:00', NEW.ts), NEW.candidate_id, 1)
+        ON CONFLICT (bucket, candidate_id) DO UPDATE SET votes = votes + 1;
+    END
     """
 ]
 
-def init_db():
+TURNOUT_TABLES = {'minute': 'turnout_minute', 'hour': 'turnout_hour'}
+TURNOUT_FORMATS = {'minute': '%Y-%m-%d %H:%M', 'hour': '%Y-%m-%d %H:00'}
+
+# Election ids become file names
+ELECTION_ID = re.compile(r'[A-Za-z0-9][A-Za-z0-9_-]{0,63}')
+# Votes of a database from before elections were partitioned move here
+DEFAULT_ELECTION = 'default'
+DEMO_CANDIDATES = [(1, 'Alice'), (2, 'Bob'), (3, 'Charlie')]
+
+def election_path(election=None):
+    """votes.db -> votes.<election>.db; the active election by default"""
+    if election is None:
+        election = active_election()
+    return DB_PATH.with_name(f"{DB_PATH.stem}.{election}.db")
+
+def active_election():
+    """Id of the election taking votes; LookupError if there is none"""
     conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    for stmt in SCHEMA:
-        cur.execute(stmt)
+    try:
+        row = conn.execute("SELECT id FROM elections WHERE is_active = 1").fetchone()
+    finally:
+        conn.close()
+    if row is None:
+        raise LookupError("No active election; start one with `python db.py election new <id>`")
+    return row[0]
+
+def _attach(conn, election=None):
+    """Attach an election's file to a catalog connection; returns the election id
+
+    The catalog has no candidates, votes or turnout tables, so unqualified names in
+    queries resolve to the attached election. Archived elections attach read-only.
+    """
+    if election is None:
+        row = conn.execute("SELECT id, status FROM elections WHERE is_active = 1").fetchone()
+        if row is None:
+            raise LookupError("No active election; start one with `python db.py election new <id>`")
+    else:
+        row = conn.execute("SELECT id, status FROM elections WHERE id = ?", (election,)).fetchone()
+        if row is None:
+            raise LookupError(f"No election {election!r}")
+    election, status = row
+    path = election_path(election)
+    if status == 'archived':
+        conn.execute("ATTACH DATABASE ? AS election", (path.resolve().as_uri() + '?mode=ro',))
+    else:
+        conn.execute("ATTACH DATABASE ? AS election", (str(path),))
+    return election
+
+def _connect(election=None):
+    """Catalog connection with `election` (default: the active one) attached"""
+    conn = sqlite3.connect(DB_PATH, uri=True)
+    try:
+        _attach(conn, election)
+    except Exception:
+        conn.close()
+        raise
+    return conn
+
+def _init_election_file(path, candidates=()):
+    """Create or upgrade an election's tables in its own file"""
+    conn = sqlite3.connect(path)
+    try:
+        for stmt in SCHEMA:
+            conn.execute(stmt)
+        # Ledger leaves commit to each vote under a per-vote salt (the voter's receipt code)
+        _add_salt_column(conn)
+        conn.executemany("INSERT OR IGNORE INTO candidates (id, name) VALUES (?,?)", candidates)
+        conn.commit()
+    finally:
+        conn.close()
 
-    # Demo data
-    cur.execute("INSERT OR IGNORE INTO voters (id, name) VALUES ('TEST1','Demo Voter')")
-    cur.execute("INSERT OR IGNORE INTO candidates (id, name) VALUES (1,'Alice')")
-    cur.execute("INSERT OR IGNORE INTO candidates (id, name) VALUES (2,'Bob')")
-    cur.execute("INSERT OR IGNORE INTO candidates (id, name) VALUES (3,'Charlie')")
+def _add_salt_column(conn, schema='main'):
+    columns = [row[1] for row in conn.execute(f"PRAGMA {schema}.table_info(votes)")]
+    if 'salt' not in columns:
+        conn.execute(f"ALTER TABLE {schema}.votes ADD COLUMN salt TEXT")
+        conn.execute(f"UPDATE {schema}.votes SET salt = lower(hex(randomblob(8)))")
 
+def _migrate_single_file(conn):
+    """Move the votes, candidates and tallies of a pre-election votes.db into election 'default'
+
+    Vote ids, timestamps and salts are kept, so receipts and the Merkle ledger
+    (moved alongside) stay valid.
+    """
+    path = election_path(DEFAULT_ELECTION)
+    _add_salt_column(conn)
     conn.commit()
-    conn.close()
+    _init_election_file(path)
+    conn.execute("ATTACH DATABASE ? AS election", (str(path),))
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("INSERT OR IGNORE INTO election.candidates (id, name) SELECT id, name FROM main.candidates")
+        # The election's trigger rebuilds its turnout rollups as the votes arrive
+        conn.execute("INSERT INTO election.votes (id, voter_token, candidate_id, ts, salt) "
+                     "SELECT id, voter_token, candidate_id, ts, salt FROM main.votes ORDER BY id")
+        conn.execute("DROP TRIGGER IF EXISTS main.votes_turnout_rollup")
+        for table in ('votes', 'candidates', *TURNOUT_TABLES.values()):
+            conn.execute(f"DROP TABLE IF EXISTS main.{table}")
+        conn.execute("INSERT OR IGNORE INTO elections (id, name, created) VALUES (?, ?, ?)",
+                     (DEFAULT_ELECTION, 'Default election', time.time()))
+        if conn.execute("SELECT 1 FROM elections WHERE is_active = 1").fetchone() is None:
+            conn.execute("UPDATE elections SET is_active = 1 WHERE id = ?", (DEFAULT_ELECTION,))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.execute("DETACH DATABASE election")
+    if ledger_path(DB_PATH).exists() and not ledger_path(path).exists():
+        os.replace(ledger_path(DB_PATH), ledger_path(path))
+    conn.execute("VACUUM")
+    safe_print(f"Moved existing votes into election '{DEFAULT_ELECTION}' ({path.name})")
+
+@timed('db_init')
+def init_db():
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        cur = conn.cursor()
+        for stmt in CATALOG_SCHEMA:
+            cur.execute(stmt)
+        # Demo candidates only go into the default election as it is first set up;
+        # elections created later keep exactly the candidates they were given
+        seed = False
+        if cur.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'votes'").fetchone():
+            _migrate_single_file(conn)
+            seed = True
+        if cur.execute("SELECT 1 FROM elections LIMIT 1").fetchone() is None:
+            seed = True
+            cur.execute("INSERT INTO elections (id, name, is_active, created) VALUES (?, ?, 1, ?)",
+                        (DEFAULT_ELECTION, 'Default election', time.time()))
+
+        # Demo data
+        cur.execute("INSERT OR IGNORE INTO voters (id, name) VALUES ('TEST1','Demo Voter')")
+        cur.execute("INSERT OR IGNORE INTO voters (id, name) VALUES ('first one','Demo Voter')")
+        conn.commit()
+        active = cur.execute("SELECT id FROM elections WHERE is_active = 1").fetchone()
+    finally:
+        conn.close()
+
+    if active is None:
+        return
+    _init_election_file(election_path(active[0]), DEMO_CANDIDATES if seed else ())
+    added = build_ledger()
+    if added:
+        safe_print(f"Added {added} existing votes to the Merkle ledger")
+
+def create_election(election_id, name=None, candidates=None, activate=True):
+    """Start a new election in its own file; candidates default to the active election's"""
+    if not ELECTION_ID.fullmatch(election_id):
+        raise ValueError(f"Election ids are letters, digits, '-' and '_': {election_id!r}")
+    path = election_path(election_id)
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        if conn.execute("SELECT 1 FROM elections WHERE id = ?", (election_id,)).fetchone():
+            raise ValueError(f"Election {election_id!r} already exists")
+        if path.exists():
+            raise ValueError(f"{path} already exists")
+        if candidates is None:
+            has_active = conn.execute("SELECT 1 FROM elections WHERE is_active = 1").fetchone()
+            candidates = get_candidates() if has_active else []
+        _init_election_file(path, candidates)
+        conn.execute("INSERT INTO elections (id, name, created) VALUES (?, ?, ?)",
+                     (election_id, name, time.time()))
+        if activate:
+            _set_active(conn, election_id)
+        conn.commit()
+    finally:
+        conn.close()
+    return path
+
+def _set_active(conn, election_id):
+    # Two statements: the unique index would reject a moment with two active rows
+    conn.execute("UPDATE elections SET is_active = 0 WHERE is_active = 1")
+    conn.execute("UPDATE elections SET is_active = 1 WHERE id = ?", (election_id,))
 
-def get_candidates():
+def activate_election(election_id):
+    """Make an open election the one that takes votes"""
     conn = sqlite3.connect(DB_PATH)
+    try:
+        row = conn.execute("SELECT status FROM elections WHERE id = ?", (election_id,)).fetchone()
+        if row is None:
+            raise LookupError(f"No election {election_id!r}")
+        if row[0] == 'archived':
+            raise ValueError(f"Election {election_id!r} is archived")
+        _set_active(conn, election_id)
+        conn.commit()
+    finally:
+        conn.close()
+
+def list_elections():
+    """(id, name, status, is_active, created, archived, votes, ledger_root) rows, oldest first"""
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        return conn.execute("SELECT id, name, status, is_active, created, archived, votes, ledger_root "
+                            "FROM elections ORDER BY created, id").fetchall()
+    finally:
+        conn.close()
+
+@timed('db_archive_election')
+def archive_election(election_id):
+    """Close an election: stop taking votes, compact its file and make it read-only
+
+    The final vote count and ledger root are recorded in the catalog. Returns a dict
+    with those and the file size before and after compaction.
+    """
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        row = conn.execute("SELECT status FROM elections WHERE id = ?", (election_id,)).fetchone()
+        if row is None:
+            raise LookupError(f"No election {election_id!r}")
+        if row[0] == 'archived':
+            raise ValueError(f"Election {election_id!r} is already archived")
+        # Waits for any record_vote transaction in progress (it holds the catalog's write
+        # lock); every later one sees the election inactive and refuses the vote
+        conn.execute("UPDATE elections SET is_active = 0 WHERE id = ?", (election_id,))
+        conn.commit()
+    finally:
+        conn.close()
+
+    path = election_path(election_id)
+    before = path.stat().st_size
+    build_ledger(election_id)
+    election = sqlite3.connect(path, timeout=30.0, isolation_level=None)
+    try:
+        election.execute("PRAGMA journal_mode = DELETE")
+        election.execute("VACUUM")
+        votes = election.execute("SELECT COUNT(*) FROM votes").fetchone()[0]
+    finally:
+        election.close()
+    ledger = MerkleLedger(ledger_path(path))
+    try:
+        _, root = ledger.root()
+    finally:
+        ledger.close()
+    for archived in (path, ledger_path(path)):
+        os.chmod(archived, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        conn.execute("UPDATE elections SET status = 'archived', archived = ?, votes = ?, ledger_root = ? WHERE id = ?",
+                     (time.time(), votes, root.hex(), election_id))
+        conn.commit()
+    finally:
+        conn.close()
+    return {'election': election_id, 'votes': votes, 'ledger_root': root.hex(),
+            'bytes_before': before, 'bytes_after': path.stat().st_size}
+
+@timed('db_get_candidates')
+def get_candidates(election=None):
+    conn = _connect(election)
     cur = conn.cursor()
     cur.execute("SELECT id, name FROM candidates ORDER BY id")
     rows = cur.fetchall()
     conn.close()
     return rows
 
-def record_vote(voter_token, candidate_id):
+@timed('db_get_voters')
+def get_voters():
     conn = sqlite3.connect(DB_PATH)
     cur = conn.cursor()
-    cur.execute("INSERT INTO votes (voter_token, candidate_id) VALUES (?,?)", (voter_token, candidate_id))
-    conn.commit()
+    cur.execute("SELECT id, name FROM voters ORDER BY rowid")
+    rows = cur.fetchall()
     conn.close()
+    return rows
 
-def get_votes():
+@timed('db_add_voter')
+def add_voter(voter_id, name=None):
     conn = sqlite3.connect(DB_PATH)
     cur = conn.cursor()
+    cur.execute("INSERT OR IGNORE INTO voters (id, name) VALUES (?,?)", (voter_id, name))
+    conn.commit()
+    conn.close()
+
+@timed('db_record_vote')
+def record_vote(voter_token, candidate_id):
+    """Insert a vote in the active election, append it to its Merkle ledger, and return (vote id, receipt code)
+
+    The vote id is the receipt number. The receipt code salts the vote's commitment in
+    the ledger; it is only handed to the voter, who needs it to check their vote.
+    """
+    salt = secrets.token_hex(8)
+    conn = sqlite3.connect(DB_PATH, uri=True)
+    try:
+        election = _attach(conn)
+    except Exception:
+        conn.close()
+        raise
+    ledger = _locked_ledger(election)
+    try:
+        # The ledger lock is held across the insert so vote ids reach the ledger in order
+        cur = conn.cursor()
+        # IMMEDIATE also write-locks the catalog, so archive_election cannot close the
+        # election between this check and the commit
+        cur.execute("BEGIN IMMEDIATE")
+        if not cur.execute("SELECT is_active FROM elections WHERE id = ?", (election,)).fetchone()[0]:
+            conn.rollback()
+            raise ValueError(f"Election {election!r} is closed; the vote was not recorded")
+        cur.execute("INSERT INTO votes (voter_token, candidate_id, salt) VALUES (?,?,?)",
+                    (voter_token, candidate_id, salt))
+        conn.commit()
+        vote_id = cur.lastrowid
+        if ledger is not None:
+            try:
+                with timed('ledger_append'):
+                    ledger.append(conn, vote_id)
+                ledger.commit()
+            except Exception as e:
+                ledger.rollback()
+                # The vote is safely stored; `python db.py init` catches the ledger up
+                safe_print(f"⚠️ Could not append vote {vote_id} to the ledger: {e}", level=WARNING)
+    finally:
+        conn.close()
+        if ledger is not None:
+            ledger.close()
+    return vote_id, salt
+
+def _locked_ledger(election):
+    """The election's Merkle ledger with its write lock held, or None if it can't be locked"""
+    ledger = None
+    try:
+        ledger = MerkleLedger(ledger_path(election_path(election)))
+        ledger.lock()
+        return ledger
+    except Exception as e:
+        if ledger is not None:
+            ledger.close()
+        safe_print(f"⚠️ Merkle ledger unavailable, recording vote without it: {e}", level=WARNING)
+        return None
+
+@timed('ledger_build')
+def build_ledger(election=None):
+    """Append every vote not yet in the election's Merkle ledger; returns votes added
+
+    Run by init_db, so an existing database is migrated once at setup and
+    record_vote only ever appends its own vote.
+    """
+    path = election_path(election)
+    ledger = MerkleLedger(ledger_path(path))
+    try:
+        return ledger.sync(path)
+    finally:
+        ledger.close()
+
+@timed('db_get_votes')
+def get_votes(election=None):
+    conn = _connect(election)
+    cur = conn.cursor()
     cur.execute("SELECT candidate_id, COUNT(*) FROM votes GROUP BY candidate_id")
     rows = cur.fetchall()
     conn.close()
     return rows
+
+RAW_VOTES_QUERY = """
+    SELECT v.id, v.voter_token, v.candidate_id, c.name, v.ts
+    FROM votes v LEFT JOIN candidates c ON c.id = v.candidate_id
+    WHERE v.id > ?
+    ORDER BY v.id
+    LIMIT ?
+"""
+
+RECENT_VOTES_QUERY = """
+    SELECT v.id, v.voter_token, v.candidate_id, c.name, v.ts
+    FROM votes v LEFT JOIN candidates c ON c.id = v.candidate_id
+    WHERE v.id < ?
+    ORDER BY v.id DESC
+    LIMIT ?
+"""
+
+@timed('db_get_votes_page')
+def get_votes_page(after_id=0, limit=100, before_id=None, election=None):
+    """Raw votes with candidate names, keyset-paginated by vote id
+
+    With before_id the page runs newest first from just below that id;
+    pass before_id=-1 for the newest votes.
+    """
+    conn = _connect(election)
+    cur = conn.cursor()
+    if before_id is None:
+        cur.execute(RAW_VOTES_QUERY, (after_id, limit))
+    else:
+        cur.execute(RECENT_VOTES_QUERY, (before_id if before_id > 0 else 2 ** 63 - 1, limit))
+    rows = cur.fetchall()
+    conn.close()
+    return rows
+
+def iter_votes(after_id=0, batch_size=1000, election=None):
+    """Yield every raw vote after after_id in id order, holding one batch in memory
+
+    Each batch is its own short query, so writers are never blocked for the
+    length of a whole export.
+    """
+    conn = _connect(election)
+    try:
+        while True:
+            rows = conn.execute(RAW_VOTES_QUERY, (after_id, batch_size)).fetchall()
+            if not rows:
+                return
+            yield from rows
+            after_id = rows[-1][0]
+    finally:
+        conn.close()
+
+def _bucket_bound(value):
+    """Accept 'YYYY-MM-DD HH:MM' or ISO-8601 ('2025-01-31T09:30:00Z') as a bucket bound"""
+    return value.replace('T', ' ').rstrip('Z')[:16] if value else None
+
+@timed('db_get_turnout')
+def get_turnout(granularity='minute', start=None, end=None, candidate_id=None, election=None):
+    """Votes per (bucket, candidate) from the rollup tables; start inclusive, end exclusive"""
+    table = TURNOUT_TABLES[granularity]
+    query = f"SELECT bucket, candidate_id, votes FROM {table} WHERE 1=1"
+    params = []
+    if start:
+        query += " AND bucket >= ?"
+        params.append(_bucket_bound(start))
+    if end:
+        query += " AND bucket < ?"
+        params.append(_bucket_bound(end))
+    if candidate_id is not None:
+        query += " AND candidate_id = ?"
+        params.append(candidate_id)
+    query += " ORDER BY bucket, candidate_id"
+    conn = _connect(election)
+    cur = conn.cursor()
+    cur.execute(query, params)
+    rows = cur.fetchall()
+    conn.close()
+    return rows
+
+def backfill_turnout(election=None):
+    """Rebuild an election's turnout rollups from its votes table (for databases created before them)"""
+    path = election_path(election)
+    _init_election_file(path)
+    conn = sqlite3.connect(path)
+    try:
+        # IMMEDIATE blocks new votes while rebuilding, so none is counted twice or missed
+        conn.execute("BEGIN IMMEDIATE")
+        for granularity, table in TURNOUT_TABLES.items():
+            conn.execute(f"DELETE FROM {table}")
+            conn.execute(
+                f"INSERT INTO {table} (bucket, candidate_id, votes) "
+                f"SELECT strftime('{TURNOUT_FORMATS[granularity]}', ts) AS bucket, candidate_id, COUNT(*) "
+                f"FROM votes GROUP BY bucket, candidate_id"
+            )
+        conn.commit()
+        return conn.execute("SELECT COALESCE(SUM(votes), 0) FROM turnout_hour").fetchone()[0]
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Voting database maintenance")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("init", help="create tables and demo data, and bring the Merkle ledger up to date")
+    backfill = sub.add_parser("backfill-turnout", help="rebuild per-minute/per-hour turnout rollups from votes")
+    backfill.add_argument("--election", help="election to rebuild (default: the active one)")
+    election = sub.add_parser("election", help="start, switch, list and archive elections")
+    election_sub = election.add_subparsers(dest="action", required=True)
+    new = election_sub.add_parser("new", help="start an election in its own file and make it active")
+    new.add_argument("election_id")
+    new.add_argument("--name")
+    new.add_argument("--candidates", help="comma-separated names (default: the active election's candidates)")
+    new.add_argument("--inactive", action="store_true", help="don't switch voting to it yet")
+    election_sub.add_parser("list")
+    election_sub.add_parser("activate").add_argument("election_id")
+    election_sub.add_parser("archive", help="stop voting, compact the file and make it read-only").add_argument("election_id")
+    args = parser.parse_args()
+
+    if args.command == "init":
+        init_db()
+        print(f"Initialized {DB_PATH} (active election: {active_election()})")
+    elif args.command == "backfill-turnout":
+        total = backfill_turnout(args.election)
+        print(f"Rebuilt turnout rollups for {total} votes in {election_path(args.election)}")
+    elif args.action == "new":
+        candidates = None
+        if args.candidates:
+            candidates = list(enumerate((c.strip() for c in args.candidates.split(',') if c.strip()), start=1))
+        path = create_election(args.election_id, args.name, candidates, activate=not args.inactive)
+        print(f"Created election {args.election_id} in {path}")
+    elif args.action == "list":
+        for eid, name, status, is_active, created, archived, votes, root in list_elections():
+            detail = f"{votes} votes, root {root}" if status == 'archived' else ("active" if is_active else "")
+            print(f"{eid:<20} {status:<9} {name or '':<24} {detail}")
+    elif args.action == "activate":
+        activate_election(args.election_id)
+        print(f"Votes now go to election {args.election_id}")
+    elif args.action == "archive":
+        summary = archive_election(args.election_id)
+        print(f"Archived election {args.election_id}: {summary['votes']} votes, "
+              f"{summary['bytes_before'] / 1e6:.1f} MB -> {summary['bytes_after'] / 1e6:.1f} MB, "
+              f"ledger root {summary['ledger_root']}")
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Compiled Intent Matcher
+Turns spoken candidate choices and confirmations into intents using a token trie
+compiled once per election from db.get_candidates()
+"""
+import re
+
+ONES = ['zero', 'one', 'two', 'three', 'four', 'five', 'six', 'seven', 'eight', 'nine',
+        'ten', 'eleven', 'twelve', 'thirteen', 'fourteen', 'fifteen', 'sixteen',
+        'seventeen', 'eighteen', 'nineteen']
+TENS = ['', '', 'twenty', 'thirty', 'forty', 'fifty', 'sixty', 'seventy', 'eighty', 'ninety']
+ORDINALS = {'one': 'first', 'two': 'second', 'three': 'third', 'five': 'fifth',
+            'eight': 'eighth', 'nine': 'ninth', 'twelve': 'twelfth'}
+
+# Words recognizers commonly produce instead of a spoken digit
+NUMBER_HOMOPHONES = {1: ['won'], 2: ['to', 'too'], 4: ['for', 'fore'], 8: ['ate']}
+
+# Words that introduce a choice and make the following number unambiguous
+CHOICE_PREFIXES = ['number', 'candidate', 'candidate number', 'option', 'option number', 'choice']
+
+CONFIRM_PHRASES = {
+    'confirm': 1.0, 'confirmed': 1.0, 'i confirm': 1.0, 'cast my vote': 1.0, 'cast vote': 1.0,
+    'yes': 0.9, 'yes please': 0.9, 'yeah': 0.8, 'yep': 0.8, 'correct': 0.9, 'that is correct': 1.0,
+    'thats correct': 1.0, 'that is right': 0.9, 'thats right': 0.9, 'go ahead': 0.8, 'sure': 0.7,
+    'conform': 0.7, 'confirmed it': 0.8,
+}
+CANCEL_PHRASES = {
+    'cancel': 1.0, 'cancelled': 1.0, 'abort': 1.0, 'stop': 0.9, 'no': 0.9, 'nope': 0.8,
+    'wrong': 0.8, 'go back': 0.8, 'start over': 0.8, 'do not': 0.9, 'dont': 0.9,
+    'do not confirm': 1.0, 'dont confirm': 1.0, 'not confirm': 1.0, 'council': 0.6,
+}
+
+# Matches below this confidence are treated as not understood
+MIN_CONFIDENCE = 0.5
+
+CANDIDATE = 'candidate'
+CONFIRM = 'confirm'
+CANCEL = 'cancel'
+
+_END = ''  # trie key holding the payload of a complete phrase
+
+
+def tokenize(text):
+    """Lowercase words and digit runs, with apostrophes dropped ("that's" -> "thats")"""
+    return re.findall(r"[a-z]+|\d+", text.lower().replace("'", ""))
+
+
+def number_words(n):
+    """Spell out 0-99 as words ("twenty one")"""
+    if n < 20:
+        return ONES[n]
+    tens, ones = divmod(n, 10)
+    return TENS[tens] if ones == 0 else f"{TENS[tens]} {ONES[ones]}"
+
+
+def ordinal_words(n):
+    """Spell out ordinals for 1-99 ("twenty first")"""
+    words = number_words(n).split()
+    last = words[-1]
+    if last in ORDINALS:
+        words[-1] = ORDINALS[last]
+    elif last.endswith('y'):
+        words[-1] = last[:-1] + 'ieth'
+    else:
+        words[-1] = last + 'th'
+    return ' '.join(words)
+
+
+class IntentMatcher:
+    """Token trie over every phrase that names a candidate or confirms/cancels"""
+
+    def __init__(self, candidates):
+        self.candidates = dict(candidates)
+        self._trie = {}
+        for cid, name in candidates:
+            self._compile_candidate(cid, name)
+        for phrase, confidence in CONFIRM_PHRASES.items():
+            self._add(phrase, CONFIRM, True, confidence)
+        for phrase, confidence in CANCEL_PHRASES.items():
+            self._add(phrase, CANCEL, True, confidence)
+
+    def _compile_candidate(self, cid, name):
+        name_tokens = tokenize(name or '')
+        if name_tokens:
+            self._add(' '.join(name_tokens), CANDIDATE, cid, 1.0)
+            for prefix in ('candidate', 'vote for', 'i choose', 'i want'):
+                self._add(f"{prefix} {' '.join(name_tokens)}", CANDIDATE, cid, 1.0)
+            if len(name_tokens) > 1:
+                # First or last name alone is likely but not certain
+                self._add(name_tokens[0], CANDIDATE, cid, 0.8)
+                self._add(name_tokens[-1], CANDIDATE, cid, 0.8)
+        if isinstance(cid, int) and 0 <= cid < 100:
+            spoken = [str(cid), number_words(cid)]
+            for form in spoken:
+                self._add(form, CANDIDATE, cid, 0.9)
+                for prefix in CHOICE_PREFIXES:
+                    self._add(f"{prefix} {form}", CANDIDATE, cid, 1.0)
+            if cid > 0:
+                ordinal = ordinal_words(cid)
+                self._add(ordinal, CANDIDATE, cid, 0.85)
+                self._add(f"the {ordinal} one", CANDIDATE, cid, 1.0)
+                self._add(f"{ordinal} candidate", CANDIDATE, cid, 1.0)
+            for homophone in NUMBER_HOMOPHONES.get(cid, ()):
+                self._add(homophone, CANDIDATE, cid, 0.6)
+                for prefix in CHOICE_PREFIXES:
+                    self._add(f"{prefix} {homophone}", CANDIDATE, cid, 0.9)
+
+    def _add(self, phrase, intent, value, confidence):
+        tokens = tokenize(phrase)
+        node = self._trie
+        for token in tokens:
+            node = node.setdefault(token, {})
+        existing = node.get(_END)
+        # On collisions keep the stronger meaning; ties keep the first compiled
+        if existing is None or confidence > existing[2]:
+            node[_END] = (intent, value, confidence)
+
+    def match(self, transcript):
+        """Return (intent, value, confidence) for each phrase found, preferring the longest at each word"""
+        tokens = tokenize(transcript or '')
+        hits = []
+        i = 0
+        n = len(tokens)
+        while i < n:
+            node = self._trie
+            found = None
+            j = i
+            while j < n:
+                node = node.get(tokens[j])
+                if node is None:
+                    break
+                j += 1
+                payload = node.get(_END)
+                if payload is not None:
+                    found = (payload, j)
+            if found is None:
+                i += 1
+            else:
+                hits.append(found[0])
+                i = found[1]
+        return hits
+
+    def _resolve(self, hits, intents):
+        """Pick the strongest value, discounted by the strongest competing value"""
+        best = {}
+        for intent, value, confidence in hits:
+            if intent in intents:
+                key = (intent, value)
+                best[key] = max(best.get(key, 0.0), confidence)
+        if not best:
+            return None, 0.0
+        ranked = sorted(best.items(), key=lambda item: -item[1])
+        (winner, top), rest = ranked[0], ranked[1:]
+        confidence = top - 0.5 * rest[0][1] if rest else top
+        return winner, round(confidence, 3)
+
+    def match_candidate(self, transcript, min_confidence=MIN_CONFIDENCE):
+        """Return (candidate_id, confidence); candidate_id is None if not understood"""
+        winner, confidence = self._resolve(self.match(transcript), (CANDIDATE,))
+        if winner is None or confidence < min_confidence:
+            return None, confidence
+        return winner[1], confidence
+
+    def match_confirmation(self, transcript, min_confidence=MIN_CONFIDENCE):
+        """Return ('confirm' | 'cancel' | None, confidence)"""
+        winner, confidence = self._resolve(self.match(transcript), (CONFIRM, CANCEL))
+        if winner is None or confidence < min_confidence:
+            return None, confidence
+        return winner[0], confidence
+
+
+_compiled = {}
+
+
+def get_intent_matcher(candidates):
+    """Return the matcher for this candidate list, compiling it only once"""
+    key = tuple(candidates)
+    matcher = _compiled.get(key)
+    if matcher is None:
+        matcher = _compiled[key] = IntentMatcher(key)
+    return matcher
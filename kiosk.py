@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Headless Voting Kiosk
+Runs the voice flow for voter after voter in one process, for booths that only need
+voice: no Flask, no browser and no subprocess per voter. The microphone stream, Vosk
+model, voter index, intent matcher and TTS pipeline are opened once and stay warm, so
+only the first voter pays for loading them. Session state lives in a MemorySessionStore;
+--status-port also sends every status change as a JSON datagram to 127.0.0.1:<port>
+for a local display or supervisor.
+
+--stub replaces the microphone and TTS with scripted voters and timed silence (see
+stub_voice_worker.py), so the kiosk can be measured on any machine; bench_kiosk.py
+compares it with the web deployment.
+
+Usage: python kiosk.py [--sessions N] [--wait enter|none] [--pause 2] [--status-port PORT]
+                       [--stub] [--time-scale 1.0] [--report report.json]
+"""
+import time
+
+PROCESS_START = time.time()
+
+import argparse
+import json
+import os
+import random
+import socket
+import sys
+
+from console_utils import safe_print, set_log_context
+from db import init_db, get_candidates
+from intent_matcher import get_intent_matcher
+from metrics import flush_to_store
+from proc_stats import format_mb, peak_rss_bytes, rss_bytes
+from session_store import MemorySessionStore, set_session_store
+from voter_index import get_voter_index
+
+
+class SocketStatusStore(MemorySessionStore):
+    """MemorySessionStore that also announces every change as a UDP datagram on localhost"""
+
+    def __init__(self, port):
+        super().__init__()
+        self.address = ('127.0.0.1', port)
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def _announce(self, session_id):
+        session = self.get(session_id)
+        if session is None:
+            return
+        try:
+            self._sock.sendto(json.dumps({'session_id': session_id, **session}).encode('utf-8'), self.address)
+        except OSError:
+            pass  # nobody listening; status is best effort
+
+    def create(self, session_id, worker_pid, worker_host=None, message='Starting voice voting...'):
+        super().create(session_id, worker_pid, worker_host, message)
+        self._announce(session_id)
+
+    def update(self, session_id, status=None, step=None, message=None, result=None, worker_pid=None):
+        updated = super().update(session_id, status, step, message, result, worker_pid)
+        if updated:
+            self._announce(session_id)
+        return updated
+
+    def finish(self, session_id, exit_code):
+        super().finish(session_id, exit_code)
+        self._announce(session_id)
+
+    def close(self):
+        self._sock.close()
+
+
+class FirstPromptClock:
+    """Prompt queue wrapper noting when each session's first prompt was queued"""
+
+    def __init__(self, prompts):
+        self.prompts = prompts
+        self.first_at = None
+
+    def start_session(self):
+        self.first_at = None
+
+    def say(self, text):
+        if self.first_at is None:
+            self.first_at = time.time()
+        self.prompts.say(text)
+
+    def flush(self, timeout=None):
+        return self.prompts.flush(timeout)
+
+    def close(self, timeout=None):
+        return self.prompts.close(timeout)
+
+
+class ScriptedAudio:
+    """AudioSession stand-in answering each step from a stub_voice_worker script"""
+
+    def __init__(self, rng, time_scale):
+        from stub_voice_worker import SCRIPTS
+        self.scripts = SCRIPTS
+        self.rng = rng
+        self.time_scale = time_scale
+        self.answers = {}
+
+    def next_voter(self):
+        voter, choice, confirmation, _ = self.rng.choices(self.scripts, weights=[s[3] for s in self.scripts])[0]
+        self.answers = {1: voter, 2: choice, 3: confirmation}
+
+    def listen(self, seconds=6, should_stop=None, record_as=None):
+        from stub_voice_worker import LISTEN_SECONDS
+        time.sleep(self.rng.uniform(*LISTEN_SECONDS) * self.time_scale)
+        return self.answers.get(record_as[1] if record_as else None)
+
+    def close(self):
+        pass
+
+
+def open_devices(args):
+    """(audio, prompts) kept open for every voter"""
+    from tts_pipeline import DirectPrompts, open_prompt_queue
+    if args.stub:
+        from stub_voice_worker import PROMPT_SECONDS
+        audio = ScriptedAudio(random.Random(args.seed), args.time_scale)
+        prompts = DirectPrompts(fallback=lambda text: time.sleep(PROMPT_SECONDS * args.time_scale))
+        return audio, prompts
+    from voice_subprocess import MIC_DEVICE_INDEX
+    from voice_utils import open_audio_session
+    from windows_tts import get_tts_selector
+    get_tts_selector()
+    return open_audio_session(device_index=MIC_DEVICE_INDEX), open_prompt_queue()
+
+
+def wait_for_voter(mode):
+    """Block until the next voter starts; False at end of input"""
+    if mode == 'none':
+        return True
+    safe_print("Press Enter to start voting...")
+    return bool(sys.stdin.readline())
+
+
+def run(args, on_session=None):
+    """Serve args.sessions voters (0: until input ends); on_session(n, entry) is called after each"""
+    store = SocketStatusStore(args.status_port) if args.status_port else MemorySessionStore()
+    set_session_store(store)
+    from voice_subprocess import voice_voting_process
+
+    init_db()
+    # Warm everything the first prompt and the first match would otherwise wait for
+    get_voter_index()
+    get_intent_matcher(get_candidates())
+    audio, prompts = open_devices(args)
+    clock = FirstPromptClock(prompts)
+    safe_print(f"Kiosk ready in {time.time() - PROCESS_START:.2f}s, RSS {format_mb(rss_bytes())}")
+
+    # Per-voter entries are only kept for --report, so a kiosk left running doesn't grow
+    report = {'process_start': PROCESS_START, 'first_prompt_at': None, 'served': 0, 'sessions': []}
+    try:
+        n = 0
+        while not args.sessions or n < args.sessions:
+            if not wait_for_voter(args.wait):
+                break
+            n += 1
+            session_id = f"kiosk-{os.getpid()}-{n}"
+            set_log_context(session=session_id)
+            store.create(session_id, os.getpid())
+            if args.stub:
+                audio.next_voter()
+            clock.start_session()
+            started = time.time()
+            voice_voting_process(session_id, audio, clock)
+            clock.flush()
+            session = store.get(session_id)
+            store.finish(session_id, 0)
+            store.delete(session_id)
+            if report['first_prompt_at'] is None:
+                report['first_prompt_at'] = clock.first_at
+            entry = {
+                'first_prompt_seconds': clock.first_at - started if clock.first_at else None,
+                'seconds': time.time() - started,
+                'success': bool(session and session['result'] and session['result'].get('success')),
+                'rss_bytes': rss_bytes(),
+            }
+            report['served'] = n
+            if args.report:
+                report['sessions'].append(entry)
+            if on_session is not None:
+                on_session(n, entry)
+            set_log_context(session=None)
+            try:
+                flush_to_store()
+            except Exception as e:
+                safe_print(f"Error writing metrics: {e}")
+            if args.pause:
+                time.sleep(args.pause)
+    finally:
+        clock.close(timeout=60)
+        if audio is not None:
+            audio.close()
+        if isinstance(store, SocketStatusStore):
+            store.close()
+    report['peak_rss_bytes'] = peak_rss_bytes()
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sessions', type=int, default=0, help='stop after this many voters (default: run forever)')
+    parser.add_argument('--wait', choices=('enter', 'none'), default='enter',
+                        help='start each voter on Enter (booth keypad) or straight away')
+    parser.add_argument('--pause', type=float, default=2.0, help='seconds between voters')
+    parser.add_argument('--status-port', type=int, help='send status datagrams to 127.0.0.1:PORT')
+    parser.add_argument('--stub', action='store_true', help='scripted voters and silent TTS instead of devices')
+    parser.add_argument('--time-scale', type=float, default=1.0, help='scale stub delays (with --stub)')
+    parser.add_argument('--seed', type=int, default=0, help='stub voter script seed')
+    parser.add_argument('--report', help='write startup, per-voter and memory figures as JSON')
+    args = parser.parse_args(argv)
+
+    report = run(args)
+    first = report['first_prompt_at']
+    safe_print(f"Kiosk served {report['served']} voters; "
+               f"first prompt {first - PROCESS_START:.2f}s after start, "
+               f"peak RSS {format_mb(report['peak_rss_bytes'])}" if first else
+               f"Kiosk served {report['served']} voters")
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Concurrent Session Load Test
+Drives the web_voting_app API with many booths and dashboards at once and reports
+per-endpoint latency percentiles, error rates and throughput as JSON
+
+Booths loop start-voice-voting -> poll voting-status -> reset-session, like the web page.
+Dashboards poll /api/results. Unless --url is given, the app is served in-process against
+a scratch database with stub_voice_worker.py replacing the real voice subprocess.
+
+Usage: python load_test.py [--booths 50] [--dashboards 10] [--duration 60]
+                           [--time-scale 0.1] [--output load_results.json]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+
+
+class Recorder:
+    """Thread-safe latency and error samples per endpoint"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {}
+        self.sessions = {'started': 0, 'completed': 0, 'failed': 0, 'timed_out': 0, 'votes': 0}
+
+    def add(self, endpoint, latency_ms, ok):
+        with self._lock:
+            self.samples.setdefault(endpoint, []).append((latency_ms, ok))
+
+    def count(self, key):
+        with self._lock:
+            self.sessions[key] += 1
+
+
+def percentile(ordered, pct):
+    if not ordered:
+        return None
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))], 3)
+
+
+def call(base_url, recorder, endpoint, path, method='GET', timeout=30):
+    """Issue one request, record its latency, and return the decoded JSON or None"""
+    request = urllib.request.Request(base_url + path, method=method, data=b'' if method == 'POST' else None)
+    start = time.perf_counter()
+    data = None
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            data = json.loads(response.read().decode('utf-8'))
+        ok = bool(data.get('success'))
+    except (urllib.error.URLError, OSError, ValueError):
+        ok = False
+    recorder.add(endpoint, (time.perf_counter() - start) * 1000, ok)
+    return data if ok else None
+
+
+def booth(base_url, recorder, deadline, poll_interval, session_timeout):
+    while time.time() < deadline:
+        started = call(base_url, recorder, '/api/start-voice-voting', '/api/start-voice-voting', method='POST')
+        if not started:
+            time.sleep(poll_interval)
+            continue
+        recorder.count('started')
+        session_id = started['session_id']
+        give_up = time.time() + session_timeout
+        while True:
+            time.sleep(poll_interval)
+            status = call(base_url, recorder, '/api/voting-status/<id>', f'/api/voting-status/{session_id}')
+            if status and status.get('status') in ('completed', 'error'):
+                recorder.count('completed' if status['status'] == 'completed' else 'failed')
+                if status['status'] == 'completed':
+                    recorder.count('votes')
+                break
+            if time.time() > give_up:
+                recorder.count('timed_out')
+                break
+        call(base_url, recorder, '/api/reset-session/<id>', f'/api/reset-session/{session_id}')
+
+
+def dashboard(base_url, recorder, deadline, interval):
+    while time.time() < deadline:
+        call(base_url, recorder, '/api/results', '/api/results')
+        time.sleep(interval)
+
+
+def summarize(recorder, elapsed, config):
+    endpoints = {}
+    for endpoint, samples in sorted(recorder.samples.items()):
+        latencies = sorted(latency for latency, _ in samples)
+        errors = sum(1 for _, ok in samples if not ok)
+        endpoints[endpoint] = {
+            'requests': len(samples),
+            'errors': errors,
+            'error_rate': round(errors / len(samples), 4),
+            'throughput_rps': round(len(samples) / elapsed, 3),
+            'latency_ms': {
+                'p50': percentile(latencies, 50),
+                'p95': percentile(latencies, 95),
+                'p99': percentile(latencies, 99),
+                'max': round(latencies[-1], 3),
+                'mean': round(sum(latencies) / len(latencies), 3),
+            },
+        }
+    return {
+        'config': config,
+        'elapsed_s': round(elapsed, 3),
+        'endpoints': endpoints,
+        'sessions': dict(recorder.sessions),
+    }
+
+
+def start_local_server(time_scale):
+    """Serve web_voting_app in-process on a free port, isolated from votes.db"""
+    workdir = tempfile.mkdtemp(prefix='voting_load_')
+    os.environ['VOTES_DB'] = os.path.join(workdir, 'votes.db')
+    os.environ['VOICE_WORKER'] = str(HERE / 'stub_voice_worker.py')
+    os.environ['STUB_TIME_SCALE'] = str(time_scale)
+    # The session store (sessions.db) and worker logs live in the working directory
+    os.chdir(workdir)
+    sys.path.insert(0, str(HERE))
+
+    from werkzeug.serving import make_server
+    from db import init_db
+    from web_voting_app import app
+
+    init_db()
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_port}', workdir
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--booths', type=int, default=50)
+    parser.add_argument('--dashboards', type=int, default=10)
+    parser.add_argument('--duration', type=float, default=60.0, help='seconds to keep starting sessions')
+    parser.add_argument('--poll', type=float, default=1.0, help='status poll interval (the web page uses 1s)')
+    parser.add_argument('--dashboard-interval', type=float, default=2.0)
+    parser.add_argument('--time-scale', type=float, default=0.1, help='stub worker delay multiplier')
+    parser.add_argument('--session-timeout', type=float, default=300.0)
+    parser.add_argument('--url', help='test an already running server instead of an in-process one')
+    parser.add_argument('--output', help='write the JSON report here as well as to stdout')
+    args = parser.parse_args()
+
+    server = None
+    if args.url:
+        base_url = args.url.rstrip('/')
+    else:
+        server, base_url, workdir = start_local_server(args.time_scale)
+        print(f"In-process server at {base_url} (workdir {workdir})", file=sys.stderr)
+
+    recorder = Recorder()
+    deadline = time.time() + args.duration
+    threads = [threading.Thread(target=booth, args=(base_url, recorder, deadline, args.poll, args.session_timeout))
+               for _ in range(args.booths)]
+    threads += [threading.Thread(target=dashboard, args=(base_url, recorder, deadline, args.dashboard_interval))
+                for _ in range(args.dashboards)]
+
+    start = time.time()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.time() - start
+
+    if server is not None:
+        server.shutdown()
+
+    config = {k: getattr(args, k) for k in ('booths', 'dashboards', 'duration', 'poll', 'dashboard_interval', 'time_scale')}
+    config['target'] = 'remote' if args.url else 'in-process stub workers'
+    report = json.dumps(summarize(recorder, elapsed, config), indent=2, sort_keys=True)
+    print(report)
+    if args.output:
+        Path(args.output).write_text(report + '\n')
+
+
+if __name__ == '__main__':
+    main()
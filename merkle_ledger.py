@@ -0,0 +1,394 @@
+#!/usr/bin/env python3
+"""
+Merkle Vote Ledger
+Tamper evidence for the votes table: every recorded vote is appended as a leaf of an
+RFC 6962 (Certificate Transparency style) Merkle tree, one per election, kept in
+votes.<election>.merkle.db next to votes.<election>.db. Only complete subtrees are
+stored, so appends write O(log n) nodes, inclusion proofs read O(log n) nodes and the
+published root is a single row.
+
+A leaf holds the vote id, its time and a salted commitment to the voter and candidate,
+never the vote itself. The salt is the receipt code given only to that voter, so
+proofs can be public while only the voter can check their choice against one.
+
+Usage (python merkle_ledger.py --election ID <command> for other than the active election):
+    python merkle_ledger.py sync                      append votes not yet in the ledger (also run by `db.py init`)
+    python merkle_ledger.py root                      print tree size and root hash
+    python merkle_ledger.py proof <vote_id>           print an inclusion proof (JSON)
+    python merkle_ledger.py check-proof proof.json [--root HEX] [--salt CODE --voter ID --candidate N]
+    python merkle_ledger.py audit                     rehash the votes table and compare with the ledger
+"""
+import argparse
+import hashlib
+import json
+import sqlite3
+import sys
+from pathlib import Path
+
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS nodes (
+        level INTEGER,
+        idx INTEGER,
+        hash BLOB NOT NULL,
+        PRIMARY KEY (level, idx)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS leaves (
+        vote_id INTEGER PRIMARY KEY,
+        leaf_index INTEGER NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS meta (
+        key TEXT PRIMARY KEY,
+        value
+    )
+    """,
+]
+
+EMPTY_ROOT = hashlib.sha256(b'').digest()
+SYNC_BATCH = 50000
+
+# Version 1 leaves were the plaintext vote row; ledgers in that format are rebuilt by sync()
+LEAF_FORMAT = 2
+VOTE_QUERY = "SELECT id, voter_token, candidate_id, ts, salt FROM votes"
+
+# json.dumps() with custom separators builds a new encoder per call; reuse one
+_LEAF_ENCODER = json.JSONEncoder(separators=(',', ':'))
+
+
+def commitment(salt, voter_token, candidate_id):
+    """Hex SHA-256 commitment to a vote; hiding as long as the salt stays with the voter"""
+    return hashlib.sha256(_LEAF_ENCODER.encode([salt or '', voter_token, candidate_id]).encode('utf-8')).hexdigest()
+
+
+def leaf_data(vote):
+    """Canonical bytes for a (id, voter_token, candidate_id, ts, salt) vote row"""
+    vote_id, voter_token, candidate_id, ts, salt = vote
+    return _LEAF_ENCODER.encode([vote_id, commitment(salt, voter_token, candidate_id), ts]).encode('utf-8')
+
+
+def leaf_hash(data):
+    return hashlib.sha256(b'\x00' + data).digest()
+
+
+def node_hash(left, right):
+    return hashlib.sha256(b'\x01' + left + right).digest()
+
+
+def _split(n):
+    """Largest power of two strictly less than n (RFC 6962 subtree split)"""
+    k = 1
+    while k << 1 < n:
+        k <<= 1
+    return k
+
+
+def ledger_path(votes_db):
+    """votes.general.db -> votes.general.merkle.db"""
+    return Path(votes_db).with_suffix('.merkle.db')
+
+
+def fold_peaks(peaks):
+    """Root of a tree from its perfect subtrees, largest first"""
+    if not peaks:
+        return EMPTY_ROOT
+    root = peaks[-1]
+    for peak in reversed(peaks[:-1]):
+        root = node_hash(peak, root)
+    return root
+
+
+class MerkleLedger:
+    def __init__(self, path):
+        self.path = str(path)
+        self.conn = sqlite3.connect(self.path, timeout=10.0, isolation_level=None)
+        for stmt in SCHEMA:
+            self.conn.execute(stmt)
+
+    def close(self):
+        self.conn.close()
+
+    def _meta(self, key, default=None):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def size(self):
+        return self._meta('size', 0)
+
+    def root(self):
+        """(tree size, root hash) as published; a single indexed read"""
+        meta = dict(self.conn.execute("SELECT key, value FROM meta WHERE key IN ('size', 'root')"))
+        return meta.get('size', 0), bytes(meta['root']) if 'root' in meta else EMPTY_ROOT
+
+    def _node(self, level, idx):
+        row = self.conn.execute("SELECT hash FROM nodes WHERE level = ? AND idx = ?", (level, idx)).fetchone()
+        if row is None:
+            raise LookupError(f"ledger is missing node ({level}, {idx})")
+        return bytes(row[0])
+
+    def _peaks(self, size):
+        """[(level, hash)] of the perfect subtrees that make up a tree of `size` leaves"""
+        peaks = []
+        start = 0
+        for level in range(size.bit_length() - 1, -1, -1):
+            if size >> level & 1:
+                peaks.append((level, self._node(level, start >> level)))
+                start += 1 << level
+        return peaks
+
+    def subtree_hash(self, start, size):
+        """MTH of leaves [start, start + size) from stored complete subtrees"""
+        if size & (size - 1) == 0 and start % size == 0:
+            return self._node(size.bit_length() - 1, start // size)
+        k = _split(size)
+        return node_hash(self.subtree_hash(start, k), self.subtree_hash(start + k, size - k))
+
+    def lock(self):
+        """Take the write lock; IMMEDIATE serializes concurrent appenders (several voice workers)"""
+        self.conn.execute("BEGIN IMMEDIATE")
+
+    def commit(self):
+        self.conn.execute("COMMIT")
+
+    def rollback(self):
+        self.conn.execute("ROLLBACK")
+
+    def _append(self, rows, size, peaks):
+        """Write leaves and completed subtrees for vote rows; updates peaks, returns the new size"""
+        nodes = []
+        leaves = []
+        for vote in rows:
+            h = leaf_hash(leaf_data(vote))
+            level, idx = 0, size
+            nodes.append((0, idx, h))
+            # Merge equal-sized subtrees, like carrying in binary addition
+            while idx & 1:
+                h = node_hash(peaks.pop()[1], h)
+                level += 1
+                idx >>= 1
+                nodes.append((level, idx, h))
+            peaks.append((level, h))
+            leaves.append((vote[0], size))
+            size += 1
+        self.conn.executemany("INSERT INTO nodes (level, idx, hash) VALUES (?, ?, ?)", nodes)
+        self.conn.executemany("INSERT INTO leaves (vote_id, leaf_index) VALUES (?, ?)", leaves)
+        return size
+
+    def _publish(self, size, last_vote_id, peaks):
+        self.conn.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", [
+            ('size', size),
+            ('last_vote_id', last_vote_id),
+            ('root', fold_peaks([h for _, h in peaks])),
+            ('leaf_format', LEAF_FORMAT),
+        ])
+
+    def _current_format(self):
+        return self.size() == 0 or self._meta('leaf_format', 1) == LEAF_FORMAT
+
+    def append(self, votes, vote_id):
+        """Append one vote as the next leaf while holding lock(); writes O(log n) rows
+
+        votes is an open connection to the votes database. Raises LookupError
+        if earlier votes are missing from the ledger; sync() catches it up.
+        """
+        if not self._current_format():
+            raise LookupError("ledger uses an old leaf format; run `python db.py init` to rebuild it")
+        last_vote_id = self._meta('last_vote_id', 0)
+        missing = votes.execute("SELECT COUNT(*) FROM votes WHERE id > ? AND id < ?",
+                                (last_vote_id, vote_id)).fetchone()[0]
+        if missing:
+            raise LookupError(f"ledger is {missing} votes behind; run `python db.py init` to catch it up")
+        rows = votes.execute(f"{VOTE_QUERY} WHERE id = ?", (vote_id,)).fetchall()
+        if not rows:
+            raise LookupError(f"vote {vote_id} does not exist")
+        size = self.size()
+        peaks = self._peaks(size)
+        self._publish(self._append(rows, size, peaks), vote_id, peaks)
+
+    def sync(self, votes_db):
+        """Append every vote newer than the last one in the ledger; returns votes added
+
+        Reads the whole backlog, so it belongs in setup (`python db.py init`),
+        not on the voting path.
+        """
+        votes = sqlite3.connect(str(votes_db))
+        added = 0
+        try:
+            self.lock()
+            try:
+                if not self._current_format():
+                    # Old leaves exposed the votes themselves; start again with commitments
+                    for table in ('nodes', 'leaves', 'meta'):
+                        self.conn.execute(f"DELETE FROM {table}")
+                size = self.size()
+                last_vote_id = self._meta('last_vote_id', 0)
+                peaks = self._peaks(size)
+                while True:
+                    rows = votes.execute(
+                        f"{VOTE_QUERY} WHERE id > ? ORDER BY id LIMIT ?",
+                        (last_vote_id, SYNC_BATCH)).fetchall()
+                    if not rows:
+                        break
+                    size = self._append(rows, size, peaks)
+                    last_vote_id = rows[-1][0]
+                    added += len(rows)
+                if added:
+                    self._publish(size, last_vote_id, peaks)
+                self.commit()
+            except BaseException:
+                self.rollback()
+                raise
+        finally:
+            votes.close()
+        return added
+
+    def proof(self, vote_id, votes_db):
+        """Inclusion proof for a vote against the current root"""
+        row = self.conn.execute("SELECT leaf_index FROM leaves WHERE vote_id = ?", (vote_id,)).fetchone()
+        if row is None:
+            raise LookupError(f"vote {vote_id} is not in the ledger")
+        index = row[0]
+        size, root = self.root()
+        path = []
+        start, n, m = 0, size, index
+        # Walk down from the root collecting the sibling subtree at each split
+        while n > 1:
+            k = _split(n)
+            if m < k:
+                path.append(self.subtree_hash(start + k, n - k))
+                n = k
+            else:
+                path.append(self.subtree_hash(start, k))
+                start, n, m = start + k, n - k, m - k
+        path.reverse()
+        votes = sqlite3.connect(str(votes_db))
+        try:
+            vote = votes.execute(f"{VOTE_QUERY} WHERE id = ?", (vote_id,)).fetchone()
+        finally:
+            votes.close()
+        return {
+            'vote_id': vote_id,
+            'leaf_index': index,
+            'tree_size': size,
+            'leaf': leaf_data(vote).decode('utf-8') if vote else None,
+            'path': [h.hex() for h in path],
+            'root': root.hex(),
+        }
+
+
+def verify_proof(proof, root_hex=None):
+    """Check an inclusion proof (RFC 9162 section 2.1.3.2); root_hex overrides the proof's root"""
+    if proof.get('leaf') is None:
+        return False
+    fn, sn = proof['leaf_index'], proof['tree_size'] - 1
+    if fn > sn:
+        return False
+    r = leaf_hash(proof['leaf'].encode('utf-8'))
+    for p in (bytes.fromhex(h) for h in proof['path']):
+        if sn == 0:
+            return False
+        if fn & 1 or fn == sn:
+            r = node_hash(p, r)
+            while not fn & 1 and fn:
+                fn >>= 1
+                sn >>= 1
+        else:
+            r = node_hash(r, p)
+        fn >>= 1
+        sn >>= 1
+    return sn == 0 and r.hex() == (root_hex or proof['root'])
+
+
+def verify_receipt(proof, salt, voter_token, candidate_id, root_hex=None):
+    """Check that a proof's leaf commits to this voter's choice under their receipt code, and is included"""
+    if proof.get('leaf') is None:
+        return False
+    _, committed, _ = json.loads(proof['leaf'])
+    return committed == commitment(salt, voter_token, candidate_id) and verify_proof(proof, root_hex)
+
+
+def audit(ledger, votes_db, report_limit=10):
+    """Rehash every vote and compare with the ledger; returns (ok, problems)"""
+    votes = sqlite3.connect(str(votes_db))
+    problems = []
+    peaks = []
+    size = 0
+    try:
+        for vote in votes.execute(f"{VOTE_QUERY} ORDER BY id"):
+            h = leaf_hash(leaf_data(vote))
+            if len(problems) < report_limit:
+                row = ledger.conn.execute("SELECT hash FROM nodes WHERE level = 0 AND idx = ?", (size,)).fetchone()
+                if row is None:
+                    problems.append(f"vote {vote[0]} is not in the ledger")
+                elif bytes(row[0]) != h:
+                    problems.append(f"vote {vote[0]} (leaf {size}) differs from its ledger entry")
+            idx = size
+            while idx & 1:
+                h = node_hash(peaks.pop(), h)
+                idx >>= 1
+            peaks.append(h)
+            size += 1
+    finally:
+        votes.close()
+    ledger_size, ledger_root = ledger.root()
+    if size != ledger_size:
+        problems.append(f"votes table has {size} votes, ledger has {ledger_size}")
+    if size == ledger_size and fold_peaks(peaks) != ledger_root:
+        problems.append("root mismatch")
+    return not problems, problems
+
+
+def main():
+    import db
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--election', help='election whose votes to use (default: the active one)')
+    parser.add_argument('--db', help="an election's votes file (default: that of --election)")
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('sync')
+    sub.add_parser('root')
+    proof_parser = sub.add_parser('proof')
+    proof_parser.add_argument('vote_id', type=int)
+    check = sub.add_parser('check-proof')
+    check.add_argument('proof_file')
+    check.add_argument('--root', help='published root hash to check against')
+    check.add_argument('--salt', help='receipt code, to check the leaf is your vote')
+    check.add_argument('--voter', help='your voter ID (with --salt)')
+    check.add_argument('--candidate', type=int, help='the candidate you voted for (with --salt)')
+    sub.add_parser('audit')
+    args = parser.parse_args()
+
+    if args.command == 'check-proof':
+        proof = json.loads(Path(args.proof_file).read_text())
+        if args.salt is not None:
+            ok = verify_receipt(proof, args.salt, args.voter, args.candidate, args.root)
+        else:
+            ok = verify_proof(proof, args.root)
+        print(f"{'VALID' if ok else 'INVALID'}: vote {proof.get('vote_id')} in tree of {proof.get('tree_size')}")
+        return 0 if ok else 1
+
+    args.db = args.db or str(db.election_path(args.election))
+    ledger = MerkleLedger(ledger_path(args.db))
+    try:
+        if args.command == 'sync':
+            print(f"Appended {ledger.sync(args.db)} votes")
+        elif args.command == 'root':
+            size, root = ledger.root()
+            print(json.dumps({'tree_size': size, 'root': root.hex()}))
+        elif args.command == 'proof':
+            print(json.dumps(ledger.proof(args.vote_id, args.db), indent=2))
+        elif args.command == 'audit':
+            ok, problems = audit(ledger, args.db)
+            for problem in problems:
+                print(f"  {problem}")
+            print("Ledger matches votes table" if ok else "AUDIT FAILED")
+            return 0 if ok else 1
+    finally:
+        ledger.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
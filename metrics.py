@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Stage Latency Metrics
+Histograms of how long each voting stage takes (TTS, model loading, decoding, DB, status I/O).
+Every process (voice workers when they finish, web workers as they serve requests) adds what
+it has observed to running totals in a shared SQLite store (METRICS_DB, default metrics.db),
+and /api/metrics serves those totals in Prometheus text format, whichever worker answers
+"""
+import functools
+import os
+import sqlite3
+import threading
+import time
+
+# Upper bounds in seconds; stages range from sub-millisecond DB reads to multi-second TTS
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+METRIC_NAME = 'voting_stage_seconds'
+METRICS_DB = os.environ.get('METRICS_DB', 'metrics.db')
+
+# Bucket rows are 0..len(BUCKETS) (the last one is overflow); sums and counts
+# are summed across every process that flushed
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS stage_buckets (
+    stage TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (stage, bucket)
+);
+CREATE TABLE IF NOT EXISTS stage_totals (
+    stage TEXT PRIMARY KEY,
+    sum REAL NOT NULL,
+    count INTEGER NOT NULL
+);
+"""
+
+_lock = threading.Lock()
+_histograms = {}  # stage -> {'buckets': [count per bucket + overflow], 'sum': float, 'count': int}
+_flush_lock = threading.Lock()  # one flush at a time, from snapshot to _subtract; guards _last_flush
+_last_flush = 0.0
+
+
+def _new_histogram():
+    return {'buckets': [0] * (len(BUCKETS) + 1), 'sum': 0.0, 'count': 0}
+
+
+def observe(stage, seconds):
+    """Record one duration for a stage"""
+    index = len(BUCKETS)
+    for i, bound in enumerate(BUCKETS):
+        if seconds <= bound:
+            index = i
+            break
+    with _lock:
+        hist = _histograms.get(stage)
+        if hist is None:
+            hist = _histograms[stage] = _new_histogram()
+        hist['buckets'][index] += 1
+        hist['sum'] += seconds
+        hist['count'] += 1
+
+
+class timed:
+    """Time a block or a function into a stage histogram
+
+    with timed('asr_model_load'): ...      or      @timed('db_record_vote')
+    """
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        observe(self.stage, time.perf_counter() - self._start)
+        return False
+
+    def __call__(self, func):
+        stage = self.stage
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                observe(stage, time.perf_counter() - start)
+        return wrapper
+
+
+def snapshot():
+    """Return a deep copy of all histograms"""
+    with _lock:
+        return {stage: {'buckets': list(h['buckets']), 'sum': h['sum'], 'count': h['count']}
+                for stage, h in _histograms.items()}
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+
+
+def _subtract(histograms):
+    """Remove flushed histograms from this process's totals, keeping anything observed since"""
+    with _lock:
+        for stage, flushed in histograms.items():
+            hist = _histograms.get(stage)
+            if hist is None:
+                continue
+            hist['buckets'] = [a - b for a, b in zip(hist['buckets'], flushed['buckets'])]
+            hist['sum'] -= flushed['sum']
+            hist['count'] -= flushed['count']
+            if hist['count'] <= 0:
+                del _histograms[stage]
+
+
+def _connect(path):
+    conn = sqlite3.connect(path or METRICS_DB, timeout=10.0)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def flush_to_store(path=None):
+    """Add this process's histograms to the shared totals, then clear them
+
+    Returns the number of observations flushed. If the store cannot be
+    written the histograms stay in memory for the next flush.
+    """
+    with _flush_lock:
+        return _flush_locked(path)
+
+
+def _flush_locked(path):
+    global _last_flush
+    data = snapshot()
+    _last_flush = time.monotonic()
+    if not data:
+        return 0
+    conn = _connect(path)
+    try:
+        with conn:
+            conn.executemany(
+                "INSERT INTO stage_buckets (stage, bucket, count) VALUES (?, ?, ?) "
+                "ON CONFLICT (stage, bucket) DO UPDATE SET count = count + excluded.count",
+                [(stage, i, n) for stage, hist in data.items() for i, n in enumerate(hist['buckets']) if n])
+            conn.executemany(
+                "INSERT INTO stage_totals (stage, sum, count) VALUES (?, ?, ?) "
+                "ON CONFLICT (stage) DO UPDATE SET sum = sum + excluded.sum, count = count + excluded.count",
+                [(stage, hist['sum'], hist['count']) for stage, hist in data.items()])
+    finally:
+        conn.close()
+    _subtract(data)
+    return sum(hist['count'] for hist in data.values())
+
+
+def flush_if_due(interval, path=None):
+    """flush_to_store() at most once per interval seconds; cheap to call per request"""
+    if time.monotonic() - _last_flush < interval:
+        return 0
+    with _flush_lock:
+        # Another thread may have flushed while this one waited for the lock
+        if time.monotonic() - _last_flush < interval:
+            return 0
+        return _flush_locked(path)
+
+
+def load_store(path=None):
+    """Return the shared totals in the same shape as snapshot()"""
+    conn = _connect(path)
+    try:
+        totals = {stage: {'buckets': [0] * (len(BUCKETS) + 1), 'sum': total, 'count': count}
+                  for stage, total, count in conn.execute("SELECT stage, sum, count FROM stage_totals")}
+        for stage, bucket, count in conn.execute("SELECT stage, bucket, count FROM stage_buckets"):
+            if stage in totals and 0 <= bucket <= len(BUCKETS):
+                totals[stage]['buckets'][bucket] = count
+        return totals
+    finally:
+        conn.close()
+
+
+def _format_bound(bound):
+    return repr(float(bound))
+
+
+def render_prometheus(histograms=None):
+    """Render histograms (default: this process's) in the Prometheus text exposition format"""
+    lines = [
+        f'# HELP {METRIC_NAME} Time spent in each stage of a voting session',
+        f'# TYPE {METRIC_NAME} histogram',
+    ]
+    for stage, hist in sorted((snapshot() if histograms is None else histograms).items()):
+        label = stage.replace('\\', '\\\\').replace('"', '\\"')
+        cumulative = 0
+        for bound, count in zip(BUCKETS, hist['buckets']):
+            cumulative += count
+            lines.append(f'{METRIC_NAME}_bucket{{stage="{label}",le="{_format_bound(bound)}"}} {cumulative}')
+        lines.append(f'{METRIC_NAME}_bucket{{stage="{label}",le="+Inf"}} {hist["count"]}')
+        lines.append(f'{METRIC_NAME}_sum{{stage="{label}"}} {hist["sum"]:.6f}')
+        lines.append(f'{METRIC_NAME}_count{{stage="{label}"}} {hist["count"]}')
+    return '\n'.join(lines) + '\n'
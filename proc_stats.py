@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Process Resource Stats
+Resident memory of this or another process without psutil: /proc on Linux,
+GetProcessMemoryInfo on Windows (this process only). Values are bytes, or None
+where the platform can't tell. Open descriptors and child processes are Linux only.
+"""
+import os
+import sys
+
+
+def _proc_status(pid, field):
+    try:
+        with open(f"/proc/{pid or 'self'}/status") as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def _windows_memory_info():
+    import ctypes
+    from ctypes import wintypes
+
+    class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+        _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD),
+                    ('PeakWorkingSetSize', ctypes.c_size_t), ('WorkingSetSize', ctypes.c_size_t),
+                    ('QuotaPeakPagedPoolUsage', ctypes.c_size_t), ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                    ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t), ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                    ('PagefileUsage', ctypes.c_size_t), ('PeakPagefileUsage', ctypes.c_size_t)]
+
+    counters = PROCESS_MEMORY_COUNTERS()
+    counters.cb = ctypes.sizeof(counters)
+    handle = ctypes.windll.kernel32.GetCurrentProcess()
+    if not ctypes.windll.psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb):
+        return None
+    return counters
+
+
+def rss_bytes(pid=None):
+    """Current resident set size of pid (default: this process)"""
+    if sys.platform.startswith('linux'):
+        return _proc_status(pid, 'VmRSS')
+    if os.name == 'nt' and pid in (None, os.getpid()):
+        counters = _windows_memory_info()
+        return counters.WorkingSetSize if counters else None
+    return None
+
+
+def peak_rss_bytes(pid=None):
+    """Largest resident set size pid has had (default: this process)"""
+    if sys.platform.startswith('linux'):
+        return _proc_status(pid, 'VmHWM')
+    if os.name == 'nt' and pid in (None, os.getpid()):
+        counters = _windows_memory_info()
+        return counters.PeakWorkingSetSize if counters else None
+    if pid in (None, os.getpid()):
+        import resource
+        # ru_maxrss is bytes on macOS
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return None
+
+
+def format_mb(value):
+    return 'n/a' if value is None else f"{value / 1e6:.1f} MB"
+
+
+def open_fd_count(pid=None):
+    """Open file descriptors of pid (default: this process); Linux only"""
+    try:
+        return len(os.listdir(f"/proc/{pid or 'self'}/fd"))
+    except OSError:
+        return None
+
+
+def child_pids(pid=None):
+    """Live (non-zombie) direct children of pid (default: this process); Linux only"""
+    parent = pid or os.getpid()
+    children = []
+    try:
+        entries = os.listdir('/proc')
+    except OSError:
+        return None
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The command name is parenthesized and may contain spaces
+                fields = f.read().rsplit(')', 1)[1].split()
+        except (OSError, IndexError):
+            continue
+        if int(fields[1]) == parent and fields[0] != 'Z':
+            children.append(int(entry))
+    return children
+
+
+def dir_bytes(path, exclude=()):
+    """Total size of the files under path, skipping file names that start with any of exclude"""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            if name.startswith(tuple(exclude)):
+                continue
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
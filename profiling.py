@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+Opt-in Stack Profiling
+A sampling profiler for finding where a slow booth spends its time (Vosk decoding, TTS,
+status writes, SQLite). A background thread reads the stacks of the profiled threads
+PROFILE_HZ times a second (default 100) and counts them as collapsed stacks, the text
+format flamegraph.pl and speedscope read: "frame;frame;frame count" per line.
+
+Enabled by PROFILE_DIR. Each voice_voting_process run is written to
+session_<session_id>.folded with every thread of the process, by thread name. Web
+requests are summed per endpoint into web_<endpoint>_<pid>.folded, rewritten every
+PROFILE_FLUSH_SECONDS. Without PROFILE_DIR the decorator returns the function unchanged,
+no Flask hooks are installed and no thread is started.
+
+Usage:
+    python profiling.py [--dir profiles] report [--match 'session_*'] [--thread MainThread]
+                                                [--top 25] [--folded merged.folded] [--svg flame.svg]
+"""
+import argparse
+import atexit
+import fnmatch
+import functools
+import html
+import os
+import re
+import sys
+import threading
+import time
+import zlib
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+
+PROFILE_DIR = os.environ.get('PROFILE_DIR')
+PROFILE_HZ = float(os.environ.get('PROFILE_HZ', '100'))
+PROFILE_FLUSH_SECONDS = 15
+
+_labels = {}  # code object -> "function (file.py:line)"
+
+
+def _label(code):
+    label = _labels.get(code)
+    if label is None:
+        label = _labels[code] = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+    return label
+
+
+def collapse(frame):
+    """Root-first 'frame;frame;...' string for a frame's stack"""
+    labels = []
+    while frame is not None:
+        labels.append(_label(frame.f_code))
+        frame = frame.f_back
+    return ';'.join(reversed(labels))
+
+
+class StackSampler:
+    """Counts the collapsed stacks of registered threads, sampled from one background thread"""
+
+    def __init__(self, hz=PROFILE_HZ):
+        self.interval = 1.0 / hz
+        self._lock = threading.Lock()
+        self._targets = {}  # token -> (thread ident, or None for every thread; Counter)
+        self._thread = None
+
+    def add(self, ident=None):
+        """Start counting stacks of thread `ident` (None: all threads); returns a token for remove()"""
+        token = object()
+        with self._lock:
+            self._targets[token] = (ident, Counter())
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+                self._thread.start()
+        return token
+
+    def remove(self, token):
+        """Stop counting; returns the Counter of collapsed stacks"""
+        with self._lock:
+            return self._targets.pop(token)[1]
+
+    def _run(self):
+        own = threading.get_ident()
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                targets = list(self._targets.values())
+            if not targets:
+                continue
+            frames = sys._current_frames()
+            names = None
+            stacks = {}
+            for ident, counts in targets:
+                if ident is not None:
+                    if ident in frames:
+                        if ident not in stacks:
+                            stacks[ident] = collapse(frames[ident])
+                        counts[stacks[ident]] += 1
+                    continue
+                if names is None:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                for tid, frame in frames.items():
+                    if tid == own:
+                        continue
+                    if tid not in stacks:
+                        stacks[tid] = collapse(frame)
+                    counts[f"{names.get(tid, tid)};{stacks[tid]}"] += 1
+            del frames
+
+
+_sampler = None
+_sampler_lock = threading.Lock()
+
+
+def get_sampler():
+    global _sampler
+    with _sampler_lock:
+        if _sampler is None:
+            _sampler = StackSampler()
+        return _sampler
+
+
+def write_folded(path, counts):
+    """Write collapsed stacks, most frequent first, replacing any earlier file"""
+    path = Path(path)
+    tmp = path.with_name(path.name + '.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        for stack, n in counts.most_common():
+            f.write(f"{stack} {n}\n")
+    os.replace(tmp, path)
+    return path
+
+
+def write_profile(name, counts):
+    """Write collapsed stacks to PROFILE_DIR/<name>.folded"""
+    directory = Path(PROFILE_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    return write_folded(directory / (re.sub(r'[^A-Za-z0-9_.-]', '_', name) + '.folded'), counts)
+
+
+@contextmanager
+def _profiled(name, all_threads):
+    sampler = get_sampler()
+    token = sampler.add(None if all_threads else threading.get_ident())
+    try:
+        yield
+    finally:
+        try:
+            write_profile(name, sampler.remove(token))
+        except OSError as e:
+            from console_utils import safe_print, WARNING
+            safe_print(f"⚠️ Could not write profile {name}: {e}", level=WARNING)
+
+
+def profiled(name, all_threads=False):
+    """Context manager sampling this thread (or every thread) into <name>.folded, if PROFILE_DIR is set"""
+    if not PROFILE_DIR:
+        return nullcontext()
+    return _profiled(name, all_threads)
+
+
+def profile_sessions(func):
+    """Decorator for func(session_id, ...): one profile per session, if PROFILE_DIR is set"""
+    if not PROFILE_DIR:
+        return func
+
+    @functools.wraps(func)
+    def wrapper(session_id, *args, **kwargs):
+        with _profiled(f"session_{session_id}", all_threads=True):
+            return func(session_id, *args, **kwargs)
+    return wrapper
+
+
+def install_flask(app):
+    """Profile each request's thread, summed per endpoint, if PROFILE_DIR is set"""
+    if not PROFILE_DIR:
+        return
+    from flask import g, request
+
+    lock = threading.Lock()
+    totals = {}  # endpoint -> Counter
+    state = {'last_flush': time.time()}
+
+    def flush():
+        with lock:
+            state['last_flush'] = time.time()
+            for endpoint, counts in totals.items():
+                write_profile(f"web_{endpoint}_{os.getpid()}", counts)
+
+    @app.before_request
+    def start_request_profile():
+        g.profile_token = get_sampler().add(threading.get_ident())
+
+    @app.teardown_request
+    def stop_request_profile(exc):
+        token = g.pop('profile_token', None)
+        if token is None:
+            return
+        counts = get_sampler().remove(token)
+        with lock:
+            totals.setdefault(request.endpoint or 'unmatched', Counter()).update(counts)
+            due = time.time() - state['last_flush'] >= PROFILE_FLUSH_SECONDS
+        if due:
+            try:
+                flush()
+            except OSError:
+                pass
+
+    atexit.register(flush)
+
+
+def load_folded(paths):
+    """Sum the collapsed stacks of several .folded files"""
+    merged = Counter()
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                stack, _, n = line.rstrip('\n').rpartition(' ')
+                if stack and n.isdigit():
+                    merged[stack] += int(n)
+    return merged
+
+
+def top_frames(stacks, limit=25):
+    """[(frame, self samples, inclusive samples)] by inclusive samples, largest first"""
+    inclusive = Counter()
+    own = Counter()
+    for stack, n in stacks.items():
+        frames = stack.split(';')
+        own[frames[-1]] += n
+        for frame in set(frames):
+            inclusive[frame] += n
+    return [(frame, own[frame], n) for frame, n in inclusive.most_common(limit)]
+
+
+def _flame_tree(stacks):
+    root = {'name': 'all', 'value': 0, 'children': {}}
+    for stack, n in stacks.items():
+        node = root
+        node['value'] += n
+        for frame in stack.split(';'):
+            node = node['children'].setdefault(frame, {'name': frame, 'value': 0, 'children': {}})
+            node['value'] += n
+    return root
+
+
+def render_svg(stacks, title='Flame graph', width=1200, row=16):
+    """Self-contained flame graph SVG (root at the bottom, hover for counts)"""
+    root = _flame_tree(stacks)
+    total = root['value'] or 1
+    rects = []
+
+    def depth(node):
+        return 1 + max((depth(child) for child in node['children'].values()), default=0)
+
+    height = (depth(root) + 1) * row + 24
+
+    def place(node, x, level):
+        w = node['value'] / total * width
+        if w < 0.3:
+            return
+        y = height - (level + 1) * row
+        hue = zlib.crc32(node['name'].encode('utf-8')) % 60
+        name = html.escape(node['name'])
+        label = html.escape(node['name'][:int(w / 7)]) if w > 35 else ''
+        rects.append(
+            f'<g><title>{name} ({node["value"]} samples, {node["value"] / total:.1%})</title>'
+            f'<rect x="{x:.1f}" y="{y}" width="{max(w - 0.5, 0.1):.1f}" height="{row - 1}" '
+            f'fill="hsl({hue},85%,60%)"/>'
+            f'<text x="{x + 3:.1f}" y="{y + row - 4}">{label}</text></g>')
+        for child in sorted(node['children'].values(), key=lambda c: c['name']):
+            place(child, x, level + 1)
+            x += child['value'] / total * width
+
+    place(root, 0.0, 0)
+    return (f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+            f'font-family="monospace" font-size="11">'
+            f'<text x="4" y="16" font-size="14">{html.escape(title)}</text>'
+            + ''.join(rects) + '</svg>\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dir', default=PROFILE_DIR or 'profiles')
+    sub = parser.add_subparsers(dest='command', required=True)
+    report = sub.add_parser('report', help='merge profiles into one collapsed-stack report')
+    report.add_argument('--match', default='*', help="profile name pattern, e.g. 'session_*' or 'web_*'")
+    report.add_argument('--thread', help="only stacks of threads matching this name pattern, e.g. MainThread "
+                                         "(session profiles)")
+    report.add_argument('--top', type=int, default=25, help='frames to list')
+    report.add_argument('--folded', help='write the merged collapsed stacks here')
+    report.add_argument('--svg', help='write a flame graph SVG here')
+    args = parser.parse_args()
+
+    paths = sorted(p for p in Path(args.dir).glob('*.folded') if fnmatch.fnmatch(p.stem, args.match))
+    if not paths:
+        print(f"No profiles matching {args.match!r} in {args.dir}")
+        return 1
+    stacks = load_folded(paths)
+    if args.thread:
+        stacks = Counter({stack: n for stack, n in stacks.items()
+                          if fnmatch.fnmatch(stack.split(';', 1)[0], args.thread)})
+    total = sum(stacks.values()) or 1
+    print(f"{len(paths)} profiles, {total} samples")
+    print(f"{'self':>7} {'total':>7}  frame")
+    for frame, own, inclusive in top_frames(stacks, args.top):
+        print(f"{own / total:7.1%} {inclusive / total:7.1%}  {frame}")
+    if args.folded:
+        write_folded(args.folded, stacks)
+        print(f"Merged stacks written to {args.folded}")
+    if args.svg:
+        Path(args.svg).write_text(render_svg(stacks, f"{len(paths)} profiles matching {args.match}"),
+                                  encoding='utf-8')
+        print(f"Flame graph written to {args.svg}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
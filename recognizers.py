@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+Recognizer Fan-Out
+Capture an utterance once into a shared buffer and run several recognizer backends on it
+concurrently; a selection policy picks the transcript. Streaming backends (Vosk) decode
+while the voter is still speaking, batch backends (Google) get the finished utterance.
+
+Backends share one interface, so ScriptedBackend can stand in for a network recognizer.
+"""
+import json
+import queue
+import threading
+import time
+from collections import namedtuple
+
+from console_utils import safe_print, WARNING
+from metrics import observe
+
+Hypothesis = namedtuple('Hypothesis', 'text confidence backend')
+
+SAMPLE_WIDTH = 2  # 16-bit mono PCM
+
+
+class Utterance:
+    """Append-only PCM buffer written by the capture loop and read by every backend
+
+    The buffer is preallocated for the longest utterance, so backends can hold
+    memoryviews of it while capture continues; audio past the end is dropped.
+    """
+
+    def __init__(self, rate, seconds):
+        self.rate = rate
+        self._buf = bytearray(int(rate * seconds) * SAMPLE_WIDTH)
+        self._view = memoryview(self._buf)
+        self.length = 0
+        self.dropped_bytes = 0
+        self.closed = False
+        self._cond = threading.Condition()
+
+    def append(self, data):
+        n = min(len(data), len(self._buf) - self.length)
+        self._view[self.length:self.length + n] = data[:n]
+        with self._cond:
+            self.length += n
+            self.dropped_bytes += len(data) - n
+            self._cond.notify_all()
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+    def read(self, offset, timeout=0.1):
+        """Return a view of audio after `offset`; empty once closed and fully read"""
+        with self._cond:
+            if offset >= self.length and not self.closed:
+                self._cond.wait(timeout)
+            end = self.length
+        return self._view[offset:end]
+
+    def wait_closed(self, timeout=None):
+        with self._cond:
+            self._cond.wait_for(lambda: self.closed, timeout)
+            return self.closed
+
+    def pcm(self):
+        return self._view[:self.length]
+
+
+class Backend:
+    """Recognizer interface: run(utterance) returns a Hypothesis or None
+
+    Streaming backends override begin/feed/finish; batch backends override run.
+    """
+
+    name = 'backend'
+
+    def begin(self, rate):
+        pass
+
+    def feed(self, view):
+        pass
+
+    def finish(self):
+        return None
+
+    def run(self, utterance):
+        self.begin(utterance.rate)
+        stream(utterance, self.feed)
+        return self.finish()
+
+
+def stream(utterance, feed):
+    """Call feed with each new view of the utterance until it is closed and fully read"""
+    offset = 0
+    while True:
+        view = utterance.read(offset)
+        if not len(view):
+            if utterance.closed and offset >= utterance.length:
+                return
+            continue
+        feed(view)
+        offset += len(view)
+
+
+class _VoskRun:
+    """Transcript state of one utterance, kept apart from any other run of the backend"""
+
+    def __init__(self, rec, accept):
+        self.rec = rec
+        self.accept = accept
+        self.texts = []
+        self.confidences = []
+
+    def _collect(self, result):
+        j = json.loads(result)
+        if j.get('text'):
+            self.texts.append(j['text'])
+            self.confidences.extend(w.get('conf', 1.0) for w in j.get('result', []))
+
+    def feed(self, view):
+        if self.accept(self.rec, view):
+            self._collect(self.rec.Result())
+
+    def finish(self, name):
+        self._collect(self.rec.FinalResult())
+        if not self.texts:
+            return None
+        confidence = sum(self.confidences) / len(self.confidences) if self.confidences else 1.0
+        return Hypothesis(' '.join(self.texts).lower(), confidence, name)
+
+
+class VoskBackend(Backend):
+    """Streaming Vosk decoder; confidence is the mean per-word confidence
+
+    Pass `recognizer` to reuse one KaldiRecognizer across steps; it is Reset() per utterance.
+    FanOut may give up on a run that is still decoding, so a new run first waits up to
+    busy_timeout for it and, if it is still going, decodes with a recognizer of its own
+    instead of resetting the shared one underneath it.
+    """
+
+    name = 'vosk'
+
+    def __init__(self, model, recognizer_class, accept=None, recognizer=None, busy_timeout=2.0):
+        self.model = model
+        self.recognizer_class = recognizer_class
+        self.accept = accept or (lambda rec, view: rec.AcceptWaveform(bytes(view)))
+        self.rec = recognizer
+        self.busy_timeout = busy_timeout
+        self._busy = threading.Lock()
+
+    def _new_recognizer(self, rate):
+        rec = self.recognizer_class(self.model, rate)
+        rec.SetWords(True)
+        return rec
+
+    def _decode(self, rec, utterance):
+        state = _VoskRun(rec, self.accept)
+        stream(utterance, state.feed)
+        return state.finish(self.name)
+
+    def run(self, utterance):
+        if not self._busy.acquire(timeout=self.busy_timeout):
+            safe_print("⚠️ Previous Vosk run still decoding, using a fresh recognizer", level=WARNING)
+            return self._decode(self._new_recognizer(utterance.rate), utterance)
+        try:
+            if self.rec is None:
+                self.rec = self._new_recognizer(utterance.rate)
+            else:
+                self.rec.Reset()
+            return self._decode(self.rec, utterance)
+        finally:
+            self._busy.release()
+
+
+class GoogleBackend(Backend):
+    """Google Web Speech on the finished utterance (network round trip)"""
+
+    name = 'google'
+
+    def run(self, utterance):
+        import speech_recognition as sr
+        utterance.wait_closed()
+        if not utterance.length:
+            return None
+        audio = sr.AudioData(bytes(utterance.pcm()), utterance.rate, SAMPLE_WIDTH)
+        try:
+            response = sr.Recognizer().recognize_google(audio, show_all=True)
+        except (sr.RequestError, sr.UnknownValueError):
+            return None
+        alternatives = response.get('alternative') if isinstance(response, dict) else None
+        if not alternatives:
+            return None
+        best = alternatives[0]
+        # Google only scores its top alternative, and not always
+        return Hypothesis(best['transcript'].lower(), best.get('confidence', 0.7), self.name)
+
+
+class ScriptedBackend(Backend):
+    """Local stand-in: returns a fixed transcript `delay` seconds after the utterance ends"""
+
+    def __init__(self, text, confidence=1.0, delay=0.0, name='scripted'):
+        self.text = text
+        self.confidence = confidence
+        self.delay = delay
+        self.name = name
+
+    def run(self, utterance):
+        utterance.wait_closed()
+        time.sleep(self.delay)
+        if not self.text:
+            return None
+        return Hypothesis(self.text, self.confidence, self.name)
+
+
+def _normalize(text):
+    return ' '.join(text.lower().split())
+
+
+class FirstConfident:
+    """Take the first result at or above min_confidence, else the best once all are in"""
+
+    def __init__(self, min_confidence=0.6):
+        self.min_confidence = min_confidence
+
+    def decide(self, results, finished):
+        for hyp in results:
+            if hyp.confidence >= self.min_confidence:
+                return hyp
+        return BestScore().decide(results, finished)
+
+
+class BestScore:
+    """Wait for every backend and take the highest confidence"""
+
+    def decide(self, results, finished):
+        if not finished or not results:
+            return None
+        return max(results, key=lambda h: h.confidence)
+
+
+class Agreement:
+    """Take a transcript as soon as two backends agree; otherwise the best score"""
+
+    def decide(self, results, finished):
+        by_text = {}
+        for hyp in results:
+            by_text.setdefault(_normalize(hyp.text), []).append(hyp)
+        for agreeing in by_text.values():
+            if len(agreeing) >= 2:
+                return max(agreeing, key=lambda h: h.confidence)
+        return BestScore().decide(results, finished)
+
+
+POLICIES = {
+    'first_confident': FirstConfident,
+    'best_score': BestScore,
+    'agreement': Agreement,
+}
+
+
+class FanOut:
+    """Run backends concurrently on one captured utterance and apply a selection policy"""
+
+    def __init__(self, backends, policy='first_confident', result_timeout=5.0):
+        self.backends = list(backends)
+        self.policy = POLICIES[policy]() if isinstance(policy, str) else policy
+        self.result_timeout = result_timeout
+
+    def _run_backend(self, backend, utterance, results):
+        started = time.perf_counter()
+        try:
+            hyp = backend.run(utterance)
+        except Exception as e:
+            safe_print(f"⚠️ ASR backend {backend.name} failed: {e}", level=WARNING,
+                       rate_key=f'asr_backend_error_{backend.name}', per_second=1)
+            hyp = None
+        observe(f'asr_backend_{backend.name}', time.perf_counter() - started)
+        results.put(hyp if hyp and hyp.text.strip() else None)
+
+    def recognize(self, chunks, rate, seconds, should_stop=None):
+        """Feed captured chunks to every backend; return the chosen Hypothesis or None
+
+        `chunks` is any iterable of PCM buffers, e.g. AudioCapture.chunks(seconds).
+        Capture stops early if the policy is already satisfied.
+        """
+        utterance = Utterance(rate, seconds)
+        results = queue.Queue()
+        for backend in self.backends:
+            threading.Thread(target=self._run_backend, args=(backend, utterance, results),
+                             name=f'asr-{backend.name}', daemon=True).start()
+
+        collected = []
+        pending = len(self.backends)
+
+        def drain(block_until=None):
+            nonlocal pending
+            while pending:
+                try:
+                    if block_until is None:
+                        hyp = results.get_nowait()
+                    else:
+                        hyp = results.get(timeout=max(0.0, block_until - time.time()))
+                except queue.Empty:
+                    return None
+                pending -= 1
+                if hyp is not None:
+                    collected.append(hyp)
+                decided = self.policy.decide(collected, finished=not pending)
+                if decided is not None:
+                    return decided
+            return None
+
+        decided = None
+        try:
+            for chunk in chunks:
+                utterance.append(chunk)
+                if callable(should_stop) and should_stop():
+                    break
+                decided = drain()
+                if decided is not None:
+                    break
+        finally:
+            utterance.close()
+
+        if decided is None:
+            decided = drain(block_until=time.time() + self.result_timeout)
+        if decided is None:
+            # Timed out on slow backends: decide with whatever arrived
+            decided = self.policy.decide(collected, finished=True)
+        return decided
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+Independent Recount
+Recounts an election's votes table from raw rows before results are certified, without
+trusting get_votes(), the turnout rollups or any other cached tally.
+
+Rows are streamed in id order, chunk by chunk, into NumPy arrays and tallied with
+bincount; row ranges are split across worker processes. Along the way every vote
+is checked for a candidate id that exists in `candidates` and a voter token that
+is on the roll (`voters`), and tokens that voted more than once are flagged.
+Memory is bounded by the chunk size and one bit-per-voter map per worker, not by
+the number of votes.
+
+Usage:
+    python recount.py [--db votes.db] [--election ID] [--workers 8] [--chunk 1000000] [--json]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import ExitStack
+from pathlib import Path
+
+import numpy as np
+
+CHUNK_ROWS = 1_000_000
+SAMPLE_SIZE = 20  # offending vote ids / tokens listed in the report
+
+# Each vote is packed into one integer, (candidate_id + 1) << 32 | voter rowid,
+# and a whole chunk comes back as a single comma-separated string that NumPy
+# parses in C; building a Python tuple per row would cost more than the count.
+# 0 in the high half means a non-integer or unknown-range candidate id; 0 in the
+# low half means the token is not on the voter roll.
+VOTER_BITS = 32
+VOTER_MASK = (1 << VOTER_BITS) - 1
+
+RANGE_QUERY = f"""
+    SELECT group_concat(((CASE WHEN typeof(v.candidate_id) = 'integer' AND v.candidate_id BETWEEN 0 AND ?
+                               THEN v.candidate_id + 1 ELSE 0 END) << {VOTER_BITS})
+                        | COALESCE(r.rowid, 0))
+    FROM votes v LEFT JOIN voters r ON r.id = v.voter_token
+    WHERE v.id > ? AND v.id <= ?
+"""
+
+
+def _readonly_uri(path):
+    return 'file:' + os.path.abspath(path).replace('?', '%3f').replace('#', '%23') + '?mode=ro'
+
+
+def _connect_readonly(db_path, election_db=None):
+    """Read-only connection; election_db (an election's file) is attached to the voter roll in db_path"""
+    conn = sqlite3.connect(_readonly_uri(db_path), uri=True, timeout=30.0)
+    if election_db is not None:
+        conn.execute("ATTACH DATABASE ? AS election", (_readonly_uri(election_db),))
+    return conn
+
+
+def _recount_range(paths, lo, hi, chunk_rows, roll_size, max_candidate):
+    """Tally votes with lo < id <= hi; runs in a worker process
+
+    Candidate ids above `max_candidate` count as invalid, so the tally array
+    stays as small as the candidates table.
+    """
+    conn = _connect_readonly(*paths)
+    tally = np.zeros(max_candidate + 1, dtype=np.int64)
+    seen = np.zeros(roll_size + 1, dtype=bool)
+    duplicate = np.zeros(roll_size + 1, dtype=bool)
+    rows = invalid_candidate = orphaned = duplicate_votes = 0
+    try:
+        start = lo
+        while start < hi:
+            end = min(start + chunk_rows, hi)
+            text = conn.execute(RANGE_QUERY, (max_candidate, start, end)).fetchone()[0]
+            start = end
+            if not text:
+                continue
+            packed = np.fromstring(text, dtype=np.int64, sep=',')
+            rows += packed.size
+
+            candidates = packed >> VOTER_BITS
+            valid = candidates > 0
+            invalid_candidate += int(packed.size - np.count_nonzero(valid))
+            tally += np.bincount(candidates[valid] - 1, minlength=tally.size)
+
+            voters = packed & VOTER_MASK
+            on_roll = voters[voters > 0]
+            orphaned += int(packed.size - on_roll.size)
+            ids, per_voter = np.unique(on_roll, return_counts=True)
+            again = seen[ids]
+            # Extra votes: every vote by a voter already seen, plus repeats within this chunk
+            duplicate_votes += int(per_voter[again].sum() + (per_voter[~again] - 1).sum())
+            duplicate[ids[again | (per_voter > 1)]] = True
+            seen[ids] = True
+    finally:
+        conn.close()
+    return {
+        'rows': rows,
+        'tally': tally,
+        'invalid_candidate': invalid_candidate,
+        'orphaned': orphaned,
+        'duplicate_votes': duplicate_votes,
+        'seen': np.packbits(seen),
+        'duplicate': np.packbits(duplicate),
+    }
+
+
+def _split(lo, hi, parts):
+    """Split the id range (lo, hi] into `parts` contiguous ranges"""
+    step = max(1, -(-(hi - lo) // parts))
+    return [(start, min(start + step, hi)) for start in range(lo, hi, step)]
+
+
+def _merge(results):
+    tally = np.zeros_like(results[0]['tally'])
+    seen = duplicate = None
+    total = {key: 0 for key in ('rows', 'invalid_candidate', 'orphaned', 'duplicate_votes')}
+    for r in results:
+        tally += r['tally']
+        for key in total:
+            total[key] += r[key]
+        if seen is None:
+            seen, duplicate = r['seen'], r['duplicate'].copy()
+            continue
+        # A voter seen by two ranges voted more than once: count every vote after the first
+        both = seen & r['seen']
+        total['duplicate_votes'] += int(np.unpackbits(both).sum())
+        duplicate |= r['duplicate'] | both
+        seen = seen | r['seen']
+    return tally, duplicate, total
+
+
+def _samples(conn, max_id, duplicate_bits, valid_ids, orphaned, invalid):
+    """A few offending vote ids and tokens, looked up by SQL only for checks that failed"""
+    duplicate_rowids = np.flatnonzero(np.unpackbits(duplicate_bits))[:SAMPLE_SIZE].tolist()
+    duplicates = []
+    if duplicate_rowids:
+        marks = ','.join('?' * len(duplicate_rowids))
+        duplicates = [row[0] for row in conn.execute(
+            f"SELECT id FROM voters WHERE rowid IN ({marks}) ORDER BY rowid", duplicate_rowids)]
+    if orphaned:
+        orphaned = conn.execute(
+            "SELECT v.id, v.voter_token FROM votes v LEFT JOIN voters r ON r.id = v.voter_token "
+            "WHERE v.id <= ? AND r.id IS NULL ORDER BY v.id LIMIT ?", (max_id, SAMPLE_SIZE)).fetchall()
+    if invalid:
+        marks = ','.join('?' * len(valid_ids))
+        invalid = conn.execute(
+            f"SELECT id, candidate_id FROM votes WHERE id <= ? AND (candidate_id IS NULL "
+            f"OR candidate_id NOT IN ({marks})) ORDER BY id LIMIT ?",
+            (max_id, *valid_ids, SAMPLE_SIZE)).fetchall()
+    return duplicates, orphaned or [], invalid or []
+
+
+def _live_tallies(paths, max_candidate):
+    """What the running system reports: get_votes()'s query and the turnout rollups
+
+    Both are read as they stand, so results should be certified after polls close.
+    Only integer candidate ids the recount could tally are compared; the rest are
+    already reported as invalid votes.
+    """
+    def comparable(rows):
+        return {cid: n for cid, n in rows if isinstance(cid, int) and 0 <= cid <= max_candidate and n}
+
+    conn = _connect_readonly(*paths)
+    try:
+        live = comparable(conn.execute("SELECT candidate_id, COUNT(*) FROM votes GROUP BY candidate_id"))
+        try:
+            rollup = comparable(conn.execute("SELECT candidate_id, SUM(votes) FROM turnout_hour GROUP BY candidate_id"))
+        except sqlite3.OperationalError:
+            rollup = None
+    finally:
+        conn.close()
+    return live, rollup
+
+
+def recount(db_path, workers=None, chunk_rows=CHUNK_ROWS, election_db=None):
+    """Recount every vote up to the current highest id and return a report dict
+
+    election_db is the election's own file when db_path is the catalog holding the
+    voter roll; without it the votes are read from db_path itself. `ok` is True only if every vote is valid, unique and on the roll, and both
+    the live tally and the rollups agree with the recount.
+    """
+    started = time.perf_counter()
+    workers = workers or os.cpu_count() or 1
+    paths = (db_path, election_db)
+    conn = _connect_readonly(*paths)
+    try:
+        min_id, max_id = conn.execute("SELECT COALESCE(MIN(id), 1) - 1, COALESCE(MAX(id), 0) FROM votes").fetchone()
+        roll_size = conn.execute("SELECT COALESCE(MAX(rowid), 0) FROM voters").fetchone()[0]
+        candidates = dict(conn.execute("SELECT id, name FROM candidates"))
+        max_candidate = max(candidates, default=0)
+
+        # Small tables are not worth a process pool: give each worker at least one chunk
+        workers = max(1, min(workers, -(-(max_id - min_id) // chunk_rows)))
+        ranges = _split(min_id, max_id, workers) or [(min_id, max_id)]
+        args = [(paths, lo, hi, chunk_rows, roll_size, max_candidate) for lo, hi in ranges]
+        # The live tally's GROUP BY scans the table too; run it alongside the recount.
+        # Workers are spawned, not forked, and before the side thread starts: a child
+        # forked while another thread holds a lock (SQLite, the log writer) can deadlock.
+        with ExitStack() as stack:
+            if len(args) == 1:
+                side = stack.enter_context(ThreadPoolExecutor(max_workers=1))
+                live_tallies = side.submit(_live_tallies, paths, max_candidate)
+                results = [_recount_range(*args[0])]
+            else:
+                pool = stack.enter_context(ProcessPoolExecutor(
+                    max_workers=len(args), mp_context=multiprocessing.get_context('spawn')))
+                futures = [pool.submit(_recount_range, *a) for a in args]
+                side = stack.enter_context(ThreadPoolExecutor(max_workers=1))
+                live_tallies = side.submit(_live_tallies, paths, max_candidate)
+                results = [f.result() for f in futures]
+            live, rollup = live_tallies.result()
+        tally, duplicate_bits, totals = _merge(results)
+
+        # Candidate ids inside the tallied range that are not in the candidates table
+        unknown = {cid: n for cid, n in enumerate(tally.tolist()) if n and cid not in candidates}
+        counts = {cid: int(tally[cid]) for cid in sorted(candidates)}
+        invalid_votes = totals['invalid_candidate'] + sum(unknown.values())
+        duplicates, orphaned, invalid = _samples(conn, max_id, duplicate_bits, sorted(candidates) or [None],
+                                                 totals['orphaned'], invalid_votes)
+    finally:
+        conn.close()
+
+    recounted = {cid: n for cid, n in counts.items() if n}
+    recounted.update(unknown)
+    report = {
+        'db': str(db_path),
+        'election_db': str(election_db) if election_db else None,
+        'max_vote_id': max_id,
+        'rows': totals['rows'],
+        'workers': len(ranges),
+        'seconds': round(time.perf_counter() - started, 3),
+        'tally': {str(cid): {'name': candidates[cid], 'votes': n} for cid, n in counts.items()},
+        'invalid_candidate_votes': invalid_votes,
+        'orphaned_votes': totals['orphaned'],
+        'duplicate_votes': totals['duplicate_votes'],
+        'duplicate_tokens': int(np.unpackbits(duplicate_bits).sum()),
+        'samples': {
+            'invalid_candidate': [list(row) for row in invalid],
+            'orphaned': [list(row) for row in orphaned],
+            'duplicate_tokens': duplicates,
+        },
+        'live_tally_matches': live == recounted,
+        'rollup_matches': None if rollup is None else rollup == recounted,
+    }
+    if live != recounted:
+        report['live_tally'] = {str(k): v for k, v in live.items()}
+    if rollup is not None and rollup != recounted:
+        report['rollup_tally'] = {str(k): v for k, v in rollup.items()}
+    report['ok'] = (not invalid_votes and not totals['orphaned'] and not totals['duplicate_votes']
+                    and report['live_tally_matches'] and report['rollup_matches'] is not False)
+    return report
+
+
+def print_report(report):
+    print(f"Recounted {report['rows']:,} votes (ids up to {report['max_vote_id']}) "
+          f"on {report['workers']} workers in {report['seconds']}s")
+    for cid, entry in report['tally'].items():
+        print(f"  {cid:>4}  {entry['name']:<20} {entry['votes']:>12,}")
+    checks = [
+        ('Invalid candidate ids', report['invalid_candidate_votes'], report['samples']['invalid_candidate']),
+        ('Tokens not on the roll', report['orphaned_votes'], report['samples']['orphaned']),
+        ('Repeat votes', report['duplicate_votes'], report['samples']['duplicate_tokens']),
+    ]
+    for label, count, sample in checks:
+        print(f"{'❌' if count else '✅'} {label}: {count:,}" + (f"  e.g. {sample[:5]}" if count else ''))
+    print(f"{'✅' if report['live_tally_matches'] else '❌'} Live tally (get_votes) "
+          f"{'matches' if report['live_tally_matches'] else 'differs: ' + json.dumps(report.get('live_tally'))}")
+    if report['rollup_matches'] is not None:
+        print(f"{'✅' if report['rollup_matches'] else '❌'} Turnout rollups "
+              f"{'match' if report['rollup_matches'] else 'differ: ' + json.dumps(report.get('rollup_tally'))}")
+    print('✅ Recount verified' if report['ok'] else '❌ Recount found problems - do not certify')
+
+
+def main():
+    import db
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', default=str(db.DB_PATH), help='catalog with the voter roll')
+    parser.add_argument('--election', help='election to recount (default: the active one)')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: all cores)')
+    parser.add_argument('--chunk', type=int, default=CHUNK_ROWS, help='vote ids per query')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args()
+
+    db.DB_PATH = Path(args.db)
+    report = recount(args.db, workers=args.workers, chunk_rows=args.chunk,
+                     election_db=db.election_path(args.election))
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+    return 0 if report['ok'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Session Status
+Voice workers report progress to the web interface through the shared session store
+"""
+from console_utils import safe_print
+from metrics import timed
+from session_store import get_session_store
+
+@timed('status_write')
+def _write_status(session_id, **fields):
+    if not get_session_store().update(session_id, **fields):
+        safe_print(f"Session {session_id} no longer exists (reset?)")
+
+def send_status(session_id, step, status, message):
+    """Send status update to web interface via the session store"""
+    try:
+        _write_status(session_id, step=step, status=status, message=message)
+    except Exception as e:
+        safe_print(f"Error writing status: {e}")
+
+def send_receipt_code(session_id, code):
+    """Leave the vote's receipt code for the voter's screen to collect once
+
+    The code salts the vote's ledger commitment: with it and the public proof anyone
+    can tell how this voter voted, so it never goes into the status, logs or speech.
+    Call before send_final_result, which tells the page there is a code to collect.
+    """
+    try:
+        get_session_store().set_receipt(session_id, code)
+    except Exception as e:
+        safe_print(f"Error storing receipt code: {e}")
+
+def send_final_result(session_id, success, message, voter_id=None, candidate=None, receipt=None):
+    """Send final result to web interface via the session store"""
+    result = {
+        'success': success,
+        'voter_id': voter_id,
+        'candidate': candidate,
+        # Vote id; /api/votes/<receipt>/proof proves it is counted in the published root
+        'receipt': receipt,
+    }
+
+    try:
+        _write_status(session_id, step=3, status='completed' if success else 'error',
+                      message=message, result=result)
+    except Exception as e:
+        safe_print(f"Error writing final result: {e}")
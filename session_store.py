@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Session Store
+Voting session state shared by every web worker process and the voice workers:
+status, step, latest message, final result and which process is running the session.
+A vote's private receipt code is kept apart from that status: the voter's own screen
+collects it once with take_receipt(), and it is never part of get().
+
+SessionStore keeps it in SQLite (SESSION_DB, default sessions.db in the working
+directory); MemorySessionStore is an in-process stand-in with the same interface.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    status TEXT,
+    step INTEGER,
+    message TEXT,
+    result TEXT,
+    worker_host TEXT,
+    worker_pid INTEGER,
+    exit_code INTEGER,
+    created REAL,
+    updated REAL
+)
+"""
+
+# One-shot pickup of receipt codes; rows go when collected or with their session
+RECEIPTS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS receipts (
+    session_id TEXT PRIMARY KEY,
+    code TEXT NOT NULL,
+    created REAL
+)
+"""
+
+FIELDS = ('status', 'step', 'message', 'result', 'worker_host', 'worker_pid', 'exit_code', 'created', 'updated')
+FINAL_STATUSES = ('completed', 'error')
+
+
+def is_finished(session):
+    """True once the worker reported a final result or exited"""
+    return session['status'] in FINAL_STATUSES or session['exit_code'] is not None
+
+
+class SessionStore:
+    """SQLite-backed store; safe to share between processes on one machine"""
+
+    def __init__(self, path):
+        self.path = str(path)
+        conn = self._connect()
+        try:
+            # WAL lets status polls read while a worker is writing
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(SCHEMA)
+            conn.execute(RECEIPTS_SCHEMA)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=5.0)
+
+    def create(self, session_id, worker_pid, worker_host=None, message='Starting voice voting...'):
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO sessions (session_id, status, step, message, result, worker_host, "
+                "worker_pid, exit_code, created, updated) VALUES (?, 'listening', 1, ?, NULL, ?, ?, NULL, ?, ?)",
+                (session_id, message, worker_host, worker_pid, now, now))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def update(self, session_id, status=None, step=None, message=None, result=None, worker_pid=None):
+        """Record progress; returns False if the session no longer exists (e.g. it was reset)"""
+        changes = {'status': status, 'step': step, 'message': message,
+                   'result': json.dumps(result) if result is not None else None, 'worker_pid': worker_pid}
+        changes = {k: v for k, v in changes.items() if v is not None}
+        changes['updated'] = time.time()
+        conn = self._connect()
+        try:
+            cur = conn.execute(
+                f"UPDATE sessions SET {', '.join(f'{k} = ?' for k in changes)} WHERE session_id = ?",
+                (*changes.values(), session_id))
+            conn.commit()
+            return cur.rowcount > 0
+        finally:
+            conn.close()
+
+    def finish(self, session_id, exit_code):
+        """Record the worker's exit; a worker that died without a result becomes an error"""
+        conn = self._connect()
+        try:
+            conn.execute(
+                "UPDATE sessions SET exit_code = ?, updated = ?, "
+                "status = CASE WHEN status IN ('completed', 'error') THEN status ELSE 'error' END, "
+                "message = CASE WHEN status IN ('completed', 'error') THEN message "
+                "ELSE 'Voice worker exited unexpectedly' END "
+                "WHERE session_id = ?",
+                (exit_code, time.time(), session_id))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def get(self, session_id):
+        conn = self._connect()
+        try:
+            row = conn.execute(f"SELECT {', '.join(FIELDS)} FROM sessions WHERE session_id = ?",
+                               (session_id,)).fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            return None
+        session = dict(zip(FIELDS, row))
+        session['result'] = json.loads(session['result']) if session['result'] else None
+        return session
+
+    def delete(self, session_id):
+        conn = self._connect()
+        try:
+            conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+            conn.execute("DELETE FROM receipts WHERE session_id = ?", (session_id,))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def set_receipt(self, session_id, code):
+        """Leave a receipt code for the session's voter to collect once"""
+        conn = self._connect()
+        try:
+            conn.execute("INSERT OR REPLACE INTO receipts (session_id, code, created) VALUES (?, ?, ?)",
+                         (session_id, code, time.time()))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def take_receipt(self, session_id):
+        """The session's receipt code, removed as it is read; None if absent or already collected"""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT code FROM receipts WHERE session_id = ?", (session_id,)).fetchone()
+            conn.execute("DELETE FROM receipts WHERE session_id = ?", (session_id,))
+            conn.commit()
+            return row[0] if row else None
+        finally:
+            conn.close()
+
+    def purge(self, older_than):
+        """Delete finished sessions last updated more than `older_than` seconds ago"""
+        conn = self._connect()
+        try:
+            cur = conn.execute(
+                "DELETE FROM sessions WHERE updated < ? AND (status IN ('completed', 'error') OR exit_code IS NOT NULL)",
+                (time.time() - older_than,))
+            conn.execute("DELETE FROM receipts WHERE created < ? OR session_id NOT IN (SELECT session_id FROM sessions)",
+                         (time.time() - older_than,))
+            conn.commit()
+            return cur.rowcount
+        finally:
+            conn.close()
+
+
+class MemorySessionStore:
+    """Single-process stand-in for SessionStore (tests, one-worker deployments)"""
+
+    def __init__(self):
+        self._sessions = {}
+        self._receipts = {}
+        self._lock = threading.Lock()
+
+    def create(self, session_id, worker_pid, worker_host=None, message='Starting voice voting...'):
+        now = time.time()
+        with self._lock:
+            self._sessions[session_id] = {
+                'status': 'listening', 'step': 1, 'message': message, 'result': None,
+                'worker_host': worker_host, 'worker_pid': worker_pid, 'exit_code': None,
+                'created': now, 'updated': now,
+            }
+
+    def update(self, session_id, status=None, step=None, message=None, result=None, worker_pid=None):
+        changes = {'status': status, 'step': step, 'message': message, 'result': result, 'worker_pid': worker_pid}
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return False
+            session.update({k: v for k, v in changes.items() if v is not None})
+            session['updated'] = time.time()
+            return True
+
+    def finish(self, session_id, exit_code):
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return
+            session['exit_code'] = exit_code
+            session['updated'] = time.time()
+            if session['status'] not in FINAL_STATUSES:
+                session['status'] = 'error'
+                session['message'] = 'Voice worker exited unexpectedly'
+
+    def get(self, session_id):
+        with self._lock:
+            session = self._sessions.get(session_id)
+            return dict(session) if session is not None else None
+
+    def delete(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+            self._receipts.pop(session_id, None)
+
+    def set_receipt(self, session_id, code):
+        with self._lock:
+            self._receipts[session_id] = code
+
+    def take_receipt(self, session_id):
+        with self._lock:
+            return self._receipts.pop(session_id, None)
+
+    def purge(self, older_than):
+        cutoff = time.time() - older_than
+        with self._lock:
+            stale = [sid for sid, s in self._sessions.items() if s['updated'] < cutoff and is_finished(s)]
+            for sid in stale:
+                del self._sessions[sid]
+                self._receipts.pop(sid, None)
+            return len(stale)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_session_store():
+    """Process-wide store; SESSION_DB=:memory: selects the in-process stand-in"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            path = os.environ.get('SESSION_DB', 'sessions.db')
+            _store = MemorySessionStore() if path == ':memory:' else SessionStore(path)
+        return _store
+
+
+def set_session_store(store):
+    """Install the process-wide store, e.g. a MemorySessionStore for the single-process kiosk"""
+    global _store
+    with _store_lock:
+        _store = store
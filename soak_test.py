@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Resource Soak Test
+Runs tens of thousands of stub voting sessions end to end and samples this process's
+RSS, open file descriptors, live child processes and working-directory disk use as it
+goes. Fails (exit 1) if any of them is still growing once the warm-up is over: RSS,
+descriptors or disk beyond a threshold between the first sample after warm-up and the
+last sample after the sessions drain, or any voice worker left running.
+
+--mode kiosk serves voters in-process through kiosk.run with scripted audio.
+--mode web serves web_voting_app in-process (like load_test.py) and drives it with
+booths that start a session, poll it and reset it, each session a stub_voice_worker.py
+subprocess. Votes and the Merkle ledger grow by design and are left out of disk use.
+
+Usage: python soak_test.py [--mode kiosk|web] [--sessions 20000] [--booths 8]
+                           [--time-scale 0] [--output soak_results.json]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from proc_stats import child_pids, dir_bytes, format_mb, open_fd_count, rss_bytes
+
+HERE = Path(__file__).resolve().parent
+
+
+class Sampler:
+    """Background thread sampling this process's resources every `interval` seconds"""
+
+    def __init__(self, workdir, exclude, interval):
+        self.workdir = workdir
+        self.exclude = exclude
+        self.interval = interval
+        self.done = 0
+        self.samples = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='soak-sampler', daemon=True)
+
+    def sample(self):
+        children = child_pids()
+        entry = {
+            't': round(time.time() - self.started, 3),
+            'sessions': self.done,
+            'rss_bytes': rss_bytes(),
+            'open_fds': open_fd_count(),
+            'children': None if children is None else len(children),
+            'disk_bytes': dir_bytes(self.workdir, self.exclude),
+        }
+        self.samples.append(entry)
+        return entry
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def start(self):
+        self.started = time.time()
+        self.sample()
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self.sample()
+
+
+def run_kiosk(args, sampler):
+    from kiosk import run
+    kiosk_args = argparse.Namespace(sessions=args.sessions, wait='none', pause=0, status_port=None,
+                                    stub=True, time_scale=args.time_scale, seed=args.seed, report=None)
+
+    def on_session(n, entry):
+        sampler.done = n
+        if not entry['success']:
+            failures.append(n)
+
+    failures = []
+    run(kiosk_args, on_session=on_session)
+    return {'completed': sampler.done - len(failures), 'failed': len(failures)}
+
+
+def run_web(args, sampler):
+    from load_test import Recorder, call
+    base_url = args.base_url
+    recorder = Recorder()
+    next_session = iter(range(args.sessions))
+    lock = threading.Lock()
+
+    def booth():
+        while True:
+            with lock:
+                if next(next_session, None) is None:
+                    return
+            started = call(base_url, recorder, 'start', '/api/start-voice-voting', method='POST')
+            if not started:
+                recorder.count('failed')
+                continue
+            session_id = started['session_id']
+            give_up = time.time() + args.session_timeout
+            while True:
+                time.sleep(args.poll_interval)
+                status = call(base_url, recorder, 'status', f'/api/voting-status/{session_id}')
+                if status and status.get('status') in ('completed', 'error'):
+                    recorder.count('completed' if status['status'] == 'completed' else 'failed')
+                    break
+                if time.time() > give_up:
+                    recorder.count('timed_out')
+                    break
+            call(base_url, recorder, 'reset', f'/api/reset-session/{session_id}')
+            with lock:
+                sampler.done += 1
+
+    booths = [threading.Thread(target=booth, daemon=True) for _ in range(args.booths)]
+    for thread in booths:
+        thread.start()
+    for thread in booths:
+        thread.join()
+    return dict(recorder.sessions)
+
+
+def evaluate(samples, args):
+    """(baseline, final, failures) comparing the first post-warm-up sample with the last"""
+    warm = max(1, int(args.sessions * args.warmup))
+    baseline = next((s for s in samples if s['sessions'] >= warm), samples[-1])
+    final = samples[-1]
+    failures = []
+
+    def grew(key, limit, label, fmt=str):
+        if baseline[key] is None or final[key] is None:
+            return
+        growth = final[key] - baseline[key]
+        if growth > limit:
+            failures.append(f"{label} grew by {fmt(growth)} after warm-up (limit {fmt(limit)})")
+
+    grew('rss_bytes', args.max_rss_growth_mb * 1e6, 'RSS', format_mb)
+    grew('open_fds', args.max_fd_growth, 'open file descriptors')
+    grew('disk_bytes', args.max_disk_growth_mb * 1e6, 'disk use', format_mb)
+    if final['children'] is not None and final['children'] > args.max_children:
+        failures.append(f"{final['children']} child processes still running after the sessions drained")
+    return baseline, final, failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mode', choices=('kiosk', 'web'), default='kiosk')
+    parser.add_argument('--sessions', type=int, default=20000)
+    parser.add_argument('--booths', type=int, default=8, help='concurrent booths (web mode)')
+    parser.add_argument('--time-scale', type=float, default=0.0, help='scale stub speech and listening delays')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--poll-interval', type=float, default=0.05)
+    parser.add_argument('--session-timeout', type=float, default=60.0)
+    parser.add_argument('--sample-interval', type=float, default=2.0)
+    parser.add_argument('--warmup', type=float, default=0.1, help='fraction of sessions before the baseline sample')
+    parser.add_argument('--drain', type=float, default=3.0, help='seconds to let workers exit before the last sample')
+    parser.add_argument('--max-rss-growth-mb', type=float, default=32.0)
+    parser.add_argument('--max-fd-growth', type=int, default=8)
+    parser.add_argument('--max-disk-growth-mb', type=float, default=8.0)
+    parser.add_argument('--max-children', type=int, default=0)
+    parser.add_argument('--output', help='write the samples and verdict as JSON')
+    args = parser.parse_args(argv)
+    output = os.path.abspath(args.output) if args.output else None
+
+    # Sessions the booths don't reset are purged like in production, only sooner
+    os.environ.setdefault('SESSION_RETENTION', '5')
+    sys.path.insert(0, str(HERE))
+    if args.mode == 'web':
+        # Scratch votes.db, sessions.db, metrics.db and worker logs, all in workdir
+        from load_test import start_local_server
+        server, args.base_url, workdir = start_local_server(args.time_scale)
+    else:
+        workdir = tempfile.mkdtemp(prefix='voting_soak_')
+        os.environ['VOTES_DB'] = os.path.join(workdir, 'votes.db')
+        os.environ['STUB_TIME_SCALE'] = str(args.time_scale)
+        os.chdir(workdir)
+    # Votes and their ledger are meant to grow with every session
+    sampler = Sampler(workdir, ('votes.',), args.sample_interval)
+
+    print(f"Soak test: {args.sessions} {args.mode} sessions in {workdir}")
+    sampler.start()
+    started = time.time()
+    sessions = (run_web if args.mode == 'web' else run_kiosk)(args, sampler)
+    elapsed = time.time() - started
+    time.sleep(args.drain)
+    sampler.stop()
+    if args.mode == 'web':
+        server.shutdown()
+
+    baseline, final, failures = evaluate(sampler.samples, args)
+    print(f"{sampler.done} sessions in {elapsed:.1f}s ({sampler.done / elapsed:.1f}/s): {sessions}")
+    print(f"{'':<20}{'after warm-up':>16}{'final':>16}")
+    for key, label, fmt in (('rss_bytes', 'RSS', format_mb), ('open_fds', 'open fds', str),
+                            ('children', 'child processes', str), ('disk_bytes', 'disk', format_mb)):
+        print(f"{label:<20}{fmt(baseline[key]):>16}{fmt(final[key]):>16}")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if not failures:
+        print("PASS: no resource growth beyond the thresholds")
+
+    if output:
+        with open(output, 'w') as f:
+            json.dump({'config': {k: v for k, v in vars(args).items() if k != 'output'},
+                       'elapsed_s': round(elapsed, 3), 'sessions': sessions,
+                       'baseline': baseline, 'final': final, 'failures': failures,
+                       'samples': sampler.samples}, f, indent=2)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Startup Time Check
+Cold-imports each entry point in a fresh interpreter with -X importtime, summarizes
+where the time goes and fails if any entry point exceeds its budget
+
+Usage: python startup_check.py [--budget-ms 1500] [--top 10] [--runs 3] [--json]
+"""
+import argparse
+import json
+import re
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+
+# Entry point module -> cold import budget in milliseconds
+BUDGETS_MS = {
+    'web_voting_app': 1500,
+    'voice_subprocess': 500,
+}
+
+# Modules that should only load when a session actually speaks or listens
+LAZY_MODULES = ('pyttsx3', 'speech_recognition', 'vosk', 'pyaudio')
+
+_IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+)\s*\|\s*(\d+)\s*\|(\s*)(\S+)')
+
+
+def parse_importtime(stderr):
+    """Return [(module, self_us, cumulative_us, depth)] from -X importtime output"""
+    rows = []
+    for line in stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            rows.append((module, int(self_us), int(cumulative_us), (len(indent) - 1) // 2))
+    return rows
+
+
+def measure_entry_point(module):
+    """Import `module` in a fresh interpreter; return (wall_ms, importtime rows, error)"""
+    code = f"import {module}"
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                            cwd=HERE, capture_output=True, text=True)
+    wall_ms = (time.perf_counter() - start) * 1000
+    error = None
+    if result.returncode != 0:
+        lines = [l for l in result.stderr.splitlines() if not l.startswith('import time:')]
+        error = lines[-1] if lines else f"exit code {result.returncode}"
+    return wall_ms, parse_importtime(result.stderr), error
+
+
+def summarize(module, runs, top):
+    samples = [measure_entry_point(module) for _ in range(runs)]
+    # Use the fastest run: the others mostly measure disk cache noise
+    wall_ms, rows, error = min(samples, key=lambda s: s[0])
+    top_level = sorted((r for r in rows if r[3] == 0), key=lambda r: -r[2])
+    heaviest_self = sorted(rows, key=lambda r: -r[1])
+    import_ms = sum(r[2] for r in top_level) / 1000
+    loaded = {r[0].split('.')[0] for r in rows}
+    return {
+        'module': module,
+        'wall_ms': round(wall_ms, 1),
+        'import_ms': round(import_ms, 1),
+        'budget_ms': BUDGETS_MS.get(module),
+        'error': error,
+        'top_level': [(name, round(cum / 1000, 2)) for name, _, cum, _ in top_level[:top]],
+        'heaviest_self': [(name, round(own / 1000, 2)) for name, own, _, _ in heaviest_self[:top]],
+        'eager_lazy_modules': sorted(m for m in LAZY_MODULES if m in loaded),
+    }
+
+
+def print_report(report):
+    status = 'FAIL' if report['failed'] else 'ok'
+    print(f"\n{report['module']}: import {report['import_ms']:.1f}ms, interpreter+import {report['wall_ms']:.1f}ms "
+          f"(budget {report['budget_ms']}ms) -> {status}")
+    if report['error']:
+        print(f"  import failed: {report['error']}")
+    print("  slowest top-level imports (cumulative ms):")
+    for name, ms in report['top_level']:
+        print(f"    {ms:9.2f}  {name}")
+    print("  slowest modules by own time (ms):")
+    for name, ms in report['heaviest_self']:
+        print(f"    {ms:9.2f}  {name}")
+    if report['eager_lazy_modules']:
+        print(f"  loaded at import but should be lazy: {', '.join(report['eager_lazy_modules'])}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('modules', nargs='*', default=list(BUDGETS_MS))
+    parser.add_argument('--budget-ms', type=float, help='override every budget')
+    parser.add_argument('--top', type=int, default=10)
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--json', action='store_true', help='print a JSON report instead of text')
+    args = parser.parse_args()
+
+    reports = []
+    for module in args.modules:
+        if args.budget_ms is not None:
+            BUDGETS_MS[module] = args.budget_ms
+        report = summarize(module, args.runs, args.top)
+        budget = report['budget_ms']
+        report['failed'] = bool(report['error'] or report['eager_lazy_modules']
+                                or (budget is not None and report['import_ms'] > budget))
+        reports.append(report)
+
+    if args.json:
+        print(json.dumps(reports, indent=2))
+    else:
+        print("Startup time check")
+        print("=" * 60)
+        for report in reports:
+            print_report(report)
+
+    return 1 if any(r['failed'] for r in reports) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Stub Voice Worker
+Stands in for voice_subprocess.py in load tests: replays scripted transcripts
+with realistic prompt and listening delays instead of using TTS and microphones
+
+Environment:
+    STUB_TIME_SCALE  multiply every delay (e.g. 0.1 for a 10x faster run)
+    STUB_SEED        seed for script choice and timing jitter
+"""
+import os
+import random
+import sys
+import time
+from console_utils import safe_print
+from db import get_candidates, record_vote
+from intent_matcher import get_intent_matcher
+from metrics import timed, flush_to_store
+from session_status import send_status, send_final_result, send_receipt_code
+from voter_index import get_voter_index
+
+# Scripted voter transcripts: (voter ID, candidate choice, confirmation, weight)
+SCRIPTS = [
+    ("first one", "number two", "confirm", 50),
+    ("first van", "alice", "yes", 15),
+    ("test one", "the third one", "confirm", 15),
+    ("first one", "bob", "cancel", 8),
+    ("hello world", None, None, 7),
+    ("first one", "mumble", None, 5),
+]
+
+# Seconds per spoken prompt and per listening window, measured on booth hardware
+PROMPT_SECONDS = 1.8
+LISTEN_SECONDS = (2.0, 6.0)
+
+TIME_SCALE = float(os.environ.get('STUB_TIME_SCALE', '1.0'))
+
+def pause(seconds, rng):
+    """Sleep for a jittered, scaled delay"""
+    time.sleep(max(0.0, seconds * rng.uniform(0.8, 1.2) * TIME_SCALE))
+
+def speak(count, rng):
+    pause(PROMPT_SECONDS * count, rng)
+
+def listen(transcript, rng):
+    pause(rng.uniform(*LISTEN_SECONDS), rng)
+    return transcript
+
+@timed('session_total')
+def stub_voting_process(session_id, rng):
+    """Mirror the status sequence of voice_subprocess.voice_voting_process"""
+    voter, choice, confirmation, _ = rng.choices(SCRIPTS, weights=[s[3] for s in SCRIPTS])[0]
+
+    send_status(session_id, 1, 'listening', '🎤 LISTENING: Say your voter ID (TEST1, TEST2, etc.)')
+    speak(4, rng)
+    voter_id = get_voter_index().match(listen(voter, rng))
+    speak(1, rng)
+    if not voter_id:
+        speak(3, rng)
+        send_final_result(session_id, False, f"Invalid Voter ID: I heard '{voter}'. Please provide a valid voter ID.")
+        return
+    send_status(session_id, 1, 'success', f'Voter ID confirmed: {voter_id}')
+    speak(1, rng)
+
+    send_status(session_id, 2, 'listening', '🎤 LISTENING: Say your candidate choice (1, 2, or 3)')
+    candidates = get_candidates()
+    matcher = get_intent_matcher(candidates)
+    speak(5 + len(candidates), rng)
+    candidate_id, _ = matcher.match_candidate(listen(choice or '', rng))
+    speak(1, rng)
+    if candidate_id is None:
+        speak(3, rng)
+        send_final_result(session_id, False, f"Invalid candidate choice: I heard '{choice}'. Please say just the number: 1, 2, or 3.")
+        return
+    candidate_name = matcher.candidates[candidate_id]
+    send_status(session_id, 2, 'success', f'Candidate selected: {candidate_name}')
+    speak(1, rng)
+
+    send_status(session_id, 3, 'listening', '🎤 LISTENING: Say "confirm" to cast your vote or "cancel" to abort')
+    speak(5, rng)
+    intent, _ = matcher.match_confirmation(listen(confirmation or '', rng))
+    speak(1, rng)
+    if intent == 'confirm':
+        receipt, receipt_code = record_vote(voter_id, candidate_id)
+        speak(3, rng)
+        send_receipt_code(session_id, receipt_code)
+        send_final_result(session_id, True, f"Vote successfully recorded for {candidate_name}! "
+                          f"Receipt number {receipt}.",
+                          voter_id, candidate_name, receipt)
+    else:
+        speak(3, rng)
+        send_final_result(session_id, False, f"Vote cancelled: I heard '{confirmation}' but need 'confirm' to vote.")
+
+def main():
+    if len(sys.argv) != 2:
+        safe_print("Usage: python stub_voice_worker.py <session_id>")
+        return
+    session_id = sys.argv[1]
+    rng = random.Random(f"{os.environ.get('STUB_SEED', '')}{session_id}")
+    try:
+        stub_voting_process(session_id, rng)
+    except Exception as e:
+        safe_print(f"Stub worker exception: {e}")
+        send_final_result(session_id, False, f"Voice voting failed: {str(e)}")
+    finally:
+        flush_to_store()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""Test the callback-driven capture ring buffer against a file-backed fake device"""
+import os
+import tempfile
+import time
+import wave
+
+from audio_capture import AudioCapture, FileAudioDevice, RingBuffer
+from recognizers import Backend, Hypothesis
+from voice_utils import AudioSession
+
+def _write_wav(path, seconds=1.0, rate=16000):
+    """Write a ramp of 16-bit samples so any reordering or loss is detectable"""
+    frames = int(seconds * rate)
+    pcm = b''.join((n % 32768).to_bytes(2, 'little') for n in range(frames))
+    with wave.open(path, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(pcm)
+    return pcm
+
+def test_ring_buffer_wraps_without_copying():
+    """Test that reads across the end of the ring come back in order as views"""
+    ring = RingBuffer(10)
+    assert ring.write(b'abcdef')
+    view = ring.peek(4)
+    assert isinstance(view, memoryview) and bytes(view) == b'abcd'
+    ring.consume(4)
+    assert ring.write(b'ghijkl')  # wraps around the end
+    out = b''
+    while ring.available():
+        view = ring.peek(100)
+        out += bytes(view)
+        ring.consume(len(view))
+    assert out == b'efghijkl'
+    assert not ring.write(b'x' * 12)
+    assert ring.overruns == 1 and ring.dropped_bytes == 12
+
+def test_capture_delivers_file_audio_intact():
+    """Test that every sample of the fake device reaches the consumer exactly once"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'speech.wav')
+        pcm = _write_wav(path)
+        device = FileAudioDevice(path)
+        received = bytearray()
+        with AudioCapture(device, rate=16000, frames_per_buffer=1000) as capture:
+            for view in capture.chunks(5, max_bytes=3000):
+                received += view
+        assert bytes(received) == pcm
+        stats = capture.stats()
+        assert stats['captured_bytes'] == len(pcm)
+        assert stats['ring_overruns'] == 0 and stats['dropped_bytes'] == 0
+
+def test_slow_consumer_counts_overruns():
+    """Test that a stalled consumer drops whole blocks and counts them"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'speech.wav')
+        pcm = _write_wav(path)
+        capture = AudioCapture(FileAudioDevice(path), rate=16000, frames_per_buffer=1000,
+                               buffer_seconds=0.25).start()
+        while capture.is_active():
+            time.sleep(0.01)  # the consumer never reads while the file plays
+        received = b''.join(bytes(view) for view in capture.chunks(1))
+        capture.stop()
+        stats = capture.stats()
+        assert stats['ring_overruns'] == 12
+        assert stats['dropped_bytes'] == len(pcm) - len(received)
+        assert received == pcm[:len(received)]
+
+class RecordingBackend(Backend):
+    """Streaming stand-in that keeps each utterance it was given"""
+    name = 'recording'
+
+    def __init__(self):
+        self.utterances = []
+
+    def begin(self, rate):
+        self.utterances.append(bytearray())
+
+    def feed(self, view):
+        self.utterances[-1] += view
+
+    def finish(self):
+        return Hypothesis(f"step {len(self.utterances)}", 1.0, self.name)
+
+def test_audio_session_opens_device_once():
+    """Test three listening steps on one stream, discarding audio between them"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'speech.wav')
+        pcm = _write_wav(path, seconds=2.0)
+        device = FileAudioDevice(path, time_scale=1.0)
+        backend = RecordingBackend()
+        with AudioSession(pa=device, backends=[backend]) as audio:
+            transcripts = []
+            for _ in range(3):
+                time.sleep(0.3)  # a prompt plays: capture is paused
+                transcripts.append(audio.listen(seconds=0.3))
+            stats = audio.capture.stats()
+        assert device.opened == 1
+        assert transcripts == ['step 1', 'step 2', 'step 3']
+        # Each step only sees audio captured while it was listening, in order
+        heard = [bytes(u) for u in backend.utterances]
+        assert all(0 < len(u) <= len(pcm) // 4 for u in heard)
+        offsets = [pcm.find(u) for u in heard]
+        assert -1 not in offsets and offsets == sorted(offsets)
+        # Blocks delivered during prompts were dropped, not buffered
+        assert stats['captured_bytes'] < stats['callbacks'] * 8000
+
+if __name__ == "__main__":
+    test_ring_buffer_wraps_without_copying()
+    test_capture_delivers_file_audio_intact()
+    test_slow_consumer_counts_overruns()
+    test_audio_session_opens_device_once()
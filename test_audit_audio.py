@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""Test the background audit-audio recorder: per-step reads and disk limits"""
+import os
+import tempfile
+import time
+
+from audit_audio import AuditRecorder, list_failures, list_sessions, read_step
+
+def _speech(seconds, seed):
+    """Deterministic PCM that differs per step"""
+    return bytes((n * seed) % 251 for n in range(int(seconds * 32000)))
+
+def test_steps_read_back_exactly():
+    """Test that each step's audio is recovered by seeking to its own chunks"""
+    with tempfile.TemporaryDirectory() as tmp:
+        recorder = AuditRecorder(tmp)
+        steps = {1: _speech(2.5, 3), 2: _speech(0.3, 5), 3: _speech(1.2, 7)}
+        for step, pcm in steps.items():
+            for offset in range(0, len(pcm), 8000):
+                recorder.record('booth1', step, memoryview(pcm)[offset:offset + 8000])
+            recorder.end_step('booth1', step)
+        assert recorder.flush()
+
+        for step, pcm in steps.items():
+            assert read_step(tmp, 'booth1', step) == (pcm, 16000)
+        assert read_step(tmp, 'booth1', 4) == (b'', None)
+        listing = list_sessions(tmp, 'booth1')
+        assert [(row[1], row[2]) for row in listing] == [(1, 3), (2, 1), (3, 2)]
+        assert abs(listing[0][3] - 2.5) < 1e-9
+        assert recorder.dropped == 0
+
+def test_size_and_retention_limits():
+    """Test that the oldest sessions are removed first and per-session size is capped"""
+    with tempfile.TemporaryDirectory() as tmp:
+        recorder = AuditRecorder(tmp, max_session_bytes=1)
+        for n in range(3):
+            recorder.record(f"s{n}", 1, _speech(2, n + 2))
+            recorder.end_step(f"s{n}", 1)
+            assert recorder.flush()
+            time.sleep(0.01)
+        # The first chunk fits, everything after it is over the 1-byte cap
+        assert recorder.truncated == 3
+        sizes = {row[0]: row[4] for row in list_sessions(tmp)}
+        assert set(sizes) == {'s0', 's1', 's2'}
+
+        recorder.max_total_bytes = sizes['s2'] + sizes['s1']
+        assert recorder.enforce_limits() == 1
+        assert {row[0] for row in list_sessions(tmp)} == {'s1', 's2'}
+        assert not os.path.exists(os.path.join(tmp, 's0.audio'))
+
+        recorder.retention_seconds = 0
+        assert recorder.enforce_limits() == 2
+        assert list_sessions(tmp) == []
+
+def test_write_failures_are_counted():
+    """Test that writes the recorder gives up on are counted and listed, not silently lost"""
+    with tempfile.TemporaryDirectory() as tmp:
+        recorder = AuditRecorder(tmp)
+        # A directory where the session's audio file should be makes every write fail
+        os.mkdir(os.path.join(tmp, 'broken.audio'))
+        recorder.record('broken', 1, _speech(2.5, 3))
+        recorder.end_step('broken', 1)
+        recorder.record('ok', 1, _speech(0.5, 5))
+        recorder.end_step('ok', 1)
+        assert recorder.flush()
+
+        assert recorder.failed == 1
+        failures = list_failures(tmp)
+        assert [(row[0], row[1], row[2]) for row in failures] == [('broken', 1, 1)]
+        assert 'IsADirectoryError' in failures[0][3] or 'PermissionError' in failures[0][3]
+        assert read_step(tmp, 'ok', 1) == (_speech(0.5, 5), 16000)
+
+if __name__ == "__main__":
+    test_steps_read_back_exactly()
+    test_size_and_retention_limits()
+    test_write_failures_are_counted()
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""Test the background logging pipeline and emoji fallback"""
+import io
+
+from console_utils import DEBUG, INFO, LogPipeline, to_console_safe
+
+def test_emoji_fallback():
+    """Test the precomputed translation table, including emoji variation selectors"""
+    assert to_console_safe("⚠️ Low level 🎤") == "[WARN] Low level [MIC]"
+    assert to_console_safe("🗣️ Partial result: 'first one'") == "[VOICE] Partial result: 'first one'"
+    assert to_console_safe("café") == "caf?"
+
+def test_levels_context_and_ascii_console():
+    """Test level filtering, session tags and writing to a console that cannot encode emojis"""
+    raw = io.BytesIO()
+    console = io.TextIOWrapper(raw, encoding='ascii', errors='strict', write_through=True)
+    pipeline = LogPipeline(level=INFO, stream=console)
+    pipeline.set_context(session='42')
+    pipeline.log(DEBUG, "hidden detail")
+    pipeline.log(INFO, "✅ Vote recorded")
+    assert pipeline.flush()
+
+    output = raw.getvalue().decode('ascii')
+    print(output)
+    assert "hidden detail" not in output
+    assert "[session=42] [OK] Vote recorded" in output
+
+def test_rate_limit():
+    """Test that repetitive messages are throttled and the suppressed count reported"""
+    stream = io.StringIO()
+    pipeline = LogPipeline(stream=stream)
+    for i in range(50):
+        pipeline.log(INFO, f"partial {i}", rate_key='partial', per_second=5)
+    assert pipeline.flush()
+    lines = stream.getvalue().splitlines()
+    assert len(lines) == 5
+
+    pipeline._limits['partial'].tokens = 1
+    pipeline.log(INFO, "partial again", rate_key='partial', per_second=5)
+    assert pipeline.flush()
+    assert "partial again (+45 similar suppressed)" in stream.getvalue()
+
+if __name__ == "__main__":
+    test_emoji_fallback()
+    test_levels_context_and_ascii_console()
+    test_rate_limit()
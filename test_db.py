@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""Test database helpers against a scratch database"""
+import os
+import sqlite3
+import stat
+import tempfile
+from pathlib import Path
+
+import db
+from merkle_ledger import MerkleLedger, ledger_path
+
+def with_scratch_db(test):
+    """Run test with db.DB_PATH pointing at a fresh, initialized database"""
+    def run():
+        original = db.DB_PATH
+        with tempfile.TemporaryDirectory() as tmp:
+            db.DB_PATH = Path(tmp) / "votes.db"
+            try:
+                db.init_db()
+                test()
+            finally:
+                db.DB_PATH = original
+    run.__name__ = test.__name__
+    run.__doc__ = test.__doc__
+    return run
+
+@with_scratch_db
+def test_votes_keyset_pagination():
+    """Test raw-vote pages join candidate names and resume after the last id"""
+    for n in range(25):
+        db.record_vote(f"VOTER{n}", n % 3 + 1)
+
+    first = db.get_votes_page(0, 10)
+    assert len(first) == 10
+    assert first[0][1:4] == ("VOTER0", 1, "Alice")
+
+    second = db.get_votes_page(first[-1][0], 10)
+    assert second[0][0] > first[-1][0]
+    assert [row[1] for row in second] == [f"VOTER{n}" for n in range(10, 20)]
+
+    assert len(db.get_votes_page(second[-1][0], 10)) == 5
+
+    newest = db.get_votes_page(limit=10, before_id=-1)
+    assert [row[1] for row in newest] == [f"VOTER{n}" for n in range(24, 14, -1)]
+    older = db.get_votes_page(limit=10, before_id=newest[-1][0])
+    assert [row[1] for row in older] == [f"VOTER{n}" for n in range(14, 4, -1)]
+
+@with_scratch_db
+def test_iter_votes_streams_in_batches():
+    """Test that the export iterator visits every vote once, in id order"""
+    for n in range(23):
+        db.record_vote(f"VOTER{n}", 2)
+
+    rows = list(db.iter_votes(batch_size=5))
+    assert [row[1] for row in rows] == [f"VOTER{n}" for n in range(23)]
+    assert all(row[3] == "Bob" for row in rows)
+    assert list(db.iter_votes(after_id=rows[-1][0])) == []
+
+def _insert_votes(rows):
+    conn = sqlite3.connect(db.election_path())
+    conn.executemany("INSERT INTO votes (voter_token, candidate_id, ts) VALUES (?,?,?)", rows)
+    conn.commit()
+    conn.close()
+
+@with_scratch_db
+def test_turnout_rollups_follow_inserts():
+    """Test that each vote lands in its minute and hour bucket as it is inserted"""
+    _insert_votes([
+        ("V1", 1, "2025-03-01 09:00:05"),
+        ("V2", 1, "2025-03-01 09:00:59"),
+        ("V3", 2, "2025-03-01 09:01:10"),
+        ("V4", 1, "2025-03-01 10:15:00"),
+    ])
+
+    assert db.get_turnout('minute') == [
+        ("2025-03-01 09:00", 1, 2),
+        ("2025-03-01 09:01", 2, 1),
+        ("2025-03-01 10:15", 1, 1),
+    ]
+    assert db.get_turnout('hour', candidate_id=1) == [("2025-03-01 09:00", 1, 2), ("2025-03-01 10:00", 1, 1)]
+    assert db.get_turnout('minute', start="2025-03-01T09:01:00Z", end="2025-03-01T10:15") == [("2025-03-01 09:01", 2, 1)]
+
+@with_scratch_db
+def test_turnout_rollups_follow_updates_and_deletes():
+    """Test that a corrected or removed vote leaves the rollups equal to a rebuild"""
+    _insert_votes([(f"V{n}", n % 3 + 1, f"2025-03-01 0{n % 4}:{n % 60:02d}:00") for n in range(20)])
+    conn = sqlite3.connect(db.election_path())
+    conn.execute("UPDATE votes SET candidate_id = 3 WHERE voter_token = 'V0'")
+    conn.execute("UPDATE votes SET ts = '2025-03-01 07:30:00' WHERE voter_token = 'V1'")
+    conn.execute("UPDATE votes SET voter_token = 'V2b' WHERE voter_token = 'V2'")
+    conn.execute("DELETE FROM votes WHERE voter_token IN ('V3', 'V4')")
+    conn.commit()
+    conn.close()
+    assert db.get_turnout('hour', candidate_id=1)[0] == ("2025-03-01 00:00", 1, 1)
+    live = db.get_turnout('minute'), db.get_turnout('hour')
+    assert not any(n <= 0 for rows in live for _, _, n in rows)
+
+    assert db.backfill_turnout() == 18
+    assert (db.get_turnout('minute'), db.get_turnout('hour')) == live
+
+@with_scratch_db
+def test_backfill_turnout_matches_trigger():
+    """Test that rebuilding the rollups from votes reproduces the live counts"""
+    _insert_votes([(f"V{n}", n % 3 + 1, f"2025-03-01 0{n % 4}:{n % 60:02d}:00") for n in range(50)])
+    live = db.get_turnout('minute'), db.get_turnout('hour')
+
+    conn = sqlite3.connect(db.election_path())
+    conn.execute("DELETE FROM turnout_minute")
+    conn.execute("DELETE FROM turnout_hour")
+    conn.commit()
+    conn.close()
+
+    assert db.backfill_turnout() == 50
+    assert (db.get_turnout('minute'), db.get_turnout('hour')) == live
+
+@with_scratch_db
+def test_elections_are_partitioned_and_archived():
+    """Test that queries see only the active election and an archived one is compacted and read-only"""
+    for n in range(30):
+        db.record_vote(f"OLD{n}", n % 3 + 1)
+    db.create_election("2027-general", "General 2027")
+    assert db.active_election() == "2027-general"
+    assert db.get_candidates() == db.get_candidates("default")
+    db.create_election("2027-local", candidates=[(1, "Ann"), (2, "Ben")], activate=False)
+    db.activate_election("2027-local")
+    db.init_db()
+    assert db.get_candidates() == [(1, "Ann"), (2, "Ben")]
+    db.activate_election("2027-general")
+    db.record_vote("NEW1", 2)
+    assert db.get_votes() == [(2, 1)]
+    assert db.get_votes("default") == [(1, 10), (2, 10), (3, 10)]
+
+    # A vote that looked up the election just before it was closed is refused, not counted
+    locked_ledger = db._locked_ledger
+
+    def close_while_attached(election):
+        ledger = locked_ledger(election)
+        conn = sqlite3.connect(db.DB_PATH)
+        conn.execute("UPDATE elections SET is_active = 0 WHERE id = ?", (election,))
+        conn.commit()
+        conn.close()
+        return ledger
+
+    db._locked_ledger = close_while_attached
+    try:
+        db.record_vote("RACE1", 1)
+        assert False, "vote recorded in a closed election"
+    except ValueError:
+        pass
+    finally:
+        db._locked_ledger = locked_ledger
+    assert db.get_votes("2027-general") == [(2, 1)]
+    db.activate_election("2027-general")
+
+    summary = db.archive_election("default")
+    assert summary['votes'] == 30 and summary['bytes_after'] <= summary['bytes_before']
+    path = db.election_path("default")
+    assert not os.stat(path).st_mode & stat.S_IWUSR
+    assert not os.stat(ledger_path(path)).st_mode & stat.S_IWUSR
+    assert db.get_votes("default") == [(1, 10), (2, 10), (3, 10)]
+    conn = db._connect("default")
+    try:
+        conn.execute("INSERT INTO votes (voter_token, candidate_id) VALUES ('LATE', 1)")
+        assert False, "archived election accepted a vote"
+    except sqlite3.OperationalError:
+        pass
+    finally:
+        conn.close()
+    try:
+        db.activate_election("default")
+        assert False, "archived election reactivated"
+    except ValueError:
+        pass
+    rows = {row[0]: row for row in db.list_elections()}
+    assert rows["default"][2:4] == ("archived", 0) and rows["default"][7] == summary['ledger_root']
+    assert rows["2027-general"][2:4] == ("open", 1)
+
+def test_single_file_database_is_migrated():
+    """Test that init_db moves a pre-election votes.db into election 'default', receipts intact"""
+    original = db.DB_PATH
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = Path(tmp) / "votes.db"
+        try:
+            conn = sqlite3.connect(db.DB_PATH)
+            conn.execute("CREATE TABLE voters (id TEXT PRIMARY KEY, name TEXT)")
+            for stmt in db.SCHEMA:
+                conn.execute(stmt)
+            conn.execute("INSERT INTO candidates (id, name) VALUES (1, 'Alice'), (2, 'Bob')")
+            conn.executemany("INSERT INTO votes (voter_token, candidate_id, ts) VALUES (?,?,?)",
+                             [(f"V{n}", n % 2 + 1, "2025-03-01 09:00:00") for n in range(9)])
+            conn.commit()
+            conn.close()
+            ledger = MerkleLedger(ledger_path(db.DB_PATH))
+            ledger.sync(db.DB_PATH)
+            root = ledger.root()
+            ledger.close()
+
+            db.init_db()
+            assert db.active_election() == "default"
+            assert db.get_votes() == [(1, 5), (2, 4)]
+            assert db.get_turnout('hour') == [("2025-03-01 09:00", 1, 5), ("2025-03-01 09:00", 2, 4)]
+            conn = sqlite3.connect(db.DB_PATH)
+            tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            conn.close()
+            assert 'votes' not in tables and 'voters' in tables
+            ledger = MerkleLedger(ledger_path(db.election_path()))
+            assert ledger.root() == root
+            ledger.close()
+        finally:
+            db.DB_PATH = original
+
+if __name__ == "__main__":
+    test_votes_keyset_pagination()
+    test_iter_votes_streams_in_batches()
+    test_turnout_rollups_follow_inserts()
+    test_turnout_rollups_follow_updates_and_deletes()
+    test_backfill_turnout_matches_trigger()
+    test_elections_are_partitioned_and_archived()
+    test_single_file_database_is_migrated()
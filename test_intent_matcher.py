@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""Test spoken candidate choice and confirmation matching"""
+from intent_matcher import IntentMatcher, get_intent_matcher
+
+CANDIDATES = [(1, 'Alice'), (2, 'Bob'), (3, 'Charlie')]
+
+def test_candidate_choices():
+    """Test numbers, number words, ordinals and names"""
+    matcher = IntentMatcher(CANDIDATES)
+    test_phrases = [
+        ("2", 2),
+        ("two", 2),
+        ("number three", 3),
+        ("the first one", 1),
+        ("second", 2),
+        ("charlie", 3),
+        ("i want to vote for bob", 2),
+        ("candidate too", 2),
+        ("hello world", None),
+        ("number seven", None),
+    ]
+    for phrase, expected in test_phrases:
+        candidate_id, confidence = matcher.match_candidate(phrase)
+        print(f"'{phrase}' -> {candidate_id} (confidence {confidence})")
+        assert candidate_id == expected, phrase
+
+    # A bare homophone is accepted but with less confidence than the word itself
+    assert matcher.match_candidate("to")[1] < matcher.match_candidate("two")[1]
+
+def test_confirmation():
+    """Test confirm/cancel synonyms and ambiguous answers"""
+    matcher = IntentMatcher(CANDIDATES)
+    assert matcher.match_confirmation("confirm")[0] == 'confirm'
+    assert matcher.match_confirmation("yes that's right")[0] == 'confirm'
+    assert matcher.match_confirmation("cancel")[0] == 'cancel'
+    assert matcher.match_confirmation("do not confirm")[0] == 'cancel'
+    assert matcher.match_confirmation("yes no")[0] is None
+    assert matcher.match_confirmation("pardon")[0] is None
+
+def test_matcher_compiled_once():
+    """Test that the same candidate list reuses the compiled matcher"""
+    assert get_intent_matcher(CANDIDATES) is get_intent_matcher(list(CANDIDATES))
+    assert get_intent_matcher(CANDIDATES) is not get_intent_matcher(CANDIDATES[:2])
+
+if __name__ == "__main__":
+    test_candidate_choices()
+    test_confirmation()
+    test_matcher_compiled_once()
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""Test the headless kiosk loop with stub voters, and its local status datagrams"""
+import json
+import os
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+
+def test_kiosk_serves_voters_in_one_process():
+    """Test several voters in one process, each reporting status to the local socket"""
+    with tempfile.TemporaryDirectory() as tmp:
+        listener = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        listener.bind(('127.0.0.1', 0))
+        listener.settimeout(5)
+        env = {**os.environ, 'VOTES_DB': os.path.join(tmp, 'votes.db'), 'METRICS_DB': os.path.join(tmp, 'metrics.db')}
+        report_path = os.path.join(tmp, 'report.json')
+        subprocess.run([sys.executable, str(HERE / 'kiosk.py'), '--stub', '--sessions', '4', '--wait', 'none',
+                        '--pause', '0', '--time-scale', '0.005', '--seed', '3', '--report', report_path,
+                        '--status-port', str(listener.getsockname()[1])],
+                       cwd=tmp, env=env, check=True, capture_output=True, timeout=60)
+
+        with open(report_path) as f:
+            report = json.load(f)
+        assert len(report['sessions']) == 4
+        assert report['first_prompt_at'] >= report['process_start']
+        votes = sqlite3.connect(os.path.join(tmp, 'votes.default.db')).execute("SELECT COUNT(*) FROM votes").fetchone()[0]
+        assert votes == sum(s['success'] for s in report['sessions'])
+
+        updates = []
+        listener.setblocking(False)
+        while True:
+            try:
+                updates.append(json.loads(listener.recv(65536)))
+            except BlockingIOError:
+                break
+        listener.close()
+        sessions = {u['session_id'] for u in updates}
+        assert len(sessions) == 4
+        finals = [u for u in updates if u['status'] in ('completed', 'error') and u['exit_code'] is None]
+        assert len(finals) == 4
+
+if __name__ == "__main__":
+    test_kiosk_serves_voters_in_one_process()
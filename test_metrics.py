@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""Test stage latency histograms and Prometheus export"""
+import os
+import tempfile
+import threading
+
+import metrics
+
+BUCKET_0_5 = metrics.BUCKETS.index(0.5)
+
+def test_histogram_rendering():
+    """Test cumulative buckets, sum and count in the text format"""
+    metrics.reset()
+    metrics.observe('db_record_vote', 0.003)
+    metrics.observe('db_record_vote', 0.2)
+    metrics.observe('db_record_vote', 120.0)
+
+    text = metrics.render_prometheus()
+    print(text)
+    assert '# TYPE voting_stage_seconds histogram' in text
+    assert 'voting_stage_seconds_bucket{stage="db_record_vote",le="0.001"} 0' in text
+    assert 'voting_stage_seconds_bucket{stage="db_record_vote",le="0.005"} 1' in text
+    assert 'voting_stage_seconds_bucket{stage="db_record_vote",le="0.25"} 2' in text
+    assert 'voting_stage_seconds_bucket{stage="db_record_vote",le="60.0"} 2' in text
+    assert 'voting_stage_seconds_bucket{stage="db_record_vote",le="+Inf"} 3' in text
+    assert 'voting_stage_seconds_count{stage="db_record_vote"} 3' in text
+    metrics.reset()
+
+def test_timed_and_store_round_trip():
+    """Test that timings flushed by several processes add up in the shared store"""
+    metrics.reset()
+
+    @metrics.timed('tts_prompt')
+    def speak():
+        return 'spoken'
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = os.path.join(tmp, 'metrics.db')
+        assert speak() == 'spoken'
+        with metrics.timed('asr_model_load'):
+            pass
+        assert metrics.flush_to_store(store) == 2
+        assert metrics.snapshot() == {}
+
+        # A second worker flushing the same stage adds to it rather than replacing it
+        metrics.observe('tts_prompt', 0.3)
+        metrics.flush_to_store(store)
+        assert metrics.flush_to_store(store) == 0
+
+        data = metrics.load_store(store)
+        assert data['tts_prompt']['count'] == 2
+        assert data['tts_prompt']['buckets'][BUCKET_0_5] == 1
+        assert data['asr_model_load']['count'] == 1
+        # Every scrape rebuilds the same totals
+        assert metrics.load_store(store) == data
+        assert 'voting_stage_seconds_count{stage="tts_prompt"} 2' in metrics.render_prometheus(data)
+    metrics.reset()
+
+def test_concurrent_flushes_count_once():
+    """Test that threads flushing at the same time never store an observation twice"""
+    metrics.reset()
+    with tempfile.TemporaryDirectory() as tmp:
+        store = os.path.join(tmp, 'metrics.db')
+        for _ in range(50):
+            metrics.observe('status_read', 0.001)
+        threads = [threading.Thread(target=metrics.flush_if_due, args=(0, store)) for _ in range(8)]
+        threads += [threading.Thread(target=metrics.flush_to_store, args=(store,)) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert metrics.load_store(store)['status_read']['count'] == 50
+        assert metrics.snapshot() == {}
+    metrics.reset()
+
+if __name__ == "__main__":
+    test_histogram_rendering()
+    test_timed_and_store_round_trip()
+    test_concurrent_flushes_count_once()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""Test the opt-in stack profiler and the merged flame-graph report"""
+import tempfile
+import time
+from collections import Counter
+from contextlib import nullcontext
+
+import profiling
+
+def busy_step(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+def test_disabled_profiling_adds_nothing():
+    """Test that without PROFILE_DIR the decorator is the identity and profiled() a no-op context"""
+    original = profiling.PROFILE_DIR
+    profiling.PROFILE_DIR = None
+    try:
+        assert profiling.profile_sessions(busy_step) is busy_step
+        assert isinstance(profiling.profiled("request"), nullcontext)
+    finally:
+        profiling.PROFILE_DIR = original
+
+def test_session_profiles_are_written_and_merged():
+    """Test that each session writes collapsed stacks naming its functions, and reports merge them"""
+    original = profiling.PROFILE_DIR
+    with tempfile.TemporaryDirectory() as tmp:
+        profiling.PROFILE_DIR = tmp
+        try:
+            session = profiling.profile_sessions(lambda session_id: busy_step(0.2))
+            session("booth-1")
+            session("booth-2")
+        finally:
+            profiling.PROFILE_DIR = original
+
+        paths = sorted(profiling.Path(tmp).glob('session_*.folded'))
+        assert [p.name for p in paths] == ['session_booth-1.folded', 'session_booth-2.folded']
+        stacks = profiling.load_folded(paths)
+        main = Counter({s: n for s, n in stacks.items() if s.startswith('MainThread;')})
+        busy = sum(n for s, n in main.items() if 'busy_step (test_profiling.py' in s)
+        # 0.4 s at 100 Hz, allowing for a loaded machine
+        assert busy >= 10 and busy >= 0.8 * sum(main.values())
+
+        frames = {frame: (own, total) for frame, own, total in profiling.top_frames(main, 50)}
+        own, total = next(v for f, v in frames.items() if f.startswith('busy_step'))
+        assert total == busy and own <= total
+        svg = profiling.render_svg(main)
+        assert svg.startswith('<svg') and 'busy_step (test_profiling.py' in svg
+
+if __name__ == "__main__":
+    test_disabled_profiling_adds_nothing()
+    test_session_profiles_are_written_and_merged()
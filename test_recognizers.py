@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""Test recognizer fan-out and selection policies with local stand-in backends"""
+import json
+import threading
+import time
+
+from recognizers import Backend, FanOut, Hypothesis, ScriptedBackend, VoskBackend
+
+CHUNKS = [bytes([n]) * 800 for n in range(10)]
+
+class CountingBackend(Backend):
+    """Streaming stand-in that checks it saw the whole utterance"""
+    name = 'counting'
+
+    def begin(self, rate):
+        self.received = bytearray()
+
+    def feed(self, view):
+        self.received += view
+
+    def finish(self):
+        return Hypothesis('first one', 0.4, self.name)
+
+def test_every_backend_sees_the_same_capture():
+    """Test that audio captured once reaches streaming and batch backends alike"""
+    streaming = CountingBackend()
+    fanout = FanOut([streaming, ScriptedBackend('first one', 0.9, name='network')], 'best_score')
+    hyp = fanout.recognize(CHUNKS, rate=16000, seconds=1)
+    assert bytes(streaming.received) == b''.join(CHUNKS)
+    assert hyp == Hypothesis('first one', 0.9, 'network')
+
+def test_first_confident_does_not_wait_for_slow_backend():
+    """Test that a confident local result wins without waiting for the network"""
+    fanout = FanOut([ScriptedBackend('two', 0.8, name='local'),
+                     ScriptedBackend('too', 0.95, delay=2.0, name='network')], 'first_confident')
+    start = time.perf_counter()
+    hyp = fanout.recognize(CHUNKS, rate=16000, seconds=1)
+    assert hyp.backend == 'local'
+    assert time.perf_counter() - start < 1.0
+
+def test_agreement_and_fallbacks():
+    """Test agreement across backends, best-score fallback and empty results"""
+    agree = FanOut([ScriptedBackend('Confirm', 0.5, name='a'), ScriptedBackend('confirm', 0.7, name='b'),
+                    ScriptedBackend('conform', 0.9, delay=0.5, name='c')], 'agreement')
+    assert agree.recognize(CHUNKS, 16000, 1).backend == 'b'
+
+    disagree = FanOut([ScriptedBackend('bob', 0.5, name='a'), ScriptedBackend('rob', 0.6, name='b')], 'agreement')
+    assert disagree.recognize(CHUNKS, 16000, 1).text == 'rob'
+
+    silent = FanOut([ScriptedBackend(None, name='a'), ScriptedBackend('', name='b')])
+    assert silent.recognize(CHUNKS, 16000, 1) is None
+
+def test_result_timeout_uses_what_arrived():
+    """Test that a hung backend cannot stall the voting step past the result timeout"""
+    fanout = FanOut([ScriptedBackend('alice', 0.3, name='local'),
+                     ScriptedBackend('alice', 0.9, delay=5.0, name='network')], 'best_score', result_timeout=0.2)
+    start = time.perf_counter()
+    assert fanout.recognize(CHUNKS, 16000, 1).backend == 'local'
+    assert time.perf_counter() - start < 1.0
+
+class SlowRecognizer:
+    """KaldiRecognizer stand-in whose FinalResult() blocks on an event and echoes its audio"""
+    created = 0
+
+    def __init__(self, model, rate):
+        SlowRecognizer.created += 1
+        self.release = threading.Event()
+        self.release.set()
+        self.Reset()
+
+    def SetWords(self, words):
+        pass
+
+    def Reset(self):
+        self.heard = bytearray()
+
+    def AcceptWaveform(self, data):
+        self.heard += data
+        return False
+
+    def FinalResult(self):
+        self.release.wait(5)
+        return json.dumps({'text': f"chunk {self.heard[0]}" if self.heard else ''})
+
+def test_reused_vosk_backend_waits_for_abandoned_run():
+    """Test that a run FanOut gave up on can't have its recognizer reset or its words mixed in"""
+    SlowRecognizer.created = 0
+    backend = VoskBackend(None, SlowRecognizer, busy_timeout=1.0)
+    fanout = FanOut([backend, ScriptedBackend('fallback', 0.1, name='network')], 'best_score', result_timeout=0.1)
+
+    backend.rec = SlowRecognizer(None, 16000)
+    backend.rec.release.clear()
+    assert fanout.recognize(CHUNKS[:2], 16000, 1).backend == 'network'
+    # The first run is still in FinalResult() when the next step starts
+    threading.Timer(0.3, backend.rec.release.set).start()
+    hyp = FanOut([backend], 'best_score', result_timeout=2.0).recognize(CHUNKS[5:], 16000, 1)
+    assert hyp.text == 'chunk 5' and SlowRecognizer.created == 1
+
+    # A run that never finishes is abandoned and the next one gets its own recognizer
+    backend.rec.release.clear()
+    fanout.recognize(CHUNKS[:2], 16000, 1)
+    hyp = FanOut([backend], 'best_score', result_timeout=2.0).recognize(CHUNKS[7:], 16000, 1)
+    assert hyp.text == 'chunk 7' and SlowRecognizer.created == 2
+    backend.rec.release.set()
+
+if __name__ == "__main__":
+    test_every_backend_sees_the_same_capture()
+    test_first_confident_does_not_wait_for_slow_backend()
+    test_agreement_and_fallbacks()
+    test_result_timeout_uses_what_arrived()
+    test_reused_vosk_backend_waits_for_abandoned_run()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""Test the independent recount against a scratch database"""
+import sqlite3
+
+import db
+from recount import recount
+from test_db import with_scratch_db
+
+def _setup_election(votes):
+    conn = sqlite3.connect(db.DB_PATH)
+    conn.executemany("INSERT INTO voters (id, name) VALUES (?, ?)",
+                     [(f"V{n}", None) for n in range(100)])
+    conn.commit()
+    conn.close()
+    conn = sqlite3.connect(db.election_path())
+    conn.executemany("INSERT INTO votes (voter_token, candidate_id) VALUES (?, ?)", votes)
+    conn.commit()
+    conn.close()
+
+@with_scratch_db
+def test_clean_election_verifies():
+    """Test that a clean table recounts to the live tally on several workers"""
+    _setup_election([(f"V{n}", n % 3 + 1) for n in range(100)])
+    for workers, chunk in ((1, 1_000_000), (4, 7)):
+        report = recount(db.DB_PATH, workers=workers, chunk_rows=chunk, election_db=db.election_path())
+        assert report['ok'] and report['rows'] == 100
+        assert [entry['votes'] for entry in report['tally'].values()] == [34, 33, 33]
+        assert report['live_tally_matches'] and report['rollup_matches']
+    assert report['workers'] == 4
+
+@with_scratch_db
+def test_flags_bad_rows_across_ranges():
+    """Test invalid candidates, orphaned tokens and repeat votes in and across ranges"""
+    votes = [(f"V{n}", 1) for n in range(50)]
+    votes += [("V3", 2), ("V3", 2)]              # repeat votes, spread over ranges
+    votes += [("INTRUDER", 2), ("V60", 7), ("V61", -1), ("V62", 'two')]
+    _setup_election(votes)
+    conn = sqlite3.connect(db.election_path())
+    conn.execute("INSERT INTO votes (voter_token, candidate_id) VALUES ('V3', 1)")
+    conn.execute("UPDATE turnout_hour SET votes = votes + 5 WHERE candidate_id = 1")
+    conn.commit()
+    conn.close()
+
+    for workers, chunk in ((1, 1000), (3, 10)):
+        report = recount(db.DB_PATH, workers=workers, chunk_rows=chunk, election_db=db.election_path())
+        assert not report['ok']
+        assert report['tally']['1']['votes'] == 51 and report['tally']['2']['votes'] == 3
+        assert report['invalid_candidate_votes'] == 3
+        assert [row[0] for row in report['samples']['invalid_candidate']] == [54, 55, 56]
+        assert report['orphaned_votes'] == 1
+        assert report['samples']['orphaned'] == [[53, 'INTRUDER']]
+        assert report['duplicate_votes'] == 3 and report['duplicate_tokens'] == 1
+        assert report['samples']['duplicate_tokens'] == ['V3']
+        # The live tally agrees on valid candidates; the tampered rollup does not
+        assert report['live_tally_matches'] and report['rollup_matches'] is False
+
+if __name__ == "__main__":
+    test_clean_election_verifies()
+    test_flags_bad_rows_across_ranges()
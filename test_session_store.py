@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""Test the shared session store and its in-process stand-in"""
+import os
+import subprocess
+import sys
+import tempfile
+
+from session_store import MemorySessionStore, SessionStore, is_finished
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+def check_lifecycle(store):
+    store.create('s1', worker_pid=123, worker_host='booth-1')
+    session = store.get('s1')
+    assert (session['status'], session['step'], session['worker_pid']) == ('listening', 1, 123)
+    assert not is_finished(session)
+
+    assert store.update('s1', step=2, status='success', message='Candidate selected: Bob')
+    assert store.get('s1')['message'] == 'Candidate selected: Bob'
+    store.update('s1', step=3, status='completed', message='Vote recorded', result={'success': True, 'candidate': 'Bob'})
+    store.finish('s1', 0)
+    session = store.get('s1')
+    assert session['status'] == 'completed' and session['result'] == {'success': True, 'candidate': 'Bob'}
+    assert is_finished(session) and session['exit_code'] == 0
+
+    # The receipt code is handed out once and is never part of the session status
+    store.set_receipt('s1', 'c0ffee')
+    assert 'c0ffee' not in repr(store.get('s1'))
+    assert store.take_receipt('s1') == 'c0ffee'
+    assert store.take_receipt('s1') is None
+    store.set_receipt('s1', 'c0ffee')
+
+    # A worker that dies before reporting a result surfaces as an error
+    store.create('s2', worker_pid=456)
+    store.finish('s2', -9)
+    assert store.get('s2')['status'] == 'error'
+
+    store.delete('s1')
+    assert store.get('s1') is None and store.take_receipt('s1') is None
+    assert not store.update('s1', status='listening')
+    assert store.purge(older_than=-1) == 1
+    assert store.get('s2') is None
+
+def test_sqlite_store_lifecycle():
+    """Test create/update/finish/delete against SQLite"""
+    with tempfile.TemporaryDirectory() as tmp:
+        check_lifecycle(SessionStore(os.path.join(tmp, 'sessions.db')))
+
+def test_memory_store_lifecycle():
+    """Test that the stand-in behaves like the SQLite store"""
+    check_lifecycle(MemorySessionStore())
+
+def test_status_visible_across_processes():
+    """Test that a voice worker's status written in one process is read by another"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'sessions.db')
+        store = SessionStore(path)
+        store.create('booth', worker_pid=None)
+        code = ("from session_status import send_status, send_final_result\n"
+                "send_status('booth', 2, 'listening', 'Say your candidate')\n"
+                "send_final_result('booth', True, 'Vote recorded', 'TEST1', 'Alice')\n")
+        subprocess.run([sys.executable, '-c', code], cwd=HERE, check=True,
+                       env={**os.environ, 'SESSION_DB': path}, capture_output=True)
+        session = store.get('booth')
+        assert session['status'] == 'completed' and session['message'] == 'Vote recorded'
+        assert session['result'] == {'success': True, 'voter_id': 'TEST1', 'candidate': 'Alice', 'receipt': None}
+
+if __name__ == "__main__":
+    test_sqlite_store_lifecycle()
+    test_memory_store_lifecycle()
+    test_status_visible_across_processes()
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""Test a short kiosk soak run and the soak verdict on growing resources"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from soak_test import evaluate
+
+HERE = Path(__file__).resolve().parent
+
+def test_short_kiosk_soak_passes():
+    """Test that a few hundred stub kiosk sessions leave no lasting resource growth"""
+    with tempfile.TemporaryDirectory() as tmp:
+        output = os.path.join(tmp, 'soak.json')
+        result = subprocess.run([sys.executable, str(HERE / 'soak_test.py'), '--sessions', '300',
+                                 '--sample-interval', '0.2', '--drain', '0.2', '--output', output],
+                                cwd=tmp, capture_output=True, text=True, timeout=120)
+        with open(output) as f:
+            report = json.load(f)
+        assert result.returncode == 0, report['failures']
+        assert report['final']['sessions'] == 300
+        assert sum(report['sessions'].values()) == 300
+
+def test_growth_beyond_thresholds_fails():
+    """Test that growth after warm-up, and leftover workers, are reported"""
+    args = argparse.Namespace(sessions=100, warmup=0.1, max_rss_growth_mb=32, max_fd_growth=8,
+                              max_disk_growth_mb=8, max_children=0)
+    samples = [
+        {'sessions': 0, 'rss_bytes': 10e6, 'open_fds': 5, 'children': 0, 'disk_bytes': 0},
+        {'sessions': 10, 'rss_bytes': 20e6, 'open_fds': 6, 'children': 1, 'disk_bytes': 0},
+        {'sessions': 100, 'rss_bytes': 60e6, 'open_fds': 14, 'children': 2, 'disk_bytes': 1e6},
+    ]
+    baseline, final, failures = evaluate(samples, args)
+    assert baseline is samples[1] and final is samples[2]
+    assert len(failures) == 2
+    assert failures[0].startswith('RSS grew by 40.0 MB')
+    assert failures[1].startswith('2 child processes')
+
+if __name__ == "__main__":
+    test_short_kiosk_soak_passes()
+    test_growth_beyond_thresholds_fails()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""Test pipelined prompt playback with a stub synthesizer of configurable latency"""
+import threading
+import time
+
+from tts_pipeline import PromptQueue
+
+class StubSynthesizer:
+    """Sleeps synth_seconds to render and play_seconds to play; logs what was played"""
+
+    def __init__(self, synth_seconds=0.0, play_seconds=0.0, broken=()):
+        self.synth_seconds = synth_seconds
+        self.play_seconds = play_seconds
+        self.broken = set(broken)
+        self.played = []
+        self.discarded = []
+        self.playing = threading.Event()
+
+    def synthesize(self, text):
+        time.sleep(self.synth_seconds)
+        return None if text in self.broken else f"audio:{text}"
+
+    def play(self, audio):
+        self.playing.set()
+        time.sleep(self.play_seconds)
+        self.played.append(audio)
+        self.playing.clear()
+        return True
+
+    def discard(self, audio):
+        self.discarded.append(audio)
+
+PROMPTS = [f"Candidate number {n}" for n in range(1, 7)]
+
+def test_synthesis_overlaps_playback():
+    """Test that six prompts take about one synthesis plus six playbacks, not twelve steps"""
+    stub = StubSynthesizer(synth_seconds=0.1, play_seconds=0.1)
+    prompts = PromptQueue(stub, fallback=None)
+    start = time.perf_counter()
+    for text in PROMPTS:
+        prompts.say(text)
+    queued = time.perf_counter() - start
+    assert prompts.flush(timeout=5)
+    elapsed = time.perf_counter() - start
+    prompts.close()
+
+    assert queued < 0.05
+    assert stub.played == [f"audio:{text}" for text in PROMPTS]
+    assert stub.discarded == stub.played
+    # Serial speech would take 1.2 s; pipelined is about 0.1 + 6 * 0.1
+    assert 0.65 < elapsed < 1.0, elapsed
+
+def test_flush_is_a_barrier_and_failures_fall_back_in_order():
+    """Test that nothing is playing once flush() returns and unsynthesizable prompts keep their turn"""
+    stub = StubSynthesizer(synth_seconds=0.02, play_seconds=0.05, broken={"Say yes"})
+
+    def fallback(text):
+        stub.played.append(f"fallback:{text}")
+
+    prompts = PromptQueue(stub, fallback=fallback)
+    for text in ("Welcome", "Say yes", "I am listening"):
+        prompts.say(text)
+    assert prompts.flush(timeout=5)
+    assert not stub.playing.is_set()
+    assert stub.played == ["audio:Welcome", "fallback:Say yes", "audio:I am listening"]
+    assert prompts.fallbacks == 1
+
+    # A short timeout reports the prompts still pending
+    prompts.say("Slow prompt")
+    assert not prompts.flush(timeout=0.01)
+    assert prompts.close(timeout=5)
+    assert stub.played[-1] == "audio:Slow prompt"
+
+if __name__ == "__main__":
+    test_synthesis_overlaps_playback()
+    test_flush_is_a_barrier_and_failures_fall_back_in_order()
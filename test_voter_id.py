@@ -1,39 +1,125 @@
 #!/usr/bin/env python3
 """Test voter ID pattern matching"""
-import re
+import sqlite3
+import tempfile
+from pathlib import Path
+
+import voter_index
+from voter_index import VoterIndex, SPOKEN_ALIASES
 
 def test_voter_id_patterns():
     """Test various voter ID patterns"""
     test_phrases = [
-        "first one",
-        "firstone", 
-        "first van",
-        "first won",
-        "firs tone",
-        "asked one",
-        "ask one",
-        "hello world",  # Should fail
-        "test1",        # Should fail
-        "last one",     # Should fail
+        ("first one", True),
+        ("firstone", True),
+        ("first van", True),
+        ("first won", True),
+        ("firs tone", True),
+        ("asked one", True),
+        ("ask one", True),
+        ("my voter id is first one", True),
+        ("hello world", False),  # Should fail
+        ("test1", False),        # Should fail
+        ("last one", False),     # Should fail
     ]
-    
+
+    # Same index as voice_subprocess.py, restricted to the 'first one' demo voter
+    index = VoterIndex()
+    index.add("first one", SPOKEN_ALIASES["first one"])
+
     print("Testing voter ID pattern matching:")
     print("=" * 50)
-    
-    for phrase in test_phrases:
-        # Same pattern as in voice_subprocess.py
-        first_one_match = re.search(r'\b(first one|firstone|first van|first won|firs tone|asked one|ask one)\b', phrase.lower())
-        
-        if first_one_match:
-            valid_voter_id = "first one"  # Store as lowercase
+
+    for phrase, expected in test_phrases:
+        valid_voter_id = index.match(phrase)
+
+        if valid_voter_id:
             result = "✅ VALID"
             print(f"'{phrase}' -> {result} (stored as: '{valid_voter_id}')")
         else:
             result = "❌ INVALID"
             print(f"'{phrase}' -> {result}")
-    
+        assert bool(valid_voter_id) == expected, phrase
+        if expected:
+            assert valid_voter_id == "first one"
+
     print("\n" + "=" * 50)
     print("Pattern matching test completed!")
 
+def test_voter_index_ranking():
+    """Test spoken digits and fuzzy ranking across several voters"""
+    index = VoterIndex()
+    for voter_id in ("TEST1", "TEST2", "TEST3", "KIRAN42"):
+        index.add(voter_id)
+
+    assert index.match("test one") == "TEST1"
+    assert index.match("TEST 3") == "TEST3"
+    assert index.match("kiran four two") == "KIRAN42"
+    # One misheard word still ranks the right voter first
+    ranked = index.lookup("kieran four two", min_score=0.5)
+    assert ranked and ranked[0][0] == "KIRAN42"
+    assert index.match("charlie") is None
+
+def test_voter_index_margin():
+    """Test that a fuzzy match close to a rival is returned for read-back, not accepted"""
+    index = VoterIndex()
+    for voter_id in ("KIRAN42", "KIRAN43", "KIRAN52"):
+        index.add(voter_id)
+
+    assert index.resolve("kiran four two") == ("KIRAN42", True)
+    assert index.resolve("kiran forty two") == ("KIRAN42", True)
+    # 'too' is nearly as close to 43 as to 42: best guess, but not confident
+    assert index.resolve("kiran four too") == ("KIRAN42", False)
+    assert index.match("kiran four too") is None
+    assert index.resolve("kiran") == (None, False)
+
+def test_voter_index_incremental_sync():
+    """Test that voters added to the database are picked up incrementally"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "votes.db"
+        conn = sqlite3.connect(db_path)
+        conn.execute("CREATE TABLE voters (id TEXT PRIMARY KEY, name TEXT)")
+        conn.execute("INSERT INTO voters (id, name) VALUES ('TEST1', 'Demo Voter')")
+        conn.commit()
+
+        index = VoterIndex()
+        assert index.sync_from_db(db_path) == 1
+        assert index.match("test two") is None
+
+        conn.execute("INSERT INTO voters (id, name) VALUES ('TEST2', 'Second Voter')")
+        conn.commit()
+        conn.close()
+
+        assert index.sync_from_db(db_path) == 1
+        assert index.match("test two") == "TEST2"
+        assert len(index) == 2
+
+def test_shared_index_sync_is_throttled():
+    """Test that the shared index re-reads the roll at most every SYNC_SECONDS"""
+    saved = voter_index._shared_index, voter_index._last_sync, voter_index.SYNC_SECONDS
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "votes.db"
+        conn = sqlite3.connect(db_path)
+        conn.execute("CREATE TABLE voters (id TEXT PRIMARY KEY, name TEXT)")
+        conn.execute("INSERT INTO voters (id, name) VALUES ('TEST1', 'Demo Voter')")
+        conn.commit()
+        try:
+            voter_index._shared_index = None
+            voter_index.SYNC_SECONDS = 3600
+            index = voter_index.get_voter_index(db_path)
+            conn.execute("INSERT INTO voters (id, name) VALUES ('TEST2', 'Second Voter')")
+            conn.commit()
+            assert voter_index.get_voter_index(db_path) is index and len(index) == 1
+
+            voter_index.SYNC_SECONDS = 0
+            assert voter_index.get_voter_index(db_path) is index and len(index) == 2
+        finally:
+            conn.close()
+            voter_index._shared_index, voter_index._last_sync, voter_index.SYNC_SECONDS = saved
+
 if __name__ == "__main__":
-    test_voter_id_patterns()
\ No newline at end of file
+    test_voter_id_patterns()
+    test_voter_index_ranking()
+    test_voter_index_margin()
+    test_voter_index_incremental_sync()
+    test_shared_index_sync_is_throttled()
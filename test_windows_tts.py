@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""Test TTS backend selection with fake backends (runs on any OS)"""
+import subprocess
+
+import windows_tts
+from windows_tts import SapiWavSynthesizer, TTSSelector
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class FakeBackend:
+    """Records what it was asked to say; fails while `working` is False"""
+
+    def __init__(self, working=True):
+        self.working = working
+        self.calls = []
+
+    def __call__(self, text):
+        self.calls.append(text)
+        if self.working is None:
+            raise OSError('powershell not found')
+        return self.working
+
+def test_remembers_working_backend_and_trips_broken_one():
+    """Test that a broken first backend stops being tried after the threshold"""
+    sapi, vbs, narrator = FakeBackend(None), FakeBackend(), FakeBackend()
+    selector = TTSSelector([('sapi', sapi), ('vbs', vbs), ('narrator', narrator)],
+                           failure_threshold=2, cooldown=60, clock=FakeClock())
+    for n in range(25):
+        assert selector.speak(f"prompt {n}")
+    # The broken backend costs one failed spawn, not one per prompt
+    assert sapi.calls == ['prompt 0']
+    assert len(vbs.calls) == 25 and narrator.calls == []
+    health = {h['backend']: h for h in selector.health()}
+    assert health['sapi']['failures'] == 1 and health['sapi']['last_error'] == 'powershell not found'
+    assert health['vbs']['preferred'] and health['vbs']['successes'] == 25
+
+    # If the preferred one breaks too, the next prompt falls through once and SAPI trips
+    vbs.working = False
+    assert selector.speak('prompt 25') and selector.speak('prompt 26')
+    assert sapi.calls == ['prompt 0', 'prompt 25'] and vbs.calls[-1] == 'prompt 25'
+    assert narrator.calls == ['prompt 25', 'prompt 26']
+    health = {h['backend']: h for h in selector.health()}
+    assert health['sapi']['state'] == 'open' and health['vbs']['consecutive_failures'] == 1
+    assert health['narrator']['preferred']
+
+def test_background_probe_restores_preferred_backend():
+    """Test that a recovered higher-priority backend is used again after a probe"""
+    clock = FakeClock()
+    sapi, vbs = FakeBackend(False), FakeBackend()
+    selector = TTSSelector([('sapi', sapi), ('vbs', vbs)], failure_threshold=1, cooldown=30, clock=clock)
+    assert selector.speak('one') and selector.speak('two')
+    assert sapi.calls == ['one']
+
+    sapi.working = True
+    clock.now = 31
+    assert selector.speak('three')   # still spoken by vbs while the probe runs
+    selector.wait_for_probe(1)
+    assert sapi.calls == ['one', '']  # the probe is silent
+    assert selector.speak('four')
+    assert sapi.calls[-1] == 'four' and vbs.calls == ['one', 'two', 'three']
+    assert [h['state'] for h in selector.health()] == ['closed', 'closed']
+
+def test_all_tripped_still_tries_everything():
+    """Test that an all-failed selector keeps trying instead of going silent"""
+    first, second = FakeBackend(False), FakeBackend(False)
+    selector = TTSSelector([('a', first), ('b', second)], failure_threshold=1, clock=FakeClock())
+    assert not selector.speak('hello')
+    second.working = True
+    assert selector.speak('again')
+    assert first.calls == ['hello', 'again'] and second.calls == ['hello', 'again']
+
+def test_sapi_text_never_enters_the_script():
+    """Test that prompt text reaches PowerShell through the environment, not the command"""
+    calls = []
+
+    def fake_run(cmd, **kwargs):
+        calls.append((cmd, kwargs['env']))
+        return subprocess.CompletedProcess(cmd, 1, '', 'no powershell here')
+
+    text = 'Say "$(Remove-Item C:\\votes.db)" it\'s `n done'
+    real_run = windows_tts.subprocess.run
+    windows_tts.subprocess.run = fake_run
+    try:
+        assert not windows_tts.speak_windows_sapi(text)
+        assert SapiWavSynthesizer().synthesize(text) is None
+    finally:
+        windows_tts.subprocess.run = real_run
+    for cmd, env in calls:
+        assert 'Remove-Item' not in ' '.join(cmd) and env['VOTING_TTS_TEXT'] == text
+
+if __name__ == "__main__":
+    test_remembers_working_backend_and_trips_broken_one()
+    test_background_probe_restores_preferred_backend()
+    test_all_tripped_still_tries_everything()
+    test_sapi_text_never_enters_the_script()
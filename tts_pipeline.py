@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Pipelined Prompt Playback
+Spoken prompts go through two threads: one synthesizes each prompt to audio while the
+other plays the prompt before it, so the cost of starting the TTS engine and rendering
+prompt N+1 is hidden behind playback of prompt N. Long candidate lists no longer pay
+synthesis and playback back to back for every name.
+
+say() only queues a prompt. flush() is the barrier the voice flow calls before it
+listens, so the microphone never opens while a prompt is still queued or playing.
+Prompts that cannot be synthesized ahead, or whose audio fails to play, are spoken in
+their turn through windows_tts's fallback chain. TTS_PIPELINE=0 speaks every prompt
+synchronously as before.
+"""
+import os
+import queue
+import threading
+import time
+
+from console_utils import safe_print
+from metrics import timed, observe
+from windows_tts import speak_subprocess_safe, SapiWavSynthesizer
+
+# Prompts synthesized ahead of the one playing; bounds temp files and wasted work on cancel
+LOOKAHEAD = 2
+
+_STOP = object()
+
+
+class PromptQueue:
+    """Speak prompts in order, synthesizing ahead of playback
+
+    `synthesizer` needs synthesize(text) -> audio or None, play(audio) -> bool and
+    discard(audio); `fallback(text)` speaks a prompt the synthesizer could not handle.
+    """
+
+    def __init__(self, synthesizer, fallback=speak_subprocess_safe, lookahead=LOOKAHEAD):
+        self.synthesizer = synthesizer
+        self.fallback = fallback
+        self._texts = queue.Queue()
+        self._rendered = queue.Queue(maxsize=lookahead)
+        self._done = threading.Condition()
+        self._queued = 0
+        self._spoken = 0
+        self.fallbacks = 0
+        self._threads = []
+
+    def _ensure_started(self):
+        if self._threads:
+            return
+        for target, name in ((self._synthesize_loop, 'tts-synth'), (self._play_loop, 'tts-play')):
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def say(self, text):
+        """Queue a prompt; returns immediately"""
+        self._ensure_started()
+        with self._done:
+            self._queued += 1
+        self._texts.put(text)
+
+    def flush(self, timeout=None):
+        """Block until every prompt queued so far has been spoken; False on timeout"""
+        started = time.perf_counter()
+        with self._done:
+            target = self._queued
+            finished = self._done.wait_for(lambda: self._spoken >= target, timeout)
+        observe('tts_flush_wait', time.perf_counter() - started)
+        return finished
+
+    def close(self, timeout=None):
+        """Speak what is still queued, then stop both threads"""
+        if not self._threads:
+            return True
+        finished = self.flush(timeout)
+        self._texts.put(_STOP)
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        return finished
+
+    def _synthesize_loop(self):
+        while True:
+            text = self._texts.get()
+            if text is _STOP:
+                self._rendered.put(_STOP)
+                return
+            try:
+                with timed('tts_synth'):
+                    audio = self.synthesizer.synthesize(text)
+            except Exception as e:
+                safe_print(f"❌ [PIPELINE] Synthesis failed: {e}")
+                audio = None
+            self._rendered.put((text, audio))
+
+    def _play_loop(self):
+        while True:
+            item = self._rendered.get()
+            if item is _STOP:
+                return
+            text, audio = item
+            try:
+                played = False
+                if audio is not None:
+                    try:
+                        with timed('tts_play'):
+                            played = self.synthesizer.play(audio)
+                    except Exception as e:
+                        safe_print(f"❌ [PIPELINE] Playback failed: {e}")
+                    finally:
+                        self.synthesizer.discard(audio)
+                if not played:
+                    self.fallbacks += 1
+                    self.fallback(text)
+            except Exception as e:
+                safe_print(f"❌ [PIPELINE] Could not speak prompt: {e}")
+            finally:
+                with self._done:
+                    self._spoken += 1
+                    self._done.notify_all()
+
+
+class DirectPrompts:
+    """Same interface as PromptQueue, speaking each prompt synchronously in say()"""
+
+    def __init__(self, fallback=speak_subprocess_safe):
+        self.fallback = fallback
+
+    def say(self, text):
+        self.fallback(text)
+
+    def flush(self, timeout=None):
+        return True
+
+    def close(self, timeout=None):
+        return True
+
+
+def open_prompt_queue():
+    """Pipelined prompts on booths with SAPI, synchronous speech otherwise or with TTS_PIPELINE=0"""
+    if os.environ.get('TTS_PIPELINE', '1') == '0' or os.name != 'nt':
+        return DirectPrompts()
+    return PromptQueue(SapiWavSynthesizer())
@@ -4,52 +4,72 @@ Voice Processing Subprocess
 Handles voice recognition separately from web framework
 """
 import sys
-import json
-import time
 import os
-import re
-from voice_utils import listen, speak, speak_and_wait
+from voter_index import get_voter_index
+from intent_matcher import get_intent_matcher
+from voice_utils import listen, speak, speak_and_wait, open_audio_session
 from db import get_candidates, record_vote
-from console_utils import safe_print
-from windows_tts import speak_subprocess_safe
+from console_utils import safe_print, set_log_context
+from session_status import send_status, send_final_result, send_receipt_code
+from metrics import timed, flush_to_store
+from profiling import profile_sessions
+from audit_audio import get_audit_recorder
+from windows_tts import get_tts_selector
+from tts_pipeline import DirectPrompts, open_prompt_queue
 
-def send_status(session_id, step, status, message):
-    """Send status update to web interface via file"""
-    data = {
-        'step': step,
-        'status': status,
-        'message': message,
-        'timestamp': time.time()
-    }
-    
-    status_file = f'status_{session_id}.json'
-    try:
-        with open(status_file, 'w') as f:
-            json.dump(data, f)
-    except Exception as e:
-        safe_print(f"Error writing status: {e}")
+# Working microphone on the booth machines
+MIC_DEVICE_INDEX = 1
 
-def send_final_result(session_id, success, message, voter_id=None, candidate=None):
-    """Send final result to web interface via file"""
-    data = {
-        'success': success,
-        'message': message,
-        'voter_id': voter_id,
-        'candidate': candidate,
-        'step': 3,
-        'status': 'completed' if success else 'error',
-        'timestamp': time.time()
-    }
-    
-    status_file = f'status_{session_id}.json'
-    try:
-        with open(status_file, 'w') as f:
-            json.dump(data, f)
-    except Exception as e:
-        safe_print(f"Error writing final result: {e}")
+def listen_step(audio, prompts, timeout, session_id=None, step=None):
+    """Listen on the session's open audio stream, or open the microphone just for this step
+
+    Waits for every queued prompt to finish first, so the microphone never hears one.
+    """
+    prompts.flush()
+    if audio is not None:
+        try:
+            return audio.listen(seconds=timeout, record_as=(session_id, step) if session_id else None)
+        except Exception as e:
+            safe_print(f"❌ Session audio failed: {e}, falling back to Google...")
+        return listen(prefer_vosk=False, timeout=timeout, device_index=MIC_DEVICE_INDEX)
+    return listen(
+        prefer_vosk=True,
+        timeout=timeout,
+        device_index=MIC_DEVICE_INDEX,
+        should_stop=None,
+        energy_threshold=None,
+        dynamic_energy=True,
+    )
+
+def spoken_voter_id(voter_id):
+    """Spell codes like TEST42 character by character; say worded IDs like 'first one' as words"""
+    if voter_id.isalnum() and (voter_id.isupper() or any(c.isdigit() for c in voter_id)):
+        return ' '.join(voter_id)
+    return voter_id
+
+def confirm_voter_id(audio, prompts, session_id, voter_id):
+    """Read a voter ID back and return True only if the voter says yes"""
+    send_status(session_id, 1, 'listening', f'🎤 LISTENING: Is your voter ID {voter_id}? Say yes or no')
+    prompts.say(f"I think you said voter ID {spoken_voter_id(voter_id)}.")
+    prompts.say("If that is correct, say yes. Otherwise say no.")
+    answer = listen_step(audio, prompts, timeout=10, session_id=session_id, step=1)
+    safe_print(f"Voter ID read-back answer: {answer}")
+    if not answer or not answer.strip():
+        return False
+    intent, confidence = get_intent_matcher(get_candidates()).match_confirmation(answer)
+    safe_print(f"Voter ID read-back match: {intent} (confidence {confidence})")
+    return intent == 'confirm'
 
-def voice_voting_process(session_id):
-    """Complete voice voting process"""
+@profile_sessions
+@timed('session_total')
+def voice_voting_process(session_id, audio=None, prompts=None):
+    """Complete voice voting process
+
+    `audio` is an open AudioSession shared by all three listening steps; without one
+    each step opens and closes the microphone itself. `prompts` is the prompt queue
+    (tts_pipeline); without one prompts are spoken synchronously.
+    """
+    prompts = prompts or DirectPrompts()
     try:
         safe_print(f"Starting voice voting process for session {session_id}")
         
@@ -57,37 +77,37 @@ def voice_voting_process(session_id):
         send_status(session_id, 1, 'listening', '🎤 LISTENING: Say your voter ID (TEST1, TEST2, etc.)')
         
         safe_print("About to speak welcome message")
-        speak_subprocess_safe("Welcome to the voice voting system.")
-        speak_subprocess_safe("You need to provide a voter ID first.")
-        speak_subprocess_safe("Please say your voter ID clearly now.")
-        speak_subprocess_safe("I am listening...")
+        prompts.say("Welcome to the voice voting system.")
+        prompts.say("You need to provide a voter ID first.")
+        prompts.say("Please say your voter ID clearly now.")
+        prompts.say("I am listening...")
         safe_print("Welcome message completed, starting voice recognition")
         
-        safe_print("Calling listen() function with device_index=1")
-        voter = listen(
-            prefer_vosk=True,
-            timeout=15,  # Longer timeout
-            device_index=1,  # Working microphone
-            should_stop=None,
-            energy_threshold=None,
-            dynamic_energy=True,
-        )
+        safe_print(f"Listening with device_index={MIC_DEVICE_INDEX}")
+        voter = listen_step(audio, prompts, timeout=15, session_id=session_id, step=1)
         safe_print(f"listen() returned: {voter}")
         
         if not voter or not voter.strip():
-            speak_subprocess_safe("I didn't hear you speak. Please make sure you are speaking clearly into your microphone.")
-            speak_subprocess_safe("Please say your voter ID clearly.")
-            speak_subprocess_safe("I will restart the process for you.")
+            prompts.say("I didn't hear you speak. Please make sure you are speaking clearly into your microphone.")
+            prompts.say("Please say your voter ID clearly.")
+            prompts.say("I will restart the process for you.")
             send_final_result(session_id, False, "No speech detected - please speak clearly. Try saying TEST1, TEST2, or TEST3.")
             return
         
         # Provide feedback that we heard something
-        speak_subprocess_safe(f"I heard you say: {voter}")
+        prompts.say(f"I heard you say: {voter}")
+        
+        # Match the transcript against registered voters, tolerating common mishearings
+        with timed('voter_match'):
+            matched_voter_id, confident = get_voter_index().resolve(voter)
         
-        # Validate voter ID format - only accept 'first one' variations
-        first_one_match = re.search(r'\b(first one|firstone|first van|first won|firs tone|asked one|ask one)\b', voter.lower())
+        if matched_voter_id and not confident:
+            # Close or ambiguous match: read the ID back instead of guessing
+            safe_print(f"Voter match {matched_voter_id} is not certain, asking voter to confirm")
+            if not confirm_voter_id(audio, prompts, session_id, matched_voter_id):
+                matched_voter_id = None
         
-        if not first_one_match:
+        if not matched_voter_id:
             # Clear audio feedback for blind users - make it consistent with display
             error_message = f"Invalid Voter ID: I heard '{voter}'. Please provide a valid voter ID."
             
@@ -97,12 +117,12 @@ def voice_voting_process(session_id):
             # Speak the same message that will be displayed using Windows SAPI
             try:
                 safe_print("🔊 Speaking error message with Windows SAPI...")
-                speak_subprocess_safe(error_message)
+                prompts.say(error_message)
                 safe_print("🔊 Error message spoken")
                 
                 safe_print("🔊 Speaking additional guidance...")
-                speak_subprocess_safe("Please provide a valid voter ID.")
-                speak_subprocess_safe("Let me restart the process for you.")
+                prompts.say("Please provide a valid voter ID.")
+                prompts.say("Let me restart the process for you.")
                 safe_print("🔊 Additional guidance spoken")
             except Exception as e:
                 safe_print(f"❌ Error speaking messages: {e}")
@@ -113,114 +133,96 @@ def voice_voting_process(session_id):
             send_final_result(session_id, False, error_message)
             return
         
-        # Set valid voter ID for 'first one'
-        valid_voter_id = "first one"  # Store as lowercase as requested
+        valid_voter_id = matched_voter_id
         send_status(session_id, 1, 'success', f'Voter ID confirmed: {valid_voter_id}')
-        speak_subprocess_safe(f"Voter ID {valid_voter_id} confirmed")
+        prompts.say(f"Voter ID {valid_voter_id} confirmed")
         
         # Step 2: Get Candidate Choice
         send_status(session_id, 2, 'listening', '🎤 LISTENING: Say your candidate choice (1, 2, or 3)')
         
         candidates = get_candidates()
-        speak_subprocess_safe("Excellent! Now I will read the list of candidates.")
-        speak_subprocess_safe("Listen carefully to all candidates before making your choice.")
+        prompts.say("Excellent! Now I will read the list of candidates.")
+        prompts.say("Listen carefully to all candidates before making your choice.")
         for cid, name in candidates:
-            speak_subprocess_safe(f"Candidate number {cid} is {name}")
-        speak_subprocess_safe("Please say just the number of your chosen candidate.")
-        speak_subprocess_safe("For example, say 1, or 2, or 3.")
-        speak_subprocess_safe("I am listening for your choice...")
-        
-        choice = listen(
-            prefer_vosk=True,
-            timeout=15,  # Longer timeout
-            device_index=1,
-            should_stop=None,
-            energy_threshold=None,
-            dynamic_energy=True,
-        )
+            prompts.say(f"Candidate number {cid} is {name}")
+        prompts.say("Please say the number or the name of your chosen candidate.")
+        prompts.say("For example, say 1, or 2, or 3.")
+        prompts.say("I am listening for your choice...")
+        
+        choice = listen_step(audio, prompts, timeout=15, session_id=session_id, step=2)
         
         if not choice or not choice.strip():
-            speak_subprocess_safe("I didn't hear your candidate choice clearly.")
-            speak_subprocess_safe("Please say just the number: 1, 2, or 3.")
-            speak_subprocess_safe("Let me try again.")
+            prompts.say("I didn't hear your candidate choice clearly.")
+            prompts.say("Please say just the number: 1, 2, or 3.")
+            prompts.say("Let me try again.")
             send_final_result(session_id, False, "No candidate choice heard - please say 1, 2, or 3 clearly.")
             return
         
         # Provide feedback that we heard something
-        speak_subprocess_safe(f"I heard you say: {choice}")
+        prompts.say(f"I heard you say: {choice}")
         
-        # Parse candidate choice
-        choice_match = re.search(r"(\d+)", choice)
-        if choice_match:
-            candidate_id = int(choice_match.group(1))
-        else:
+        # Parse candidate choice: digits, number words, ordinals or the candidate's name
+        candidate_id, confidence = get_intent_matcher(candidates).match_candidate(choice)
+        safe_print(f"Candidate match: {candidate_id} (confidence {confidence})")
+        if candidate_id is None:
             # Clear audio feedback for blind users - make it consistent with display
             error_message = f"Invalid candidate choice: I heard '{choice}'. Please say just the number: 1, 2, or 3."
             
             # Speak the same message that will be displayed
-            speak_subprocess_safe(error_message)
-            speak_subprocess_safe("Please say exactly: 1, 2, or 3.")
-            speak_subprocess_safe("Let me restart the candidate selection for you.")
+            prompts.say(error_message)
+            prompts.say("Please say exactly: 1, 2, or 3.")
+            prompts.say("Let me restart the candidate selection for you.")
             send_final_result(session_id, False, error_message)
             return
         
-        # Find candidate name
-        candidate_name = None
-        for cid, name in candidates:
-            if cid == candidate_id:
-                candidate_name = name
-                break
-        
-        if not candidate_name:
-            send_final_result(session_id, False, f"Invalid candidate number: {candidate_id}")
-            return
+        candidate_name = dict(candidates)[candidate_id]
         
         send_status(session_id, 2, 'success', f'Candidate selected: {candidate_name}')
-        speak_subprocess_safe(f"You selected {candidate_name}")
+        prompts.say(f"You selected {candidate_name}")
         
         # Step 3: Confirmation
         send_status(session_id, 3, 'listening', '🎤 LISTENING: Say "confirm" to cast your vote or "cancel" to abort')
         
-        speak_subprocess_safe(f"Perfect! You have chosen {candidate_name}.")
-        speak_subprocess_safe("Now I need your final confirmation to cast your vote.")
-        speak_subprocess_safe("Say 'confirm' to cast your vote for this candidate.")
-        speak_subprocess_safe("Or say 'cancel' to abort and not vote.")
-        speak_subprocess_safe("I am listening for your confirmation...")
-        
-        confirmation = listen(
-            prefer_vosk=True,
-            timeout=15,  # Longer timeout for confirmation
-            device_index=1,
-            should_stop=None,
-            energy_threshold=None,
-            dynamic_energy=True,
-        )
+        prompts.say(f"Perfect! You have chosen {candidate_name}.")
+        prompts.say("Now I need your final confirmation to cast your vote.")
+        prompts.say("Say 'confirm' to cast your vote for this candidate.")
+        prompts.say("Or say 'cancel' to abort and not vote.")
+        prompts.say("I am listening for your confirmation...")
+        
+        confirmation = listen_step(audio, prompts, timeout=15, session_id=session_id, step=3)
         
         if not confirmation:
-            speak_subprocess_safe("I didn't hear your confirmation clearly.")
-            speak_subprocess_safe("Please say 'confirm' to cast your vote, or 'cancel' to abort.")
-            speak_subprocess_safe("Let me try again.")
+            prompts.say("I didn't hear your confirmation clearly.")
+            prompts.say("Please say 'confirm' to cast your vote, or 'cancel' to abort.")
+            prompts.say("Let me try again.")
             send_final_result(session_id, False, "No confirmation heard. Say 'confirm' to vote or 'cancel' to abort.")
             return
         
         # Provide feedback that we heard something
-        speak_subprocess_safe(f"I heard you say: {confirmation}")
+        prompts.say(f"I heard you say: {confirmation}")
         
-        if "confirm" in confirmation.lower():
+        intent, confidence = get_intent_matcher(candidates).match_confirmation(confirmation)
+        safe_print(f"Confirmation match: {intent} (confidence {confidence})")
+        if intent == 'confirm':
             # Record the vote
-            record_vote(valid_voter_id, candidate_id)
-            speak_subprocess_safe("Excellent! Your vote has been successfully recorded.")
-            speak_subprocess_safe(f"You voted for {candidate_name}.")
-            speak_subprocess_safe("Thank you for voting!")
-            send_final_result(session_id, True, f"Vote successfully recorded for {candidate_name}!", valid_voter_id, candidate_name)
+            receipt, receipt_code = record_vote(valid_voter_id, candidate_id)
+            prompts.say("Excellent! Your vote has been successfully recorded.")
+            prompts.say(f"You voted for {candidate_name}.")
+            prompts.say(f"Your receipt number is {receipt}.")
+            prompts.say("Thank you for voting!")
+            # The receipt code is never spoken: it goes to the voter's screen only
+            send_receipt_code(session_id, receipt_code)
+            send_final_result(session_id, True, f"Vote successfully recorded for {candidate_name}! "
+                              f"Receipt number {receipt}.",
+                              valid_voter_id, candidate_name, receipt)
         else:
             # Clear audio feedback for blind users - make it consistent with display
             error_message = f"Vote cancelled: I heard '{confirmation}' but need 'confirm' to vote."
             
             # Speak the same message that will be displayed
-            speak_subprocess_safe(error_message)
-            speak_subprocess_safe("Your vote has been cancelled for security.")
-            speak_subprocess_safe("Please start again if you want to vote.")
+            prompts.say(error_message)
+            prompts.say("Your vote has been cancelled for security.")
+            prompts.say("Please start again if you want to vote.")
             send_final_result(session_id, False, error_message)
             
     except Exception as e:
@@ -239,17 +241,40 @@ def main():
         return
     
     session_id = sys.argv[1]
+    set_log_context(session=session_id)
     safe_print(f"Processing session ID: {session_id}")
     
+    # Open the microphone and recognizer once for all three listening steps
+    audio = open_audio_session(device_index=MIC_DEVICE_INDEX)
+    prompts = open_prompt_queue()
     try:
         # Start voice voting process
-        voice_voting_process(session_id)
+        voice_voting_process(session_id, audio, prompts)
         
     except Exception as e:
         safe_print(f"Main exception: {str(e)}")
         import traceback
         safe_print(f"Main traceback: {traceback.format_exc()}")
         send_final_result(session_id, False, f"Voice voting failed: {str(e)}")
+    finally:
+        # Let the last prompts (receipt, goodbye) finish before the process exits
+        prompts.close(timeout=60)
+        if audio is not None:
+            audio.close()
+        # Make sure the audit recording of this voter is on disk before exiting
+        recorder = get_audit_recorder()
+        if recorder is not None:
+            recorder.flush()
+        # Report TTS backends that failed so broken booths get noticed
+        for entry in get_tts_selector().health():
+            if entry['failures']:
+                safe_print(f"⚠️ TTS {entry['backend']}: {entry['state']}, {entry['failures']} failures, "
+                           f"last error: {entry['last_error']}")
+        # Add this session's stage timings to the shared totals behind /api/metrics
+        try:
+            flush_to_store()
+        except Exception as e:
+            safe_print(f"Error writing metrics: {e}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
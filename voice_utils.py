@@ -1,24 +1,40 @@
 import os
 from pathlib import Path
-import pyttsx3
 import threading
 import time
 import atexit
 import signal
 import sys
-import speech_recognition as sr
-from console_utils import safe_print
+from console_utils import safe_print, flush_logs, DEBUG, WARNING
+from metrics import timed, observe
+from audio_capture import AudioCapture
+from audit_audio import get_audit_recorder
+from recognizers import FanOut, GoogleBackend, VoskBackend
 
-# TTS
-engine = pyttsx3.init()
+# TTS engine, ASR backends and audio devices are created on first use, so importing
+# this module is cheap for processes that never speak or listen
+_engine = None
 _engine_lock = threading.Lock()
 
 
+def _get_engine():
+    """Create the pyttsx3 engine on first use (call with _engine_lock held)"""
+    global _engine
+    if _engine is None:
+        import pyttsx3
+        _ensure_signal_handlers()
+        with timed('tts_engine_init'):
+            _engine = pyttsx3.init()
+    return _engine
+
+
 def _shutdown_tts():
     # Ensure pyttsx3 background loop is stopped on process exit
+    if _engine is None:
+        return
     try:
         with _engine_lock:
-            engine.stop()
+            _engine.stop()
     except Exception:
         pass
 
@@ -35,6 +51,7 @@ def _force_exit():
     except Exception:
         pass
     safe_print("👋 Exiting...")
+    flush_logs()
     os._exit(0)
 
 def _signal_handler(signum, frame):
@@ -58,6 +75,7 @@ def _cleanup_all():
     _shutdown_tts()
     _shutdown_audio()
     # Force flush any pending output
+    flush_logs()
     sys.stdout.flush()
     sys.stderr.flush()
 
@@ -85,16 +103,24 @@ def _setup_signal_handlers():
         # Signal handling might not be available in some environments
         print(f"Warning: Could not setup signal handlers: {e}")
 
-# Setup signal handlers only if we're in the main thread
-if threading.current_thread() is threading.main_thread():
-    _setup_signal_handlers()
+_signal_handlers_installed = False
 
+def _ensure_signal_handlers():
+    """Install the Ctrl+C handlers once, when the first engine or device is created"""
+    global _signal_handlers_installed
+    # Setup signal handlers only if we're in the main thread
+    if not _signal_handlers_installed and threading.current_thread() is threading.main_thread():
+        _setup_signal_handlers()
+        _signal_handlers_installed = True
+
+@timed('tts_pyttsx3')
 def speak(text):
     """Speak text using TTS engine with proper error handling"""
     safe_print(f"🔊 speak() called with: '{text}'")
     
     # Prevent re-entrant run loop errors under Streamlit's multi-run model
     with _engine_lock:
+        engine = _get_engine()
         try:
             safe_print("🔊 Calling engine.say()...")
             engine.say(text)
@@ -138,21 +164,83 @@ def speak_and_wait(text, wait_time=2.0):
     time.sleep(wait_time)  # Additional wait time for audio system cleanup
 
 # ASR
-try:
-    from vosk import Model, KaldiRecognizer
-    import pyaudio
-    VOSK_AVAILABLE = True
-except Exception:
-    VOSK_AVAILABLE = False
+_vosk = None        # (Model, KaldiRecognizer, pyaudio) once imported, False if unavailable
+_vosk_model = None  # loaded once per process and reused by every listen()
+_vosk_lock = threading.Lock()
 
 MODEL_DIR = Path(__file__).parent / "models" / "vosk-model-small-en-us-0.15"
 
+def _load_vosk():
+    """Import Vosk and PyAudio on first use"""
+    global _vosk
+    if _vosk is None:
+        try:
+            from vosk import Model, KaldiRecognizer
+            import pyaudio
+            _vosk = (Model, KaldiRecognizer, pyaudio)
+        except Exception:
+            _vosk = False
+    return _vosk
+
+def vosk_available():
+    return bool(_load_vosk())
+
+def _get_vosk_model():
+    """Load the Vosk model on first use and keep it warm for later steps"""
+    global _vosk_model
+    with _vosk_lock:
+        if _vosk_model is None:
+            Model = _load_vosk()[0]
+            safe_print("🔄 Loading Vosk model...")
+            with timed('asr_model_load'):
+                _vosk_model = Model(str(MODEL_DIR))
+            safe_print("✅ Vosk model loaded")
+        return _vosk_model
+
+_waveform_needs_bytes = False
+
+def accept_waveform(rec, view):
+    """Feed a memoryview to the recognizer, copying only if the binding rejects buffers"""
+    global _waveform_needs_bytes
+    if not _waveform_needs_bytes:
+        try:
+            return rec.AcceptWaveform(view)
+        except TypeError:
+            _waveform_needs_bytes = True
+    return rec.AcceptWaveform(bytes(view))
+
+def _open_capture(p, pyaudio, sample_rate, device_index, paused=False):
+    """Start a callback-mode capture, falling back to 44.1kHz if the device rejects the rate"""
+    safe_print(f"🎤 Opening audio stream at {sample_rate}Hz...")
+    try:
+        capture = AudioCapture(p, pyaudio.paInt16, rate=sample_rate, frames_per_buffer=4000,
+                               device_index=device_index).start(paused)
+        safe_print(f"✅ Audio stream opened at {sample_rate}Hz")
+        return capture, sample_rate
+    except Exception as e:
+        safe_print(f"⚠️ Failed to open stream at {sample_rate}Hz: {e}")
+        # Device may not support 16k; fall back to 44100 and resample via recognizer model
+        safe_print("🔄 Trying fallback rate 44100Hz...")
+        capture = AudioCapture(p, pyaudio.paInt16, rate=44100, frames_per_buffer=8192,
+                               device_index=device_index).start(paused)
+        safe_print("✅ Audio stream opened at 44100Hz (fallback)")
+        return capture, 44100
+
+def _log_overruns(capture):
+    stats = capture.stats()
+    if stats['device_overflows'] or stats['ring_overruns']:
+        safe_print(f"⚠️ Audio overruns: {stats['device_overflows']} device overflows, "
+                   f"{stats['ring_overruns']} ring overruns ({stats['dropped_bytes']} bytes dropped)",
+                   level=WARNING)
+
 def recognize_from_vosk(seconds=5, sample_rate=16000, should_stop=None, device_index=None):
     safe_print(f"🤖 Starting Vosk recognition: timeout={seconds}s, sample_rate={sample_rate}, device_index={device_index}")
     
-    if not VOSK_AVAILABLE:
+    backend = _load_vosk()
+    if not backend:
         safe_print("❌ Vosk not available")
         return None
+    _, KaldiRecognizer, pyaudio = backend
     if not MODEL_DIR.exists():
         safe_print(f"❌ Vosk model not found at: {MODEL_DIR}")
         return None
@@ -160,63 +248,43 @@ def recognize_from_vosk(seconds=5, sample_rate=16000, should_stop=None, device_i
     global _last_pyaudio
     
     try:
-        safe_print("🔄 Loading Vosk model...")
-        model = Model(str(MODEL_DIR))
-        safe_print("✅ Vosk model loaded")
+        model = _get_vosk_model()
+        _ensure_signal_handlers()
         
+        open_started = time.perf_counter()
         p = pyaudio.PyAudio()
         _last_pyaudio = p
-        stream = None
+        capture = None
         
         try:
-            safe_print(f"🎤 Opening audio stream at {sample_rate}Hz...")
-            try:
-                stream = p.open(format=pyaudio.paInt16, channels=1, rate=sample_rate,
-                                input=True, frames_per_buffer=8000,
-                                input_device_index=device_index)
-                actual_rate = sample_rate
-                safe_print(f"✅ Audio stream opened at {actual_rate}Hz")
-            except Exception as e:
-                safe_print(f"⚠️ Failed to open stream at {sample_rate}Hz: {e}")
-                # Device may not support 16k; fall back to 44100 and resample via recognizer model
-                safe_print("🔄 Trying fallback rate 44100Hz...")
-                stream = p.open(format=pyaudio.paInt16, channels=1, rate=44100,
-                                input=True, frames_per_buffer=8192,
-                                input_device_index=device_index)
-                actual_rate = 44100
-                safe_print(f"✅ Audio stream opened at {actual_rate}Hz (fallback)")
-                
-            stream.start_stream()
+            capture, actual_rate = _open_capture(p, pyaudio, sample_rate, device_index)
+            observe('asr_stream_open', time.perf_counter() - open_started)
             rec = KaldiRecognizer(model, actual_rate)
             safe_print(f"🎤 Recording for {seconds} seconds...")
 
             transcript = ""
-            import time as _t, json
-            t_end = _t.time() + seconds
+            import json
             chunks_processed = 0
+            decode_seconds = 0.0
             
-            while _t.time() < t_end:
-                if callable(should_stop) and should_stop():
-                    safe_print("🛑 Recording stopped by request")
-                    break
-                    
-                try:
-                    data = stream.read(4000, exception_on_overflow=False)
-                    chunks_processed += 1
-                    
-                    if rec.AcceptWaveform(data):
-                        res = rec.Result()
-                        j = json.loads(res)
-                        partial_text = j.get("text", "")
-                        if partial_text:
-                            transcript += " " + partial_text
-                            safe_print(f"🗣️ Partial result: '{partial_text}'")
-                            
-                except Exception as e:
-                    safe_print(f"⚠️ Error reading audio chunk: {e}")
-                    continue
+            # The PortAudio callback fills the ring buffer; decoding here never blocks capture
+            for view in capture.chunks(seconds, max_bytes=8000, should_stop=should_stop):
+                chunks_processed += 1
+                decode_started = time.perf_counter()
+                accepted = accept_waveform(rec, view)
+                decode_seconds += time.perf_counter() - decode_started
+                if accepted:
+                    j = json.loads(rec.Result())
+                    partial_text = j.get("text", "")
+                    if partial_text:
+                        transcript += " " + partial_text
+                        safe_print(f"🗣️ Partial result: '{partial_text}'", rate_key='vosk_partial', per_second=5)
+            if callable(should_stop) and should_stop():
+                safe_print("🛑 Recording stopped by request")
 
             safe_print(f"🏁 Recording finished. Processed {chunks_processed} audio chunks.")
+            observe('asr_decode', decode_seconds)
+            _log_overruns(capture)
             
             # Get final result
             try:
@@ -241,10 +309,8 @@ def recognize_from_vosk(seconds=5, sample_rate=16000, should_stop=None, device_i
             
         finally:
             try:
-                if stream is not None:
-                    if stream.is_active():
-                        stream.stop_stream()
-                    stream.close()
+                if capture is not None:
+                    capture.stop()
                     safe_print("🔧 Audio stream closed")
             except Exception as e:
                 safe_print(f"⚠️ Error closing stream: {e}")
@@ -260,9 +326,12 @@ def recognize_from_vosk(seconds=5, sample_rate=16000, should_stop=None, device_i
         return None
 
 
+@timed('asr_google')
 def recognize_with_google(timeout=6, device_index=None, should_stop=None, energy_threshold=None, dynamic_energy=True):
     safe_print(f"🌐 Starting Google recognition: timeout={timeout}s, device_index={device_index}")
     
+    import speech_recognition as sr
+    _ensure_signal_handlers()
     r = sr.Recognizer()
     r.dynamic_energy_threshold = dynamic_energy
     if energy_threshold is not None:
@@ -290,7 +359,7 @@ def recognize_with_google(timeout=6, device_index=None, should_stop=None, energy
             while _t.time() < deadline and not (callable(should_stop) and should_stop()):
                 attempts += 1
                 remaining = max(0.5, min(2.0, deadline - _t.time()))
-                safe_print(f"🎤 Listening attempt #{attempts}, {remaining:.1f}s remaining...")
+                safe_print(f"🎤 Listening attempt #{attempts}, {remaining:.1f}s remaining...", level=DEBUG)
                 
                 try:
                     # Listen for audio with proper timeout handling
@@ -326,23 +395,163 @@ def recognize_with_google(timeout=6, device_index=None, should_stop=None, energy
         return None
 
 
+def google_available():
+    try:
+        import speech_recognition  # noqa: F401
+        return True
+    except Exception:
+        return False
+
+# How listen() chooses between recognizers that ran on the same utterance
+ASR_POLICY = os.environ.get('ASR_POLICY', 'first_confident')
+# Extra time allowed after the utterance for network recognizers to answer
+ASR_RESULT_TIMEOUT = float(os.environ.get('ASR_RESULT_TIMEOUT', '5'))
+
+def _tee(chunks, recorder, record_as, rate):
+    """Pass chunks through, queueing a copy of each for the audit recorder"""
+    session_id, step = record_as
+    for view in chunks:
+        recorder.record(session_id, step, view, rate)
+        yield view
+
+
+class AudioSession:
+    """One microphone stream and recognizer for all listening steps of a voting session
+
+    The device is opened once on entry and closed once on exit. Between listen() calls
+    capture is paused, so prompts played through the speakers are not recorded, and
+    each listen() starts from an empty buffer with a Reset() recognizer.
+
+    `pa` and `backends` can be injected (e.g. FileAudioDevice and ScriptedBackend) to
+    run without a microphone or Vosk.
+    """
+
+    def __init__(self, device_index=None, sample_rate=16000, policy=None, pa=None, backends=None):
+        self.device_index = device_index
+        self.sample_rate = sample_rate
+        self.policy = policy or ASR_POLICY
+        self.pa = pa
+        self.backends = backends
+        self.capture = None
+        self._owns_pa = pa is None
+
+    def __enter__(self):
+        global _last_pyaudio
+        sample_format = None
+        if self.backends is None or self.pa is None:
+            _, KaldiRecognizer, pyaudio = _load_vosk()
+            sample_format = pyaudio.paInt16
+        _ensure_signal_handlers()
+        open_started = time.perf_counter()
+        if self.pa is None:
+            self.pa = pyaudio.PyAudio()
+            _last_pyaudio = self.pa
+        try:
+            # Capture stays paused except inside listen()
+            if sample_format is None:
+                self.capture = AudioCapture(self.pa, rate=self.sample_rate,
+                                            device_index=self.device_index).start(paused=True)
+                self.rate = self.sample_rate
+            else:
+                self.capture, self.rate = _open_capture(self.pa, pyaudio, self.sample_rate, self.device_index,
+                                                        paused=True)
+            observe('asr_stream_open', time.perf_counter() - open_started)
+            if self.backends is None:
+                model = _get_vosk_model()
+                rec = KaldiRecognizer(model, self.rate)
+                rec.SetWords(True)
+                self.backends = [VoskBackend(model, KaldiRecognizer, accept=accept_waveform, recognizer=rec)]
+                if google_available():
+                    self.backends.append(GoogleBackend())
+        except Exception:
+            self.close()
+            raise
+        return self
+
+    def listen(self, seconds=6, should_stop=None, record_as=None):
+        """Capture one utterance and return the chosen transcript (or None)
+
+        record_as=(session_id, step) also keeps the audio when AUDIT_AUDIO_DIR is set.
+        """
+        fanout = FanOut(self.backends, self.policy, result_timeout=ASR_RESULT_TIMEOUT)
+        safe_print(f"🎤 Recording for {seconds} seconds ({', '.join(b.name for b in self.backends)})...")
+        chunks = self.capture.chunks(seconds, should_stop=should_stop)
+        recorder = get_audit_recorder() if record_as else None
+        if recorder is not None:
+            chunks = _tee(chunks, recorder, record_as, self.rate)
+        # Flush audio left over from before (prompts, the voter's earlier answer)
+        self.capture.resume()
+        try:
+            hyp = fanout.recognize(chunks, self.rate, seconds, should_stop=should_stop)
+        finally:
+            self.capture.pause()
+            if recorder is not None:
+                recorder.end_step(*record_as)
+        _log_overruns(self.capture)
+        if hyp:
+            safe_print(f"✅ {hyp.backend} recognition chosen: '{hyp.text}' (confidence {hyp.confidence:.2f})")
+            return hyp.text
+        safe_print("❌ No speech recognized by any backend")
+        return None
+
+    def close(self):
+        global _last_pyaudio
+        if self.capture is not None:
+            try:
+                self.capture.stop()
+                safe_print("🔧 Audio stream closed")
+            except Exception as e:
+                safe_print(f"⚠️ Error closing stream: {e}")
+            self.capture = None
+        if self._owns_pa and self.pa is not None:
+            try:
+                self.pa.terminate()
+            except Exception:
+                pass
+            self.pa = None
+            _last_pyaudio = None
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+def audio_session_available():
+    return vosk_available() and MODEL_DIR.exists()
+
+
+def open_audio_session(device_index=None, sample_rate=16000):
+    """Open an AudioSession for a whole voting session, or return None to listen per step"""
+    if not audio_session_available():
+        return None
+    try:
+        return AudioSession(device_index, sample_rate).__enter__()
+    except Exception as e:
+        safe_print(f"⚠️ Could not open session audio: {e}")
+        return None
+
+
+def listen_fanout(seconds=6, device_index=None, should_stop=None, policy=None, sample_rate=16000):
+    """Capture once and run Vosk and Google on the same audio concurrently"""
+    with AudioSession(device_index, sample_rate, policy) as audio:
+        return audio.listen(seconds, should_stop)
+
+
+@timed('asr_listen')
 def listen(prefer_vosk=True, timeout=6, device_index=None, should_stop=None, energy_threshold=None, dynamic_energy=True):
     safe_print(f"🎤 Listen function called: prefer_vosk={prefer_vosk}, timeout={timeout}, should_stop={should_stop}")
     
-    # Try Vosk first if available
-    if prefer_vosk and VOSK_AVAILABLE and MODEL_DIR.exists():
-        safe_print("🔍 Trying Vosk recognition...")
-        t = recognize_from_vosk(seconds=timeout, should_stop=should_stop, device_index=device_index)
-        safe_print(f"🔍 Vosk result: '{t}'")
-        if t and t.strip():
-            safe_print("✅ Vosk recognition successful!")
-            return t
-        else:
-            safe_print("❌ Vosk recognition failed, falling back to Google...")
+    # Capture once and let Vosk and Google work on the same utterance in parallel
+    if prefer_vosk and audio_session_available():
+        safe_print("🔍 Trying Vosk + Google fan-out recognition...")
+        try:
+            return listen_fanout(seconds=timeout, device_index=device_index, should_stop=should_stop)
+        except Exception as e:
+            safe_print(f"❌ Fan-out recognition failed: {e}, falling back to Google...")
     else:
         safe_print("🔍 Vosk not available or not preferred, using Google...")
     
-    # Fallback to Google if Vosk failed or not preferred
+    # Google alone, with its own microphone handling
     safe_print("🔍 Trying Google recognition...")
     result = recognize_with_google(
         timeout=timeout,
@@ -423,18 +632,15 @@ def monitor_audio_levels(seconds=10, device_index=None, sample_rate=16000):
                     bar_length = min(50, level // 2)
                     bar = '█' * bar_length + '░' * (25 - bar_length)
                     
-                    # Print level with carriage return for live update
-                    try:
-                        print(f"\r📊 [{bar}] {level:3d}% (max: {max_level:3d}%)", end="", flush=True)
-                    except UnicodeEncodeError:
-                        # Fallback for Windows compatibility
-                        simple_bar = '#' * bar_length + '-' * (25 - bar_length)
-                        print(f"\r[CHART] [{simple_bar}] {level:3d}% (max: {max_level:3d}%)", end="", flush=True)
+                    # Print level with carriage return for live update; the log writer
+                    # thread handles console I/O and the emoji fallback
+                    safe_print(f"\r📊 [{bar}] {level:3d}% (max: {max_level:3d}%)", end="",
+                               rate_key='audio_level', per_second=10)
                     
                     time.sleep(0.1)  # Update 10 times per second
                     
                 except Exception as e:
-                    safe_print(f"\n⚠️ Error reading audio: {e}")
+                    safe_print(f"\n⚠️ Error reading audio: {e}", level=WARNING, rate_key='level_read_error', per_second=1)
                     continue
                     
         finally:
@@ -442,32 +648,33 @@ def monitor_audio_levels(seconds=10, device_index=None, sample_rate=16000):
             stream.close()
             p.terminate()
             
-        print(f"\n\n📊 Monitoring complete!")
-        print(f"📈 Processed {samples_processed} audio samples")
-        print(f"🔊 Maximum audio level detected: {max_level}%")
+        safe_print(f"\n\n📊 Monitoring complete!")
+        safe_print(f"📈 Processed {samples_processed} audio samples")
+        safe_print(f"🔊 Maximum audio level detected: {max_level}%")
         
         if max_level < 5:
-            print("❌ Very low audio levels detected. Check your microphone:")
-            print("   • Make sure it's not muted")
-            print("   • Check microphone permissions")
-            print("   • Try speaking louder or closer to the microphone")
+            safe_print("❌ Very low audio levels detected. Check your microphone:")
+            safe_print("   • Make sure it's not muted")
+            safe_print("   • Check microphone permissions")
+            safe_print("   • Try speaking louder or closer to the microphone")
             return False
         elif max_level < 20:
-            print("⚠️ Low audio levels detected. Consider:")
-            print("   • Speaking louder or closer to the microphone")
-            print("   • Adjusting microphone sensitivity")
+            safe_print("⚠️ Low audio levels detected. Consider:")
+            safe_print("   • Speaking louder or closer to the microphone")
+            safe_print("   • Adjusting microphone sensitivity")
             return True
         else:
-            print("✅ Good audio levels detected! Your microphone is working well.")
+            safe_print("✅ Good audio levels detected! Your microphone is working well.")
             return True
             
     except Exception as e:
-        print(f"❌ Audio level monitoring failed: {e}")
+        safe_print(f"❌ Audio level monitoring failed: {e}")
         return False
 
 
 def list_microphones():
     try:
+        import speech_recognition as sr
         return sr.Microphone.list_microphone_names() or []
     except Exception:
         return []
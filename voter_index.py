@@ -0,0 +1,417 @@
+#!/usr/bin/env python3
+"""
+Phonetic Voter ID Index
+Ranks voters from the voters table against a spoken ASR transcript
+using Metaphone-style keys. Multi-word IDs are split into up to three parts
+and indexed once per part with that part left out: one misheard, dropped or
+extra word falls in a single part, so one of those keys is still exact and
+its postings hold every near match. Single-word IDs fall back to a trigram
+index over their keys.
+"""
+import gc
+import re
+import sqlite3
+import time
+from array import array
+from functools import lru_cache
+
+DIGIT_WORDS = {
+    '0': 'zero', '1': 'one', '2': 'two', '3': 'three', '4': 'four',
+    '5': 'five', '6': 'six', '7': 'seven', '8': 'eight', '9': 'nine',
+}
+
+# Known mishearings of demo voter IDs, indexed as extra spoken forms
+SPOKEN_ALIASES = {
+    'first one': ['firstone', 'first van', 'first won', 'firs tone', 'asked one', 'ask one'],
+}
+
+VOWELS = 'aeiou'
+
+# Transcripts must score at least this to be accepted as a voter ID
+MIN_SCORE = 0.75
+
+# A fuzzy match is only taken without asking the voter if it beats the
+# runner-up by this much; otherwise the ID is read back for confirmation
+MIN_MARGIN = 0.15
+
+# Forms sharing a rest key that are fully re-scored (see VoterIndex._shortlist)
+SHORTLIST = 4
+
+# get_voter_index() looks for newly registered voters at most this often
+SYNC_SECONDS = 2.0
+
+# Upper bound on single-word forms re-scored per transcript window; trigrams
+# shared by more forms than this are too common to narrow the search
+MAX_CANDIDATES = 1000
+
+
+def spoken_words(text):
+    """Split text into lowercase spoken words, spelling out digits one by one"""
+    text = re.sub(r'(?<=[a-z])(?=\d)|(?<=\d)(?=[a-z])', ' ', text.lower())
+    words = []
+    for token in re.findall(r'[a-z]+|\d+', text):
+        if token.isdigit():
+            words.extend(DIGIT_WORDS[d] for d in token)
+        else:
+            words.append(token)
+    return words
+
+
+@lru_cache(maxsize=4096)
+def phonetic_key(word):
+    """Return a Metaphone-style consonant key for a single word"""
+    w = re.sub(r'[^a-z]', '', word.lower())
+    if not w:
+        return ''
+    if w[:2] in ('kn', 'gn', 'pn', 'wr', 'ae'):
+        w = w[1:]
+    elif w[:2] == 'wh':
+        w = 'w' + w[2:]
+    elif w[0] == 'x':
+        w = 's' + w[1:]
+
+    codes = []
+    n = len(w)
+    for i, c in enumerate(w):
+        prev = w[i - 1] if i else ''
+        nxt = w[i + 1] if i + 1 < n else ''
+        if c == prev and c != 'c':
+            continue
+        if c in VOWELS:
+            code = 'A' if i == 0 else ''
+        elif c == 'b':
+            code = '' if prev == 'm' and i == n - 1 else 'P'
+        elif c == 'c':
+            code = 'X' if nxt == 'h' else ('S' if nxt and nxt in 'iey' else 'K')
+        elif c == 'd':
+            code = 'J' if nxt == 'g' and w[i + 2:i + 3] in ('e', 'i', 'y') else 'T'
+        elif c == 'g':
+            if nxt == 'h' and i > 0:
+                code = ''
+            else:
+                code = 'J' if nxt and nxt in 'iey' else 'K'
+        elif c == 'h':
+            code = 'H' if nxt and nxt in VOWELS and not (prev and prev in 'cgspt') else ''
+        elif c == 'k':
+            code = '' if prev == 'c' else 'K'
+        elif c == 'p':
+            code = 'F' if nxt == 'h' else 'P'
+        elif c == 'q':
+            code = 'K'
+        elif c == 's':
+            code = 'X' if nxt == 'h' else 'S'
+        elif c == 't':
+            code = '0' if nxt == 'h' else 'T'
+        elif c == 'v':
+            code = 'F'
+        elif c in 'wy':
+            code = c.upper() if nxt and nxt in VOWELS else ''
+        elif c == 'x':
+            code = 'KS'
+        elif c == 'z':
+            code = 'S'
+        else:
+            code = c.upper()
+        for ch in code:
+            if not codes or codes[-1] != ch:
+                codes.append(ch)
+    return ''.join(codes)
+
+
+@lru_cache(maxsize=64)
+def _parts(n):
+    """[(start, end)] word ranges of the parts of an n-word form (two or three parts)
+
+    Earlier parts get the extra words: IDs tend to start with low-entropy
+    words (names, leading zeros) and end with the distinguishing digits.
+    """
+    count = min(n, 3)
+    bounds = [0]
+    for i in range(count):
+        bounds.append(bounds[-1] + n // count + (1 if i < n % count else 0))
+    return tuple(zip(bounds, bounds[1:]))
+
+
+def _rest_key(n, left_out, key):
+    return f"{n}/{left_out}/{key}"
+
+
+def phrase_key(words):
+    """Concatenate word keys so word-boundary mishearings still line up"""
+    return ''.join(phonetic_key(w) for w in words)
+
+
+@lru_cache(maxsize=65536)
+def trigrams(key):
+    """Return the padded trigrams of a phonetic key as a set
+
+    A repeated trigram is tagged with one '+' per earlier occurrence, so spoken digit
+    runs like 'three three' keep their count instead of collapsing into one.
+    """
+    padded = f"$${key}$"
+    grams = [padded[i:i + 3] for i in range(len(padded) - 2)]
+    unique = frozenset(grams)
+    if len(unique) == len(grams):
+        return unique
+    tagged = set()
+    for gram in grams:
+        while gram in tagged:
+            gram += '+'
+        tagged.add(gram)
+    return frozenset(tagged)
+
+
+def similarity(a, b):
+    """Dice coefficient between the trigram sets of two keys"""
+    if a == b:
+        return 1.0
+    ga, gb = trigrams(a), trigrams(b)
+    if not ga or not gb:
+        return 0.0
+    return 2.0 * len(ga & gb) / (len(ga) + len(gb))
+
+
+class VoterIndex:
+    """In-memory phonetic index over voter IDs and their spoken aliases"""
+
+    def __init__(self, max_candidates=MAX_CANDIDATES):
+        self.max_candidates = max_candidates
+        self._voter_ids = []      # ordinal -> voter id
+        self._form_keys = []      # form ordinal -> phonetic key
+        self._form_owner = array('I')  # form ordinal -> voter ordinal
+        self._ordinals = {}       # voter id -> ordinal
+        self._by_key = {}         # phonetic key -> [form ordinals]
+        self._by_rest = {}        # "words/left-out part/key of the rest" -> form ordinal or array
+        self._by_gram = {}        # trigram -> array of single-word form ordinals
+        self._word_counts = set()  # word counts of indexed spoken forms
+        self._last_rowid = 0
+
+    def __len__(self):
+        return len(self._voter_ids)
+
+    def __contains__(self, voter_id):
+        return voter_id in self._ordinals
+
+    def add(self, voter_id, aliases=()):
+        """Index a voter ID plus any alternate spoken forms"""
+        if voter_id in self._ordinals:
+            ordinal = self._ordinals[voter_id]
+        else:
+            ordinal = len(self._voter_ids)
+            self._voter_ids.append(voter_id)
+            self._ordinals[voter_id] = ordinal
+
+        for form in (voter_id, *aliases):
+            words = spoken_words(form)
+            key = phrase_key(words)
+            if not key:
+                continue
+            forms = self._by_key.setdefault(key, [])
+            if any(self._form_owner[f] == ordinal for f in forms):
+                continue
+            form_ordinal = len(self._form_keys)
+            self._form_keys.append(key)
+            self._form_owner.append(ordinal)
+            forms.append(form_ordinal)
+            if len(words) == 1:
+                self._post(self._by_gram, trigrams(key), form_ordinal)
+            else:
+                n = len(words)
+                for left_out, (start, end) in enumerate(_parts(n)):
+                    rest = _rest_key(n, left_out, phrase_key(words[:start]) + phrase_key(words[end:]))
+                    # Most keys belong to one form; only shared ones pay for an array
+                    postings = self._by_rest.get(rest)
+                    if postings is None:
+                        self._by_rest[rest] = form_ordinal
+                    elif isinstance(postings, int):
+                        self._by_rest[rest] = array('I', (postings, form_ordinal))
+                    else:
+                        postings.append(form_ordinal)
+            self._word_counts.add(len(words))
+
+    @staticmethod
+    def _post(index, keys, form_ordinal):
+        for key in keys:
+            postings = index.get(key)
+            if postings is None:
+                postings = index[key] = array('I')
+            postings.append(form_ordinal)
+
+    def sync_from_db(self, db_path):
+        """Index voters added to the database since the last sync"""
+        conn = sqlite3.connect(db_path)
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT rowid, id FROM voters WHERE rowid > ? ORDER BY rowid", (self._last_rowid,))
+            added = 0
+            for rowid, voter_id in cur:
+                self.add(voter_id, SPOKEN_ALIASES.get(voter_id, ()))
+                self._last_rowid = rowid
+                added += 1
+            return added
+        finally:
+            conn.close()
+
+    def _windows(self, words, sizes):
+        """Yield (size, words) for every run of words whose length is in sizes"""
+        for size in sorted(sizes, reverse=True):
+            for start in range(len(words) - size + 1):
+                yield size, words[start:start + size]
+
+    def _scores(self, transcript, min_score):
+        """Return ({voter ordinal: best score} for voters scoring at least min_score, exact)
+
+        exact is True when the scores come from identical phonetic keys rather
+        than fuzzy similarity.
+        """
+        words = spoken_words(transcript)
+        best = {}
+        for _, window in self._windows(words, self._word_counts):
+            for form in self._by_key.get(phrase_key(window), ()):
+                best[self._form_owner[form]] = 1.0
+        if best:
+            return best, True
+
+        # Allow one word to be misheard; only if nothing comes close, one
+        # dropped or extra word
+        for offsets in ((0,), (-1, 1)):
+            sizes = {n + d for n in self._word_counts for d in offsets if n + d > 0}
+            for size, window in self._windows(words, sizes):
+                key = phrase_key(window)
+                if not key:
+                    continue
+                scored = {}
+                for forms in self._candidates(window, key, offsets, min_score):
+                    for form in forms:
+                        form_key = self._form_keys[form]
+                        score = scored.get(form_key)
+                        if score is None:
+                            score = scored[form_key] = similarity(key, form_key)
+                        owner = self._form_owner[form]
+                        if score >= min_score and score > best.get(owner, 0.0):
+                            best[owner] = score
+            if best:
+                break
+        return best, False
+
+    def _candidates(self, window, key, offsets, min_score):
+        """Yield groups of forms whose word count differs from the window's by one of offsets"""
+        size = len(window)
+        for d in offsets:
+            n = size - d
+            if n < 2 or n not in self._word_counts:
+                continue
+            # A form of n words that differs from the window by one word in one
+            # part keeps the words before and after that part unchanged
+            for left_out, (start, end) in enumerate(_parts(n)):
+                tail = n - end
+                if start + tail > size:
+                    continue
+                prefix = phrase_key(window[:start])
+                suffix = phrase_key(window[size - tail:])
+                postings = self._by_rest.get(_rest_key(n, left_out, prefix + suffix), ())
+                if isinstance(postings, int):
+                    yield (postings,)
+                elif len(postings) <= SHORTLIST:
+                    yield postings
+                else:
+                    yield self._shortlist(postings, key, len(prefix), len(suffix))
+        if size - min(offsets) >= 1 >= size - max(offsets) and 1 in self._word_counts:
+            yield self._gram_candidates(key, min_score)
+
+    def _shortlist(self, forms, key, before, after):
+        """The SHORTLIST forms whose left-out part sounds most like the window's
+
+        Forms sharing a rest key differ only in that part, and the few distinct
+        part keys have cached trigrams, so this is far cheaper than scoring the
+        full key of every form.
+        """
+        part = key[before:len(key) - after]
+        ranked = []
+        for form in forms:
+            form_key = self._form_keys[form]
+            ranked.append((similarity(part, form_key[before:len(form_key) - after]), form))
+        ranked.sort(reverse=True)
+        return [form for _, form in ranked[:SHORTLIST]]
+
+    def _gram_candidates(self, key, min_score):
+        """Single-word forms that could reach min_score against key"""
+        grams = trigrams(key)
+        # Dice >= min_score needs at least this many shared trigrams, so any
+        # match must contain one of the rarest (len - needed + 1) of them
+        needed = int(min_score * len(grams) / (2.0 - min_score) + 0.999)
+        postings = sorted((self._by_gram.get(g, ()) for g in grams), key=len)
+        candidates = set()
+        for plist in postings[:max(1, len(grams) - needed + 1)]:
+            if len(candidates) + len(plist) > self.max_candidates:
+                break
+            candidates.update(plist)
+        return candidates
+
+    def lookup(self, transcript, limit=5, min_score=MIN_SCORE):
+        """Return [(voter_id, score)] best first for a transcript"""
+        if not transcript or not self._voter_ids:
+            return []
+        return self._ranked(self._scores(transcript, min_score)[0], limit, min_score)
+
+    def _ranked(self, scores, limit, min_score):
+        ranked = sorted(((o, s) for o, s in scores.items() if s >= min_score),
+                        key=lambda item: (-item[1], item[0]))
+        return [(self._voter_ids[o], round(s, 3)) for o, s in ranked[:limit]]
+
+    def resolve(self, transcript, min_score=MIN_SCORE, min_margin=MIN_MARGIN):
+        """Return (best voter ID or None, confident)
+
+        Only a single exact match, or a fuzzy winner at least min_margin ahead
+        of the runner-up, is confident; anything else must be confirmed by the voter.
+        """
+        if not transcript or not self._voter_ids:
+            return None, False
+        # Anything within min_margin below the threshold still counts as a rival
+        scores, exact = self._scores(transcript, max(0.0, min_score - min_margin))
+        ranked = self._ranked(scores, 2, 0.0)
+        if not ranked or ranked[0][1] < min_score:
+            return None, False
+        if exact:
+            return ranked[0][0], len(ranked) == 1
+        runner_up = ranked[1][1] if len(ranked) > 1 else 0.0
+        return ranked[0][0], ranked[0][1] - runner_up >= min_margin
+
+    def match(self, transcript, min_score=MIN_SCORE):
+        """Return the voter ID a transcript unambiguously names, or None"""
+        voter_id, confident = self.resolve(transcript, min_score)
+        return voter_id if confident else None
+
+
+_shared_index = None
+_last_sync = 0.0
+
+
+def get_voter_index(db_path=None):
+    """Return the process-wide index, picking up voters added in the last SYNC_SECONDS or so"""
+    global _shared_index, _last_sync
+    if _shared_index is not None and time.monotonic() - _last_sync < SYNC_SECONDS:
+        return _shared_index
+    if db_path is None:
+        from db import DB_PATH
+        db_path = DB_PATH
+    if _shared_index is None:
+        index = VoterIndex()
+        index.sync_from_db(db_path)
+        # The initial roll is the bulk of the index; later additions are few
+        freeze_index()
+        _shared_index = index
+    else:
+        _shared_index.sync_from_db(db_path)
+    _last_sync = time.monotonic()
+    return _shared_index
+
+
+def freeze_index():
+    """Move the index out of the garbage collector's view
+
+    A large roll is millions of objects that never become garbage; without
+    this, a full collection landing inside a lookup costs milliseconds.
+    """
+    gc.collect()
+    gc.freeze()
@@ -3,19 +3,45 @@
 Professional Web-Based Voice Voting System
 Uses subprocess for voice processing to avoid web framework conflicts
 """
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, Response, render_template, jsonify, request
+import csv
+import io
 import subprocess
 import json
 import os
+import socket
+import sys
 import threading
 import time
-from db import init_db, get_candidates, record_vote, get_votes
+import uuid
+import db
+from db import init_db, get_candidates, record_vote, get_votes, get_votes_page, iter_votes, get_turnout
 from console_utils import safe_print
+from merkle_ledger import MerkleLedger, ledger_path
+from metrics import timed, flush_to_store, flush_if_due, load_store, render_prometheus
+from session_store import get_session_store, is_finished
+from profiling import install_flask
 
 app = Flask(__name__)
+# Per-endpoint stack profiles when PROFILE_DIR is set; nothing is installed otherwise
+install_flask(app)
 
-# Global state for web interface
-voting_sessions = {}
+# Script run for each voting session; load tests point this at stub_voice_worker.py
+VOICE_WORKER = os.environ.get('VOICE_WORKER', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'voice_subprocess.py'))
+
+# Session state lives in the shared store so any worker process can answer for any
+# session; only the process that spawned a voice worker holds its Popen handle
+_workers = {}
+
+# How often a worker's watcher checks whether the session was reset elsewhere
+WATCH_INTERVAL = 0.5
+
+# Finished sessions nobody reset are purged after this many seconds; worker logs are
+# deleted once the worker exits cleanly unless KEEP_WORKER_LOGS=1
+SESSION_RETENTION = float(os.environ.get('SESSION_RETENTION', '3600'))
+PURGE_INTERVAL = 60
+KEEP_WORKER_LOGS = os.environ.get('KEEP_WORKER_LOGS', '0') == '1'
+_last_purge = 0.0
 
 @app.route('/')
 def index():
@@ -34,11 +60,47 @@ def get_candidates_api():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
+def _watch_worker(session_id, process, log_file):
+    """Reap the worker, record its exit, and stop it if another web worker reset the session"""
+    store = get_session_store()
+    while True:
+        try:
+            returncode = process.wait(timeout=WATCH_INTERVAL)
+            break
+        except subprocess.TimeoutExpired:
+            if store.get(session_id) is None:
+                process.terminate()
+    safe_print(f"Process for session {session_id} has completed with return code: {returncode}")
+    store.finish(session_id, returncode)
+    _workers.pop(session_id, None)
+    # Logs of failed workers are kept for diagnosis; reset sessions are not failures
+    if (returncode == 0 or store.get(session_id) is None) and not KEEP_WORKER_LOGS:
+        try:
+            os.remove(log_file)
+        except OSError:
+            pass
+
+def _purge_sessions(store):
+    """Drop finished sessions older than SESSION_RETENTION, at most every PURGE_INTERVAL"""
+    global _last_purge
+    now = time.time()
+    if now - _last_purge < min(PURGE_INTERVAL, SESSION_RETENTION):
+        return
+    _last_purge = now
+    try:
+        purged = store.purge(SESSION_RETENTION)
+    except Exception as e:
+        safe_print(f"Error purging sessions: {e}")
+        return
+    if purged:
+        safe_print(f"Purged {purged} finished sessions")
+
 @app.route('/api/start-voice-voting', methods=['POST'])
 def start_voice_voting():
     """Start voice voting process using subprocess"""
     try:
-        session_id = str(int(time.time()))
+        # Timestamp prefix keeps IDs sortable; the suffix keeps concurrent booths apart
+        session_id = f"{int(time.time())}{uuid.uuid4().hex[:8]}"
         
         # Create a subprocess to handle voice voting
         safe_print(f"Starting voice subprocess for session {session_id}")
@@ -46,21 +108,22 @@ def start_voice_voting():
         # Create log file for subprocess output
         log_file = f'subprocess_{session_id}.log'
         
-        process = subprocess.Popen([
-            'python', 'voice_subprocess.py', session_id
-        ], 
-        stdout=open(log_file, 'w'), 
-        stderr=subprocess.STDOUT, 
-        text=True)
+        # The session row must exist before the worker reports its first status
+        store = get_session_store()
+        _purge_sessions(store)
+        store.create(session_id, worker_pid=None, worker_host=socket.gethostname())
+        with open(log_file, 'w') as log:
+            process = subprocess.Popen([
+                sys.executable, VOICE_WORKER, session_id
+            ], 
+            stdout=log, 
+            stderr=subprocess.STDOUT, 
+            text=True)
         safe_print(f"Subprocess started with PID: {process.pid}")
+        store.update(session_id, worker_pid=process.pid)
         
-        voting_sessions[session_id] = {
-            'process': process,
-            'status': 'listening',
-            'step': 1,
-            'message': 'Starting voice voting...',
-            'result': None
-        }
+        _workers[session_id] = process
+        threading.Thread(target=_watch_worker, args=(session_id, process, log_file), daemon=True).start()
         
         return jsonify({
             'success': True, 
@@ -73,50 +136,26 @@ def start_voice_voting():
 
 @app.route('/api/voting-status/<session_id>')
 def voting_status(session_id):
-    """Get status of voice voting session"""
-    if session_id not in voting_sessions:
+    """Get status of voice voting session (any web worker can answer)"""
+    with timed('status_read'):
+        session = get_session_store().get(session_id)
+    if session is None:
         return jsonify({'success': False, 'error': 'Session not found'})
     
-    session = voting_sessions[session_id]
-    process = session['process']
-    
-    # Try to read status from file
-    status_file = f'status_{session_id}.json'
-    try:
-        if os.path.exists(status_file):
-            with open(status_file, 'r') as f:
-                file_data = json.load(f)
-                session.update(file_data)
-                safe_print(f"Updated session {session_id} with status: {file_data.get('status', 'unknown')}")
-        else:
-            safe_print(f"Status file {status_file} does not exist yet")
-    except Exception as e:
-        safe_print(f"Error reading status file: {e}")
-    
-    # Check if process is still running
-    if process.poll() is None:
-        # Process still running
+    if not is_finished(session):
+        # Worker still running
         return jsonify({
             'success': True,
-            'status': session.get('status', 'listening'),
-            'step': session.get('step', 1), 
-            'message': session.get('message', 'Processing...')
+            'status': session.get('status') or 'listening',
+            'step': session.get('step') or 1, 
+            'message': session.get('message') or 'Processing...'
         })
     else:
-        # Process finished
-        safe_print(f"Process for session {session_id} has completed with return code: {process.returncode}")
-        # Clean up status file
-        try:
-            if os.path.exists(status_file):
-                os.remove(status_file)
-        except Exception:
-            pass
-            
         return jsonify({
             'success': True,
-            'status': session.get('status', 'completed'),
-            'step': session.get('step', 3),
-            'message': session.get('message', 'Process completed'),
+            'status': session.get('status') or 'completed',
+            'step': session.get('step') or 3,
+            'message': session.get('message') or 'Process completed',
             'result': session.get('result')
         })
 
@@ -129,22 +168,175 @@ def get_results():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
+# Each web worker adds its own timings to the shared metrics store at most this often
+METRICS_FLUSH_SECONDS = 15
+
+@app.after_request
+def flush_worker_metrics(response):
+    try:
+        flush_if_due(METRICS_FLUSH_SECONDS)
+    except Exception as e:
+        safe_print(f"Error writing metrics: {e}")
+    return response
+
+@app.route('/api/metrics')
+def get_metrics():
+    """Stage latency histograms in Prometheus text format
+
+    Served from the shared store, so every web worker returns the same totals
+    for voice workers and all web workers, not just its own.
+    """
+    flush_to_store()
+    return Response(render_prometheus(load_store()), mimetype='text/plain; version=0.0.4')
+
+# Largest page /api/votes will return in one response
+MAX_VOTES_PAGE = 1000
+
+def _vote_row(row):
+    """Raw vote row as the JSON object the results table expects"""
+    vote_id, voter_token, candidate_id, candidate_name, ts = row
+    return {
+        'id': vote_id,
+        'voter_id': voter_token,
+        'candidate_id': candidate_id,
+        'candidate_name': candidate_name,
+        # SQLite CURRENT_TIMESTAMP is UTC without a zone marker
+        'timestamp': ts.replace(' ', 'T') + 'Z' if ts else None,
+    }
+
+@app.route('/api/votes')
+def get_raw_votes():
+    """Raw votes, keyset-paginated: pass the returned next_after to get the next page
+
+    order=newest pages backwards from the latest vote instead; pass the
+    returned next_before as before to get older votes.
+    """
+    try:
+        limit = max(1, min(request.args.get('limit', 100, type=int), MAX_VOTES_PAGE))
+        if request.args.get('order') == 'newest':
+            rows = get_votes_page(limit=limit, before_id=request.args.get('before', -1, type=int))
+            cursor = ('next_before', rows[-1][0] if len(rows) == limit else None)
+        else:
+            rows = get_votes_page(request.args.get('after', 0, type=int), limit)
+            cursor = ('next_after', rows[-1][0] if len(rows) == limit else None)
+        return jsonify({
+            'success': True,
+            'votes': [_vote_row(row) for row in rows],
+            cursor[0]: cursor[1],
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+@app.route('/api/votes/export')
+def export_votes():
+    """Stream every raw vote as NDJSON (default) or CSV without loading them all"""
+    export_format = request.args.get('format', 'ndjson')
+    after = request.args.get('after', 0, type=int)
+    fields = ['id', 'voter_id', 'candidate_id', 'candidate_name', 'timestamp']
+
+    if export_format == 'csv':
+        def generate():
+            buffer = io.StringIO()
+            writer = csv.DictWriter(buffer, fieldnames=fields)
+            writer.writeheader()
+            for n, row in enumerate(iter_votes(after), 1):
+                writer.writerow(_vote_row(row))
+                # Send output in chunks rather than one response write per row
+                if n % 500 == 0:
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate()
+            yield buffer.getvalue()
+        mimetype = 'text/csv'
+    elif export_format == 'ndjson':
+        def generate():
+            lines = []
+            for row in iter_votes(after):
+                lines.append(json.dumps(_vote_row(row)))
+                if len(lines) == 500:
+                    yield '\n'.join(lines) + '\n'
+                    lines = []
+            if lines:
+                yield '\n'.join(lines) + '\n'
+        mimetype = 'application/x-ndjson'
+    else:
+        return jsonify({'success': False, 'error': f'Unsupported format: {export_format}'}), 400
+
+    return Response(generate(), mimetype=mimetype, headers={
+        'Content-Disposition': f'attachment; filename=votes.{export_format}'
+    })
+
+@app.route('/api/ledger/root')
+def ledger_root():
+    """Current Merkle root over the active election's votes, for publication"""
+    try:
+        election = db.active_election()
+        ledger = MerkleLedger(ledger_path(db.election_path(election)))
+        try:
+            size, root = ledger.root()
+        finally:
+            ledger.close()
+        return jsonify({'success': True, 'election': election, 'tree_size': size, 'root': root.hex()})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+@app.route('/api/votes/<int:vote_id>/proof')
+def vote_proof(vote_id):
+    """Inclusion proof for one vote receipt; check with `python merkle_ledger.py check-proof`
+
+    The leaf only holds a salted commitment, so proofs are safe to serve to
+    anyone; checking the vote inside needs the voter's receipt code.
+    """
+    try:
+        path = db.election_path()
+        ledger = MerkleLedger(ledger_path(path))
+        try:
+            proof = ledger.proof(vote_id, path)
+        finally:
+            ledger.close()
+        return jsonify({'success': True, 'proof': proof})
+    except LookupError as e:
+        return jsonify({'success': False, 'error': str(e)}), 404
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+@app.route('/api/turnout')
+def turnout():
+    """Votes per minute or hour bucket and candidate, optionally within [start, end)"""
+    granularity = request.args.get('granularity', 'minute')
+    if granularity not in ('minute', 'hour'):
+        return jsonify({'success': False, 'error': f'Unsupported granularity: {granularity}'}), 400
+    try:
+        rows = get_turnout(granularity,
+                           start=request.args.get('start'),
+                           end=request.args.get('end'),
+                           candidate_id=request.args.get('candidate_id', type=int))
+        return jsonify({
+            'success': True,
+            'granularity': granularity,
+            'series': [{'bucket': bucket.replace(' ', 'T') + 'Z', 'candidate_id': cid, 'votes': votes}
+                       for bucket, cid, votes in rows],
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+@app.route('/api/receipt-code/<session_id>', methods=['POST'])
+def receipt_code(session_id):
+    """Hand the session's private receipt code to the voter's screen, once"""
+    code = get_session_store().take_receipt(session_id)
+    if code is None:
+        return jsonify({'success': False, 'error': 'No receipt code to collect'}), 404
+    return jsonify({'success': True, 'receipt_code': code})
+
 @app.route('/api/reset-session/<session_id>')
 def reset_session(session_id):
     """Reset a voting session"""
-    if session_id in voting_sessions:
-        process = voting_sessions[session_id]['process']
-        if process.poll() is None:
-            process.terminate()
-        del voting_sessions[session_id]
-    
-    # Clean up status file
-    status_file = f'status_{session_id}.json'
-    try:
-        if os.path.exists(status_file):
-            os.remove(status_file)
-    except Exception:
-        pass
+    get_session_store().delete(session_id)
+    # The web worker that started the session stops its process; others notice the
+    # deleted row within WATCH_INTERVAL
+    process = _workers.get(session_id)
+    if process is not None and process.poll() is None:
+        process.terminate()
     
     return jsonify({'success': True})
 
@@ -155,6 +347,7 @@ if __name__ == '__main__':
     safe_print("Starting Professional Web-Based Voice Voting System")
     safe_print("Open your browser to: http://localhost:5000")
     safe_print("Voice processing runs in separate subprocess (no conflicts!)")
+    safe_print("Development server; for several worker processes use e.g. gunicorn -w 4 web_voting_app:app")
     safe_print("Perfect for major projects!")
     safe_print("-" * 60)
     
@@ -5,30 +5,32 @@ This works better in subprocess environments
 """
 import os
 import subprocess
+import threading
+import time
 from console_utils import safe_print
+from metrics import timed
 
+@timed('tts_sapi')
 def speak_windows_sapi(text):
     """Use Windows SAPI to speak text via PowerShell"""
     try:
         safe_print(f"🔊 [SAPI] Speaking: '{text}'")
         
-        # Escape quotes and special characters for PowerShell
-        escaped_text = text.replace("'", "''").replace('"', '""')
-        
-        # Use PowerShell with Windows Speech API
-        powershell_cmd = f'''
+        # Use PowerShell with Windows Speech API; the text goes in through the
+        # environment, never into the script, so nothing in it is interpreted
+        powershell_cmd = '''
 Add-Type -AssemblyName System.Speech
 $speak = New-Object System.Speech.Synthesis.SpeechSynthesizer
 $speak.Rate = 0
 $speak.Volume = 100
-$speak.Speak("{escaped_text}")
+$speak.Speak($env:VOTING_TTS_TEXT)
 $speak.Dispose()
 '''
         
         # Run PowerShell command
         result = subprocess.run([
             'powershell', '-WindowStyle', 'Hidden', '-Command', powershell_cmd
-        ], capture_output=True, text=True, timeout=30)
+        ], capture_output=True, text=True, timeout=30, env={**os.environ, 'VOTING_TTS_TEXT': text})
         
         if result.returncode == 0:
             safe_print("✅ [SAPI] Speech completed successfully")
@@ -44,6 +46,7 @@ $speak.Dispose()
         safe_print(f"❌ [SAPI] Error: {e}")
         return False
 
+@timed('tts_narrator')
 def speak_windows_narrator(text):
     """Use Windows built-in narrator command"""
     try:
@@ -77,6 +80,7 @@ def speak_windows_narrator(text):
         safe_print(f"❌ [NARRATOR] Error: {e}")
         return False
 
+@timed('tts_vbscript')
 def speak_windows_command(text):
     """Use Windows command line TTS"""
     try:
@@ -118,31 +122,221 @@ Set objVoice = Nothing
         safe_print(f"❌ [CMD] Error: {e}")
         return False
 
-def speak_subprocess_safe(text):
-    """Try multiple Windows TTS methods until one works"""
-    safe_print(f"🎯 [SAFE] Attempting to speak: '{text[:50]}...'")
-    
-    # Try methods in order of preference
-    methods = [
-        ("Windows SAPI (PowerShell)", speak_windows_sapi),
-        ("Windows Command TTS", speak_windows_command),
-        ("Windows Narrator", speak_windows_narrator),
-    ]
-    
-    for method_name, method_func in methods:
-        safe_print(f"🔄 [SAFE] Trying {method_name}...")
+class SapiWavSynthesizer:
+    """Render prompts to WAV with SAPI and play them with winsound, as separate steps
+
+    Splitting synthesis from playback lets tts_pipeline render the next prompt
+    while this one plays.
+    """
+
+    def synthesize(self, text):
+        """Return the path of a WAV file of `text`, or None"""
+        import tempfile
+        fd, path = tempfile.mkstemp(suffix='.wav', prefix='prompt_')
+        os.close(fd)
+        # Text and path go in through the environment, so nothing in them is interpreted
+        powershell_cmd = '''
+Add-Type -AssemblyName System.Speech
+$speak = New-Object System.Speech.Synthesis.SpeechSynthesizer
+$speak.Rate = 0
+$speak.Volume = 100
+$speak.SetOutputToWaveFile($env:VOTING_TTS_WAV)
+$speak.Speak($env:VOTING_TTS_TEXT)
+$speak.Dispose()
+'''
         try:
-            if method_func(text):
-                safe_print(f"✅ [SAFE] Success with {method_name}")
-                return True
+            result = subprocess.run(['powershell', '-WindowStyle', 'Hidden', '-Command', powershell_cmd],
+                                    capture_output=True, text=True, timeout=30,
+                                    env={**os.environ, 'VOTING_TTS_TEXT': text, 'VOTING_TTS_WAV': path})
+            if result.returncode == 0 and os.path.getsize(path) > 0:
+                return path
+            safe_print(f"❌ [SAPI-WAV] Synthesis failed: {result.stderr}")
         except Exception as e:
-            safe_print(f"❌ [SAFE] {method_name} failed: {e}")
-            continue
-    
+            safe_print(f"❌ [SAPI-WAV] Error: {e}")
+        self.discard(path)
+        return None
+
+    def play(self, path):
+        import winsound
+        winsound.PlaySound(path, winsound.SND_FILENAME)
+        return True
+
+    def discard(self, path):
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+class BackendHealth:
+    """Circuit breaker state for one TTS backend"""
+
+    def __init__(self, name, speak):
+        self.name = name
+        self.speak = speak
+        self.consecutive_failures = 0
+        self.failures = 0
+        self.successes = 0
+        self.open_until = 0.0     # while in the future the backend is skipped
+        self.last_error = None
+
+    def is_open(self, now):
+        return self.open_until > now
+
+
+class TTSSelector:
+    """Speak through the first healthy backend, starting with the last one that worked
+
+    A backend that fails `failure_threshold` times in a row is skipped for `cooldown`
+    seconds; after that it is re-probed in the background (speaking `probe_text`, silent
+    by default) and only used again once the probe succeeds. If every backend has
+    tripped they are all tried anyway rather than staying silent.
+    """
+
+    def __init__(self, backends, failure_threshold=2, cooldown=60.0, probe_text='', clock=time.monotonic):
+        self.backends = [BackendHealth(name, speak) for name, speak in backends]
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.probe_text = probe_text
+        self.clock = clock
+        self.preferred = None
+        self._lock = threading.Lock()
+        self._probe_thread = None
+
+    def _attempt(self, backend, text):
+        try:
+            ok = bool(backend.speak(text))
+            error = None if ok else 'returned failure'
+        except Exception as e:
+            ok, error = False, str(e)
+        with self._lock:
+            if ok:
+                backend.successes += 1
+                backend.consecutive_failures = 0
+                backend.open_until = 0.0
+            else:
+                backend.failures += 1
+                backend.consecutive_failures += 1
+                backend.last_error = error
+                if backend.consecutive_failures >= self.failure_threshold:
+                    backend.open_until = self.clock() + self.cooldown
+                if backend is self.preferred:
+                    self.preferred = None
+        return ok
+
+    def _order(self):
+        """(backends to try, tripped backends due for a probe)
+
+        The preferred backend comes first, then the rest in priority order. Tripped
+        backends are left out until a probe succeeds, even once their cooldown passes.
+        """
+        with self._lock:
+            ordered = sorted(self.backends, key=lambda b: b is not self.preferred)
+            healthy = [b for b in ordered if b.consecutive_failures < self.failure_threshold]
+            return healthy or ordered, self._due()
+
+    def _due(self):
+        now = self.clock()
+        return [b for b in self.backends
+                if b.consecutive_failures >= self.failure_threshold and not b.is_open(now)]
+
+    def speak(self, text):
+        """Return True once some backend has spoken `text`"""
+        candidates, due = self._order()
+        self._maybe_probe(due)
+        for backend in candidates:
+            safe_print(f"🔄 [SAFE] Trying {backend.name}...")
+            if self._attempt(backend, text):
+                self._promote(backend)
+                safe_print(f"✅ [SAFE] Success with {backend.name}")
+                return True
+            safe_print(f"❌ [SAFE] {backend.name} failed")
+        return False
+
+    def _maybe_probe(self, due):
+        """Start one background probe of tripped backends whose cooldown has passed"""
+        if not due or (self._probe_thread and self._probe_thread.is_alive()):
+            return
+        self._probe_thread = threading.Thread(target=self.probe, name='tts-probe', daemon=True)
+        self._probe_thread.start()
+
+    def probe(self):
+        """Re-try tripped backends past their cooldown; a higher-priority recovery becomes preferred"""
+        with self._lock:
+            due = self._due()
+        for backend in due:
+            if self._attempt(backend, self.probe_text):
+                safe_print(f"✅ [SAFE] {backend.name} recovered")
+                self._promote(backend)
+
+    def _promote(self, backend):
+        """Prefer `backend` unless a higher-priority one already works (e.g. just recovered)"""
+        with self._lock:
+            current = self.preferred
+            if current is None or self.backends.index(backend) < self.backends.index(current):
+                self.preferred = backend
+
+    def wait_for_probe(self, timeout=None):
+        if self._probe_thread:
+            self._probe_thread.join(timeout)
+
+    def health(self):
+        """Per-backend state: closed (in use), open (skipped) or half-open (due for a probe)"""
+        now = self.clock()
+        with self._lock:
+            report = []
+            for b in self.backends:
+                if b.is_open(now):
+                    state = 'open'
+                elif b.consecutive_failures >= self.failure_threshold:
+                    state = 'half-open'
+                else:
+                    state = 'closed'
+                report.append({
+                    'backend': b.name,
+                    'state': state,
+                    'preferred': b is self.preferred,
+                    'consecutive_failures': b.consecutive_failures,
+                    'failures': b.failures,
+                    'successes': b.successes,
+                    'last_error': b.last_error,
+                })
+            return report
+
+
+# Methods in order of preference
+TTS_BACKENDS = [
+    ("Windows SAPI (PowerShell)", speak_windows_sapi),
+    ("Windows Command TTS", speak_windows_command),
+    ("Windows Narrator", speak_windows_narrator),
+]
+
+_selector = None
+_selector_lock = threading.Lock()
+
+def get_tts_selector():
+    """Process-wide selector, so every prompt of a session benefits from what earlier ones learned"""
+    global _selector
+    with _selector_lock:
+        if _selector is None:
+            _selector = TTSSelector(
+                TTS_BACKENDS,
+                failure_threshold=int(os.environ.get('TTS_FAILURE_THRESHOLD', '2')),
+                cooldown=float(os.environ.get('TTS_COOLDOWN', '60')),
+            )
+        return _selector
+
+@timed('tts_prompt')
+def speak_subprocess_safe(text):
+    """Speak with the last working Windows TTS method, falling back through the others"""
+    safe_print(f"🎯 [SAFE] Attempting to speak: '{text[:50]}...'")
+    if get_tts_selector().speak(text):
+        return True
     safe_print("❌ [SAFE] All TTS methods failed")
     return False
 
 if __name__ == "__main__":
     # Test the TTS methods
     test_text = "This is a test of Windows TTS from subprocess"
-    speak_subprocess_safe(test_text)
\ No newline at end of file
+    speak_subprocess_safe(test_text)
+    for entry in get_tts_selector().health():
+        print(entry)